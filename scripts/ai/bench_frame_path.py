@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the appsink -> appsrc frame path, without camera or encoder.
+
+Compares the path the demos used to take
+
+    map -> ndarray.copy() -> cvtColor -> tobytes() -> Buffer.new_allocate + fill
+
+with the pooled path of frame_buffers (one copy into a reusable output buffer,
+overlay drawn in place, buffer handed on as is) and prints the number of
+frame-sized copies, MB copied and time per frame for both.
+
+    python3 bench_frame_path.py --width 1280 --height 720 --frames 300
+"""
+
+import argparse
+import collections
+import time
+
+import cv2
+import numpy as np
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst
+
+from frame_buffers import FrameBufferPool, copy_stats, frame_nbytes, push_frame, sample_to_frame
+
+# Buffers held "downstream" (appsrc queue + encoder) before they are released
+IN_FLIGHT = 3
+
+
+class FakeAppsrc:
+    """Stands in for appsrc: keeps the last IN_FLIGHT buffers referenced like a real queue would."""
+
+    def __init__(self):
+        self.queue = collections.deque(maxlen=IN_FLIGHT)
+
+    def emit(self, signal, buffer):
+        # a Gst.Sample takes a real (C-level) reference on the buffer
+        self.queue.append(Gst.Sample.new(buffer, None, None, None))
+        return Gst.FlowReturn.OK
+
+
+def make_sample(width, height):
+    data = np.random.randint(0, 255, frame_nbytes(width, height), dtype=np.uint8)
+    buffer = Gst.Buffer.new_wrapped(data.tobytes())
+    caps = Gst.Caps.from_string(f"video/x-raw,format=BGR,width={width},height={height},framerate=30/1")
+    return Gst.Sample.new(buffer, caps, None, None)
+
+
+def draw(image):
+    height, width = image.shape[:2]
+    cv2.rectangle(image, (width // 4, height // 4), (width // 2, height // 2), (0, 255, 0), 2)
+    cv2.circle(image, (width // 2, height // 2), 50, (255, 0, 0), thickness=5)
+
+
+def legacy_path(sample, appsrc):
+    buffer = sample.get_buffer()
+    structure = sample.get_caps().get_structure(0)
+    width = structure.get_value("width")
+    height = structure.get_value("height")
+
+    success, map_info = buffer.map(Gst.MapFlags.READ)
+    try:
+        frame = np.ndarray((height, width, 3), buffer=map_info.data, dtype=np.uint8).copy()
+    finally:
+        buffer.unmap(map_info)
+    img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    copy_stats.record(frame.nbytes, copies=2)
+    draw(frame)
+
+    data = frame.tobytes()
+    out_buffer = Gst.Buffer.new_allocate(None, len(data), None)
+    out_buffer.fill(0, data)
+    copy_stats.record(len(data), copies=2)
+    copy_stats.frame_done()
+    out_buffer.pts = buffer.pts
+    appsrc.emit("push-buffer", out_buffer)
+    return img_rgb
+
+
+def pooled_path(sample, appsrc, pool):
+    frame = sample_to_frame(sample, pool=pool)
+    draw(frame.image)
+    push_frame(appsrc, frame)
+
+
+def run(name, fn, frames):
+    copy_stats.reset()
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:8s} {elapsed / frames * 1000:7.2f} ms/frame, {copy_stats.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    Gst.init(None)
+    sample = make_sample(args.width, args.height)
+    pool = FrameBufferPool(count=IN_FLIGHT + 2)
+
+    print(f"Frame path benchmark at {args.width}x{args.height} BGR, {args.frames} frames")
+    run("legacy", lambda: legacy_path(sample, FakeAppsrc()), args.frames)
+    appsrc = FakeAppsrc()
+    run("pooled", lambda: pooled_path(sample, appsrc, pool), args.frames)
+    print(f"pooled path allocated {pool.allocations} output buffers in total, {pool.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the overlay on crowded frames, without camera or model.
+
+Compares ``draw_detections`` (getTextSize, two rectangles and putText per box)
+with ``OverlayRenderer`` (one polylines call, cached tag sprites blitted with
+NumPy) for new detections on every frame and for detections reused across
+frames, as in passthrough mode. Prints ms per frame for each box count, with
+the sprite cache already warm (80 classes x confidence buckets).
+
+    python3 bench_overlay.py --boxes 10 100 300 --frames 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from overlay import OverlayRenderer, draw_detections
+
+NAMES = [f"class{i}" for i in range(80)]
+
+
+def make_detections(count, width, height, rng):
+    x1 = rng.uniform(0, width - 60, count)
+    y1 = rng.uniform(20, height - 60, count)
+    w = rng.uniform(20, 200, count)
+    h = rng.uniform(20, 200, count)
+    boxes = np.stack([x1, y1, np.minimum(x1 + w, width - 1), np.minimum(y1 + h, height - 1)], axis=1)
+    return boxes.astype(np.float32), rng.uniform(0.25, 1.0, count).astype(np.float32), rng.integers(0, 80, count)
+
+
+def run(draw, frames, detections, background):
+    """ms per frame of ``draw(frame, detections)``; the frame copy is not timed."""
+    elapsed = 0.0
+    for i in range(frames):
+        frame = background.copy()
+        start = time.perf_counter()
+        draw(frame, detections[i % len(detections)])
+        elapsed += time.perf_counter() - start
+    return elapsed / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--boxes", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--conf-step", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+    print(f"Overlay benchmark on {args.width}x{args.height} frames, {args.frames} frames per run (ms/frame)")
+    print(f"{'boxes':>6} {'opencv':>9} {'renderer':>9} {'reused':>9} {'speedup':>8}")
+    for count in args.boxes:
+        moving = [make_detections(count, args.width, args.height, rng) for _ in range(args.frames)]
+        opencv_ms = run(lambda f, d: draw_detections(f, *d, NAMES), args.frames, moving, background)
+
+        renderer = OverlayRenderer(conf_step=args.conf_step)
+        run(lambda f, d: renderer.draw(f, *d, NAMES), args.frames, moving, background)  # render the sprites
+        renderer_ms = run(lambda f, d: renderer.draw(f, *d, NAMES), args.frames, moving, background)
+        reused_ms = run(lambda f, d: renderer.draw(f, *d, NAMES), args.frames, moving[:1], background)
+        print(
+            f"{count:>6} {opencv_ms:>9.3f} {renderer_ms:>9.3f} {reused_ms:>9.3f} {opencv_ms / renderer_ms:>7.1f}x"
+            f"   ({renderer.sprites_rendered} sprites)"
+        )
+
+
+if __name__ == "__main__":
+    main()
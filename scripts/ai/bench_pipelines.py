@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the inference pipelines, without camera or browser.
+
+Runs run.py's Runner for every combination of detector backend, resolution and
+pipeline mode on videotestsrc (or a video file via filesrc) for a fixed number
+of frames, with fakesink instead of webrtcsink (optionally behind a real
+encoder), each combination in its own process. Writes a JSON report with FPS,
+capture-to-encoder and inference latency percentiles, CPU% and peak RSS:
+
+    python3 bench_pipelines.py --backends ultralytics onnx --resolutions 640x360 1280x720 -o bench.json
+    python3 bench_pipelines.py --location clip.mp4 --encoder vp8enc --baseline bench.json
+
+The report has sorted keys and rounded values, so it can be committed and diffed
+across commits. ``--baseline`` compares against an earlier report and exits
+with status 1 if a combination got slower than ``--tolerance`` percent.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+
+BASE_PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles", "ci_testsrc.toml")
+
+
+def case_name(case):
+    return f"{case['backend']}/{case['width']}x{case['height']}/{case['pipeline']}"
+
+
+def case_overrides(case, args):
+    overrides = [
+        f"source.width={case['width']}",
+        f"source.height={case['height']}",
+        f"source.fps_num={args.fps}",
+        f"source.num_buffers={args.frames}",
+        f"detector.backend={case['backend']}",
+        f"detector.pipeline={case['pipeline']}",
+        f"encoder.kind={args.encoder}",
+        "sink.kind=fakesink",
+        "metrics.port=0",
+    ]
+    if args.location:
+        overrides += ["source.kind=filesrc", f"source.location={args.location}"]
+    else:
+        overrides += ["source.kind=videotestsrc", f"source.pattern={args.pattern}"]
+    return overrides
+
+
+def percentiles(values_ms):
+    import numpy as np
+
+    if not len(values_ms):
+        return {}
+    p50, p95, p99 = np.percentile(values_ms, (50, 95, 99))
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+
+def run_case(case, args):
+    """Run one combination in this process and return its results."""
+    from profiles import load_profile
+    from run import Runner
+
+    runner = Runner(load_profile(args.profile, args.overrides + case_overrides(case, args)))
+    status = runner.run()
+    if status or "playing" not in runner.timing:
+        return {"error": f"run failed with status {status}"}
+    wall = runner.timing["stopped"][0] - runner.timing["playing"][0]
+    cpu = runner.timing["stopped"][1] - runner.timing["playing"][1]
+    frames = len(runner.latency.latencies)
+    result = {
+        "frames": frames,
+        "fps": round(frames / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": percentiles([t * 1000 for t in runner.latency.latencies]),
+        "cpu_percent": round(100.0 * cpu / wall, 1) if wall > 0 else 0.0,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if runner.detector is not None and runner.detector.loaded:
+        inferences = runner.metrics.stage_stats().get("detector", {}).get("count", 0)
+        result["inference_fps"] = round(inferences / wall, 2) if wall > 0 else 0.0
+        result["inference_ms"] = percentiles([t * 1000 for t in runner.detector.latencies])
+    return result
+
+
+def run_isolated(case, args):
+    """Run one combination in a fresh interpreter, so RSS and CPU are its own."""
+    with tempfile.NamedTemporaryFile(suffix=".json") as result_file:
+        command = [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case), "--result", result_file.name,
+                   "--profile", args.profile, "--frames", str(args.frames), "--fps", str(args.fps),
+                   "--encoder", args.encoder, "--pattern", args.pattern]
+        if args.location:
+            command += ["--location", args.location]
+        for override in args.overrides:
+            command += ["--set", override]
+        process = subprocess.run(command, stdout=None if args.verbose else subprocess.DEVNULL)
+        try:
+            with open(result_file.name) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"error": f"benchmark process exited with {process.returncode}"}
+
+
+def compare(report, baseline, tolerance):
+    """Print the change against a baseline report; returns the regressed combinations."""
+    regressions = []
+    print(f"\n{'combination':<36} {'fps':>16} {'p95 latency ms':>18}")
+    for name, result in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or "error" in result or "error" in old:
+            print(f"{name:<36} {'(no baseline)' if not old else '(error)':>16}")
+            continue
+        fps_change = 100.0 * (result["fps"] - old["fps"]) / old["fps"] if old["fps"] else 0.0
+        old_p95 = old["latency_ms"].get("p95", 0.0)
+        p95_change = 100.0 * (result["latency_ms"].get("p95", 0.0) - old_p95) / old_p95 if old_p95 else 0.0
+        regressed = fps_change < -tolerance or p95_change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<36} {old['fps']:>6.1f} -> {result['fps']:>6.1f} "
+            f"{old_p95:>7.1f} -> {result['latency_ms'].get('p95', 0.0):>7.1f}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", default=BASE_PROFILE, help="base profile the combinations override")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="extra profile override for every combination, may be repeated")
+    parser.add_argument("--backends", nargs="+", default=["ultralytics"], help="detector backends (or none)")
+    parser.add_argument("--resolutions", nargs="+", default=["640x360", "1280x720"], metavar="WxH")
+    parser.add_argument("--pipelines", nargs="+", default=["bridge", "single"])
+    parser.add_argument("--frames", type=int, default=300, help="frames per combination")
+    parser.add_argument("--fps", type=int, default=30, help="source frame rate")
+    parser.add_argument("--pattern", default="ball", help="videotestsrc pattern")
+    parser.add_argument("--location", help="video file to decode instead of videotestsrc")
+    parser.add_argument("--encoder", default="none", help="encoder in front of fakesink: none, vp8enc, x264enc, ...")
+    parser.add_argument("-o", "--output", default="bench_pipelines.json", help="JSON report")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="allowed fps drop / p95 increase in percent")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the runs")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        with open(args.result, "w") as f:
+            json.dump(run_case(json.loads(args.case), args), f)
+        return 0
+
+    results = {}
+    for backend in args.backends:
+        for resolution in args.resolutions:
+            width, height = (int(v) for v in resolution.lower().split("x"))
+            for pipeline in args.pipelines if backend != "none" else ["bridge"]:
+                case = {"backend": backend, "width": width, "height": height, "pipeline": pipeline}
+                print(f"{case_name(case)} ...", flush=True)
+                results[case_name(case)] = run_isolated(case, args)
+                print(f"  {results[case_name(case)]}")
+
+    report = {
+        "host": {
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "settings": {
+            "profile": os.path.basename(args.profile),
+            "overrides": args.overrides,
+            "frames": args.frames,
+            "fps": args.fps,
+            "source": args.location or f"videotestsrc pattern={args.pattern}",
+            "encoder": args.encoder,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.tolerance:.0f}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the YOLO postprocessing (decode + confidence filter + NMS).
+
+Runs on synthetic raw head outputs of shape (batch, 4 + nc, anchors), the
+layout of an exported YOLO11 model, and compares
+
+    numpy-greedy  postprocess.decode_batch, exact class-aware NMS per image
+    numpy-fast    postprocess.decode_batch with Fast NMS
+    cv2-loop      per-image decode with cv2.dnn.NMSBoxesBatched
+    ultralytics   ultralytics.utils.ops.non_max_suppression (if installed)
+
+Prints ms per batch and the number of boxes per image of every method.
+
+    python3 bench_postprocess.py --batch 4 --anchors 8400 --runs 50
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from postprocess import MODEL_CONF, MODEL_IOU, decode_batch
+
+
+def make_outputs(batch, num_classes, anchors, objects, size=640, seed=0):
+    """Mostly low scores plus ``objects`` confident, overlapping boxes per image."""
+    rng = np.random.default_rng(seed)
+    outputs = np.empty((batch, 4 + num_classes, anchors), dtype=np.float32)
+    outputs[:, 0:2] = rng.uniform(0, size, (batch, 2, anchors))
+    outputs[:, 2:4] = rng.uniform(8, size / 4, (batch, 2, anchors))
+    outputs[:, 4:] = rng.uniform(0, 0.6, (batch, num_classes, anchors)) ** 4
+    hot = rng.integers(0, anchors, (batch, objects))
+    for b in range(batch):
+        outputs[b, 4 + rng.integers(0, num_classes, objects), hot[b]] = rng.uniform(0.5, 0.95, objects)
+    return outputs
+
+
+def cv2_loop(outputs, conf, iou):
+    results = []
+    for pred in outputs:
+        pred = pred.T
+        scores = pred[:, 4:]
+        cls_ids = scores.argmax(axis=1)
+        confs = scores[np.arange(len(scores)), cls_ids]
+        keep = confs > conf
+        xywh = pred[keep, :4].copy()
+        xywh[:, :2] -= xywh[:, 2:] / 2
+        indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), confs[keep].tolist(), cls_ids[keep].tolist(), conf, iou)
+        results.append(np.asarray(indices, dtype=int).reshape(-1))
+    return results
+
+
+def ultralytics_nms():
+    try:
+        import torch
+        from ultralytics.utils.ops import non_max_suppression
+    except ImportError:
+        return None
+
+    def run(outputs, conf, iou):
+        return non_max_suppression(torch.from_numpy(outputs), conf, iou)
+
+    return run
+
+
+def run(name, fn, outputs, runs):
+    result = fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    elapsed = (time.perf_counter() - start) / runs
+    counts = [len(r[0]) if isinstance(r, tuple) else len(r) for r in result]
+    print(f"{name:12s} {elapsed * 1000:8.2f} ms/batch  boxes per image {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--classes", type=int, default=80)
+    parser.add_argument("--anchors", type=int, default=8400)
+    parser.add_argument("--objects", type=int, default=50, help="confident boxes per image")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--conf", type=float, default=MODEL_CONF)
+    parser.add_argument("--iou", type=float, default=MODEL_IOU)
+    args = parser.parse_args()
+
+    outputs = make_outputs(args.batch, args.classes, args.anchors, args.objects)
+    print(f"Postprocessing benchmark on {outputs.shape} outputs, conf {args.conf}, iou {args.iou}, {args.runs} runs")
+    run("numpy-greedy", lambda: decode_batch(outputs, args.conf, args.iou), outputs, args.runs)
+    run("numpy-fast", lambda: decode_batch(outputs, args.conf, args.iou, method="fast"), outputs, args.runs)
+    run("cv2-loop", lambda: cv2_loop(outputs, args.conf, args.iou), outputs, args.runs)
+    reference = ultralytics_nms()
+    if reference is None:
+        print("ultralytics   not installed, skipped")
+    else:
+        run("ultralytics", lambda: reference(outputs, args.conf, args.iou), outputs, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Inference throughput of ProcessPool as the number of detector processes varies.
+
+Feeds the same frames (a clip or image directory, otherwise noise) as fast as
+the pool accepts them, first through one in-process detector, then through
+1..N worker processes with one intra-op thread each, and reports frames per
+second, speedup over the in-process detector and per-inference latency:
+
+    python3 bench_process_pool.py --backend ultralytics --model yolo11n --workers 1 2 3 4
+    python3 bench_process_pool.py --backend onnx --model-path yolo11n.onnx --source clip.mp4 --json pool.json
+"""
+
+import argparse
+import functools
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detectors import create_detector
+from process_pool import ProcessPool
+from quantize import read_frames
+from stages import Frame
+
+
+def detector_kwargs(args, threads):
+    common = dict(imgsz=args.imgsz, conf=args.conf)
+    if args.backend == "onnx":
+        return dict(model_path=args.model_path or args.model + ".onnx", channel_order="BGR",
+                    intra_op_threads=threads, **common)
+    if args.backend == "ultralytics":
+        common["channel_order"] = "BGR"  # frames come from cv2
+    return dict(model_name=args.model, threads=threads, **common)
+
+
+def latency_stats(seconds):
+    ms = np.asarray(seconds) * 1000.0
+    return {"p50": round(float(np.percentile(ms, 50)), 2), "p95": round(float(np.percentile(ms, 95)), 2)}
+
+
+def run_in_process(frames, args):
+    detector = create_detector(args.backend, **detector_kwargs(args, args.threads))
+    detector.warm_up(frames[0].shape, args.warmup)
+    start = time.perf_counter()
+    for image in frames:
+        detector(image)
+    elapsed = time.perf_counter() - start
+    return {"fps": round(len(frames) / elapsed, 2), "latency_ms": latency_stats(detector.latencies)}
+
+
+def run_pool(frames, workers, args):
+    factory = functools.partial(create_detector, args.backend, **detector_kwargs(args, args.threads))
+    pool = ProcessPool(factory, frames[0].shape, sink=lambda frame: None, workers=workers, warmup_frames=args.warmup)
+    pool.start()
+    try:
+        start = time.perf_counter()
+        for i, image in enumerate(frames):
+            pool.submit(Frame(image=image, pts=i, dts=i, duration=1), timeout=None)
+        pool.drain()
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.stop()
+    return {
+        "fps": round(len(frames) / elapsed, 2),
+        "latency_ms": latency_stats(pool.latencies),
+        "out_of_order": pool.reordered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="ultralytics", choices=["ultralytics", "yolov5", "onnx"])
+    parser.add_argument("--model", default="yolo11n")
+    parser.add_argument("--model-path", help="onnx: exported model, defaults to <model>.onnx")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--source", help="video clip or image directory (default: random frames)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--threads", type=int, default=1, help="intra-op threads per detector")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    if args.source:
+        frames = list(read_frames(args.source, args.frames))
+        frames = [cv2.resize(image, (args.width, args.height), interpolation=cv2.INTER_AREA) for image in frames]
+    else:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(args.frames)]
+
+    print(f"{len(frames)} frames of {args.width}x{args.height}, {args.backend}, {args.threads} thread(s) per detector, "
+          f"{os.cpu_count()} CPUs")
+    results = {"in-process": run_in_process(frames, args)}
+    for workers in args.workers:
+        results[f"{workers} processes"] = run_pool(frames, workers, args)
+
+    baseline = results["in-process"]["fps"]
+    print(f"{'':<14} {'fps':>8} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, result in results.items():
+        result["speedup"] = round(result["fps"] / baseline, 2) if baseline else 0.0
+        latency = result["latency_ms"]
+        print(f"{name:<14} {result['fps']:>8.1f} {result['speedup']:>7.2f}x {latency['p50']:>8.1f} {latency['p95']:>8.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cpus": os.cpu_count(), "settings": vars(args), "results": results}, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
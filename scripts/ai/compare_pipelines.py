@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Capture-to-encoder latency of one profile with the appsink -> appsrc bridge
+and with the single pipeline (see run.py), run back to back on the same model:
+
+    python3 compare_pipelines.py profiles/rasp_yolo11.toml --duration 30
+    python3 compare_pipelines.py profiles/ci_testsrc.toml --set detector.backend=onnx --json latency.json
+"""
+
+import argparse
+import json
+import sys
+
+from profiles import PIPELINES, load_profile
+from run import Runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("profile", help="device profile with a detector")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="override a profile value, may be repeated")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per pipeline mode")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for pipeline in PIPELINES:
+        profile = load_profile(args.profile, args.overrides + [f"detector.pipeline={pipeline}"])
+        if profile.detector.backend == "none":
+            parser.error("the profile has no detector, set detector.backend")
+        runner = Runner(profile)
+        print(f"--- {pipeline} pipeline ---")
+        runner.run(args.duration)
+        results[pipeline] = runner.latency.stats()
+
+    print(f"\n{'pipeline':<8} {'frames':>7} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7}")
+    for pipeline, stats in results.items():
+        if not stats["frames"]:
+            print(f"{pipeline:<8} {0:>7}")
+            continue
+        print(
+            f"{pipeline:<8} {stats['frames']:>7} {stats['mean_ms']:>8.1f} {stats['p50_ms']:>7.1f} "
+            f"{stats['p95_ms']:>7.1f} {stats['max_ms']:>7.1f}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Accuracy vs. latency of quantised model variants on a recorded clip.
+
+Runs the FP32 reference model and every requested variant (see quantize.py)
+frame by frame over the same clip and reports, per variant,
+
+    mAP50 / mAP50-95   agreement with the FP32 detections (FP32 = ground truth),
+                       i.e. the accuracy drift caused by quantisation
+    latency            mean / p50 / p95 per frame, preprocessing + inference + NMS
+
+so the precision can be chosen per device (MODEL_PRECISION in the demos).
+
+    python3 compare_precision.py yolo11n.onnx clip.mp4 --precisions fp16 int8-dynamic int8-static
+    python3 compare_precision.py yolo11n.onnx clip.mp4 --threads 4 --json report.json
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from detectors import create_detector
+from evaluation import mean_average_precision
+from postprocess import MODEL_CONF, MODEL_IOU
+from quantize import PRECISIONS, quantized_path, read_frames
+
+
+def run_variant(model_path, frames, args):
+    detector = create_detector(
+        "onnx",
+        model_path=model_path,
+        channel_order="BGR",  # frames come from cv2.VideoCapture
+        intra_op_threads=args.threads,
+        conf=args.conf,
+        iou=args.iou,
+    )
+    detector(frames[0])  # warm-up, not timed
+    detector.latencies.clear()
+    detections = [detector(frame) for frame in frames]
+    return detections, np.asarray(detector.latencies) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="exported FP32 .onnx model")
+    parser.add_argument("clip", help="recorded video clip or image directory")
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS[1:], default=["int8-dynamic"])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--conf", type=float, default=MODEL_CONF)
+    parser.add_argument("--iou", type=float, default=MODEL_IOU)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    frames = list(read_frames(args.clip, args.frames))
+    if not frames:
+        parser.error(f"no frames read from {args.clip}")
+    print(f"Comparing on {len(frames)} frames of {args.clip}")
+
+    reference, reference_ms = run_variant(args.model, frames, args)
+    report = [{
+        "precision": "fp32",
+        "model": args.model,
+        "size_mb": os.path.getsize(args.model) / 1e6,
+        "map50": 1.0,
+        "map50_95": 1.0,
+        "latency_ms": reference_ms,
+    }]
+    for precision in args.precisions:
+        path = quantized_path(args.model, precision)
+        if not os.path.exists(path):
+            print(f"{precision}: {path} not found, create it with quantize.py --precision {precision}")
+            continue
+        detections, latency_ms = run_variant(path, frames, args)
+        drift = mean_average_precision(detections, reference)
+        report.append({
+            "precision": precision,
+            "model": path,
+            "size_mb": os.path.getsize(path) / 1e6,
+            "map50": drift["map50"],
+            "map50_95": drift["map50_95"],
+            "latency_ms": latency_ms,
+        })
+
+    print(f"{'precision':14s} {'MB':>6s} {'mAP50':>6s} {'mAP50-95':>8s} {'mean ms':>8s} {'p50 ms':>7s} {'p95 ms':>7s} {'speedup':>7s}")
+    base = reference_ms.mean()
+    for row in report:
+        ms = row["latency_ms"]
+        row["latency_ms"] = {"mean": ms.mean(), "p50": np.percentile(ms, 50), "p95": np.percentile(ms, 95)}
+        row["speedup"] = base / ms.mean()
+        print(
+            f"{row['precision']:14s} {row['size_mb']:6.1f} {row['map50']:6.3f} {row['map50_95']:8.3f} "
+            f"{row['latency_ms']['mean']:8.1f} {row['latency_ms']['p50']:7.1f} {row['latency_ms']['p95']:7.1f} "
+            f"{row['speedup']:6.2f}x"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"clip": args.clip, "frames": len(frames), "variants": report}, f, indent=2, default=float)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,11 @@ Python script to run a GStreamer pipeline equivalent to:
       audiotestsrc ! ws.
 
 This script initializes GStreamer, sets up the pipeline, and manages the GLib MainLoop
+
+Frozen reference script, kept as it was deployed and no longer extended; new
+work goes into run.py and the device profiles. The maintained equivalent is
+
+    python run.py profiles/pylon.toml
 """
 
 import sys
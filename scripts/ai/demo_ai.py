@@ -1,53 +1,44 @@
 #!/usr/bin/env python3
+"""
+USB webcam -> appsink -> appsrc -> webrtcsink passthrough, without inference.
+
+Frozen reference script, kept as it was deployed and no longer extended; new
+work goes into run.py and the device profiles. The maintained equivalent is
+
+    python run.py profiles/usb_yolov5.toml --set detector.backend=none
+"""
 import gi
 import sys
 
-import numpy as np
 import cv2
 
 gi.require_version("Gst", "1.0")
 gi.require_version("GstWebRTC", "1.0")
 from gi.repository import Gst, GObject, GLib
 
+from frame_buffers import FrameBufferPool, push_frame, sample_to_frame
+
+OUTPUT_POOL = FrameBufferPool(count=8)
+
 
 def on_new_sample(sink, appsrc):
     sample = sink.emit("pull-sample")
     if not sample:
         return Gst.FlowReturn.ERROR
 
-    buffer = sample.get_buffer()
-    caps = sample.get_caps()
-    structure = caps.get_structure(0)
-    width = structure.get_value("width")
-    height = structure.get_value("height")
+    # Frame einmal in einen wiederverwendbaren Ausgabe-Buffer kopieren (RGB, 3 Kanäle)
+    frame = sample_to_frame(sample, pool=OUTPUT_POOL)
+    if frame is None:
+        # Pool erschöpft: Frame verwerfen (in OUTPUT_POOL.dropped gezählt), kein Fehler
+        return Gst.FlowReturn.OK
 
-    # Buffer in numpy-Array umwandeln
-    success, map_info = buffer.map(Gst.MapFlags.READ)
-    if not success:
-        return Gst.FlowReturn.ERROR
-
-    try:
-        # Annahme: RGB, 3 Kanäle
-        frame = np.ndarray(
-            (height, width, 3), buffer=map_info.data, dtype=np.uint8
-        ).copy()  # copy, da map_info.data readonly ist
-
-        # Einfachen roten Kreis in die Mitte zeichnen
-        center = (width // 2, height // 2)
-        cv2.circle(frame, center, 50, (255, 0, 0), thickness=5)  # Rot, Dicke 5
-
-        # Neues Gst.Buffer aus dem bearbeiteten Frame erstellen
-        out_buffer = Gst.Buffer.new_allocate(None, frame.nbytes, None)
-        out_buffer.fill(0, frame.tobytes())
-        out_buffer.pts = buffer.pts
-        out_buffer.dts = buffer.dts
-        out_buffer.duration = buffer.duration
-
-    finally:
-        buffer.unmap(map_info)
+    # Einfachen roten Kreis in die Mitte zeichnen (direkt im Ausgabe-Buffer)
+    height, width = frame.image.shape[:2]
+    center = (width // 2, height // 2)
+    cv2.circle(frame.image, center, 50, (255, 0, 0), thickness=5)  # Rot, Dicke 5
 
-    # Buffer an appsrc weitergeben
-    appsrc.emit("push-buffer", out_buffer)
+    # Buffer ohne weitere Kopie an appsrc weitergeben
+    push_frame(appsrc, frame)
     return Gst.FlowReturn.OK
 
 
@@ -116,8 +107,10 @@ def main():
     except KeyboardInterrupt:
         print("Interrupted by user, stopping pipelines.")
     finally:
+        OUTPUT_POOL.close()
         pipeline1.set_state(Gst.State.NULL)
         pipeline2.set_state(Gst.State.NULL)
+        print(f"Output buffers: {OUTPUT_POOL.summary()}")
 
 
 if __name__ == "__main__":
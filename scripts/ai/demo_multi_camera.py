@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Multi-camera batched inference server.
+
+One process owns N source pipelines (v4l2src -> appsink) and N sender pipelines
+(appsrc -> kyh264enc -> webrtcsink), as in demo_yolov5_cocksorange.py. Frames of
+all cameras are collected into dynamic batches (at most MAX_BATCH_SIZE frames,
+at most MAX_WAIT_MS after the first frame of a batch), run through one batched
+YOLOv5 call and the detections are routed back to the overlay of each stream.
+"""
+
+import gi
+
+gi.require_version('Gst', '1.0')
+gi.require_version('GstWebRTC', '1.0')
+from gi.repository import Gst, GObject, GLib
+
+from frame_buffers import FrameBufferPool, push_frame, sample_to_frame
+from models import load_yolov5, registry, startup
+from overlay import draw_center_marker, draw_detections
+from pipelines import model_format
+from stages import BatchCollector
+
+# ---- Config ----
+# One entry per camera: (video device, webrtcsink meta name)
+CAMERAS = [
+    ("/dev/video20", "kataglyphis-webfrontend-stream-0"),
+    ("/dev/video22", "kataglyphis-webfrontend-stream-1"),
+]
+SIGNALLER_URI = "ws://0.0.0.0:8443"
+WIDTH = 1280
+HEIGHT = 720
+FPS_NUM = 5
+FPS_DEN = 1
+YOLO_SIZE = 640  # inference resize (tweak for perf/accuracy)
+MODEL_NAME = 'yolov5n'  # or yolov5m, etc.
+FRAME_FORMAT = model_format('yolov5')  # RGB, fed to the model without conversion
+
+# Dynamic batching
+MAX_BATCH_SIZE = len(CAMERAS)
+MAX_WAIT_MS = 20
+
+# Loaded from the local model cache in the background while the pipelines start
+model = registry.model(MODEL_NAME, lambda: load_yolov5(MODEL_NAME, conf=0.25, iou=0.45))
+
+
+def detect_batch(frames):
+    """
+    One YOLOv5 call for the whole batch; results.xyxy[i] belongs to frames[i].
+    """
+    results = model([frame.image for frame in frames], size=YOLO_SIZE)
+    for frame, det in zip(frames, results.xyxy):
+        det = det.cpu().numpy()
+        frame.detections = (det[:, :4], det[:, 4], det[:, 5].astype(int))
+
+
+def make_router(appsrcs):
+    """
+    Returns the BatchCollector sink: draw the detections of a frame and push it
+    into the appsrc of the stream it came from.
+    """
+    def route(stream_id, frame):
+        boxes, confs, cls_ids = frame.detections
+        draw_detections(frame.image, boxes, confs, cls_ids, model.names, FRAME_FORMAT)
+        draw_center_marker(frame.image, channel_order=FRAME_FORMAT)
+        startup.first_frame()
+        push_frame(appsrcs[stream_id], frame)
+    return route
+
+
+def on_new_sample(sink, collector, stream_id, pool):
+    """
+    appsink -> pull sample, copy it into a pooled output buffer (RGB) and hand
+    it to the batch collector.
+    """
+    sample = sink.emit("pull-sample")
+    if not sample:
+        return Gst.FlowReturn.ERROR
+
+    frame = sample_to_frame(sample, WIDTH, HEIGHT, pool=pool)
+    if frame is None:
+        return Gst.FlowReturn.OK  # pool exhausted: drop the frame (counted in pool.dropped)
+
+    collector.submit(stream_id, frame)
+    return Gst.FlowReturn.OK
+
+
+def on_message(bus, message, loop):
+    t = message.type
+    if t == Gst.MessageType.EOS:
+        print("End-Of-Stream")
+        loop.quit()
+    elif t == Gst.MessageType.ERROR:
+        err, debug = message.parse_error()
+        print(f"Error from {message.src.get_name()}: {err} - {debug}")
+        loop.quit()
+
+
+def build_pipelines(device, meta_name):
+    # Source pipeline: v4l2src (YUY2) -> videoconvert -> FRAME_FORMAT (RGB) -> appsink
+    source_str = (
+        f'v4l2src device={device} ! '
+        f'video/x-raw,format=YUY2,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
+        'videoconvert ! '
+        f'video/x-raw,format={FRAME_FORMAT},width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
+        'appsink name=ai_sink emit-signals=true max-buffers=1 drop=true'
+    )
+
+    # Sender pipeline: appsrc (RGB) -> videoconvert -> I420 -> kyh264enc -> h264parse -> capsfilter -> queue -> webrtcsink
+    sender_str = (
+        f'appsrc name=ai_src is-live=true block=true format=time caps=video/x-raw,format={FRAME_FORMAT},width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
+        'videoconvert ! '
+        'video/x-raw,format=I420 ! '
+        'kyh264enc ! '
+        'h264parse config-interval=1 ! '
+        'capsfilter caps="video/x-h264, stream-format=(string)byte-stream,alignment=(string)au, profile=(string)main,level=(string)3.1, coded-picture-structure=(string)frame, chroma-format=(string)4:2:0, bit-depth-luma=(uint)8, bit-depth-chroma=(uint)8, parsed=(boolean)true" ! '
+        'queue ! '
+        f'webrtcsink name=ws congestion-control=disabled signaller::uri="{SIGNALLER_URI}" meta="meta,name={meta_name}"'
+    )
+
+    return Gst.parse_launch(source_str), Gst.parse_launch(sender_str)
+
+
+def main():
+    Gst.init(None)
+
+    loop = GLib.MainLoop()
+    pipelines = []
+    appsrcs = {}
+    pools = {}
+    collector = None
+    try:
+        sinks = {}
+        for stream_id, (device, meta_name) in enumerate(CAMERAS):
+            source, sender = build_pipelines(device, meta_name)
+            if not source or not sender:
+                print(f"Failed to create pipelines for {device}.")
+                return
+            pipelines += [source, sender]
+
+            ai_sink = source.get_by_name("ai_sink")
+            ai_src = sender.get_by_name("ai_src")
+            if not ai_sink or not ai_src:
+                print(f"Failed to get app elements by name for {device}.")
+                return
+            sinks[stream_id] = ai_sink
+            appsrcs[stream_id] = ai_src
+            pools[stream_id] = FrameBufferPool(count=8)
+
+        collector = BatchCollector(
+            detect_batch,
+            make_router(appsrcs),
+            max_batch=MAX_BATCH_SIZE,
+            max_wait=MAX_WAIT_MS / 1000.0,
+        )
+        collector.start()
+        for stream_id, ai_sink in sinks.items():
+            ai_sink.connect("new-sample", on_new_sample, collector, stream_id, pools[stream_id])
+
+        # Message handling
+        for pipeline in pipelines:
+            bus = pipeline.get_bus()
+            bus.add_signal_watch()
+            bus.connect("message", on_message, loop)
+
+        # Load the model in the background while the pipelines start
+        model.preload()
+
+        # Start pipelines
+        for pipeline in pipelines:
+            if pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+                print("Unable to set pipelines to playing state")
+                return
+
+        print(f"Running {len(CAMERAS)} camera pipelines... (Ctrl+C to stop)")
+        loop.run()
+    except KeyboardInterrupt:
+        print("Interrupted by user, stopping pipelines.")
+    finally:
+        for pool in pools.values():
+            pool.close()
+        for pipeline in pipelines[::2]:
+            pipeline.set_state(Gst.State.NULL)
+        if collector is not None:
+            collector.stop()
+            print(f"Batches: {collector.batches}, mean batch size: {collector.mean_batch_size:.2f}, "
+                  f"frames replaced while waiting: {collector.dropped}")
+        for stream_id, pool in pools.items():
+            print(f"Output buffers of stream {stream_id}: {pool.summary()}")
+        for pipeline in pipelines[1::2]:
+            pipeline.set_state(Gst.State.NULL)
+
+
+if __name__ == "__main__":
+    main()
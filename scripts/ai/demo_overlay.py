@@ -1,15 +1,88 @@
 #!/usr/bin/env python3
 """
-Python script to run a GStreamer pipeline with a properly configured cairooverlay.
+Python script to run a GStreamer pipeline with a properly configured overlay.
 Ensures the video feed retains color and adds a simple overlay.
+
+OVERLAY_MODE 'cached' renders the overlay once with cairo into an ARGB surface
+and hands it to gdkpixbufoverlay, which blends it into every frame in C: no
+Python runs per frame, and the surface is only re-rendered when the text
+changes (CachedOverlay.set_text). 'callback' is the previous cairooverlay draw
+callback, which re-renders the text in Python on every frame.
 """
 
 import sys
+
+import cairo
 import gi
+import numpy as np
 
 gi.require_version("Gst", "1.0")
 gi.require_version("GstWebRTC", "1.0")
-from gi.repository import GObject, Gst
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf, GLib, GObject, Gst
+
+OVERLAY_MODE = "cached"  # 'cached' (gdkpixbufoverlay) or 'callback' (cairooverlay)
+OVERLAY_TEXT = "Sample Overlay"
+FONT_SIZE = 36
+TEXT_POSITION = (50, 50)  # baseline of the text, as in draw_overlay
+
+
+class CachedOverlay:
+    """
+    Overlay text rendered into a cached surface that gdkpixbufoverlay blends
+    into the video. The surface only covers the text, so blending is cheap.
+    """
+
+    def __init__(self, element, text, font_size=FONT_SIZE, position=TEXT_POSITION, color=(1.0, 0.0, 0.0, 1.0)):
+        self.element = element
+        self.font_size = font_size
+        self.position = position
+        self.color = color
+        self.text = None
+        self.renders = 0
+        self.set_text(text)
+
+    def set_text(self, text):
+        """Re-render and upload the surface, only if the text changed."""
+        if text == self.text:
+            return
+        self.text = text
+        pixbuf, left, top = self.render()
+        self.element.set_property("offset-x", left)
+        self.element.set_property("offset-y", top)
+        self.element.set_property("pixbuf", pixbuf)
+        self.renders += 1
+
+    def _select_font(self, context):
+        context.select_font_face("Sans", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+        context.set_font_size(self.font_size)
+
+    def render(self):
+        """Cairo ARGB surface of the text -> GdkPixbuf and its position in the frame."""
+        measure = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+        self._select_font(measure)
+        x_bearing, y_bearing, width, height, _, _ = measure.text_extents(self.text)
+        width, height = max(int(width) + 2, 1), max(int(height) + 2, 1)
+
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        context = cairo.Context(surface)
+        self._select_font(context)
+        context.set_source_rgba(*self.color)
+        context.move_to(1 - x_bearing, 1 - y_bearing)
+        context.show_text(self.text)
+        surface.flush()
+
+        # cairo: premultiplied BGRA (little endian), GdkPixbuf: straight RGBA
+        bgra = np.ndarray((height, surface.get_stride() // 4, 4), np.uint8, surface.get_data())[:, :width]
+        alpha = bgra[..., 3:].astype(np.float32)
+        rgb = np.where(alpha > 0, bgra[..., 2::-1] * 255.0 / np.maximum(alpha, 1), 0)
+        rgba = np.concatenate([rgb.round().astype(np.uint8), bgra[..., 3:]], axis=2)
+        pixbuf = GdkPixbuf.Pixbuf.new_from_bytes(
+            GLib.Bytes.new(rgba.tobytes()), GdkPixbuf.Colorspace.RGB, True, 8, width, height, width * 4
+        )
+        left = self.position[0] + int(x_bearing) - 1
+        top = self.position[1] + int(y_bearing) - 1
+        return pixbuf, max(left, 0), max(top, 0)
 
 
 def draw_overlay(overlay, context, timestamp, duration):
@@ -19,9 +92,9 @@ def draw_overlay(overlay, context, timestamp, duration):
     # Set a red color (RGBA) and draw sample text
     context.set_source_rgba(1.0, 0.0, 0.0, 1.0)  # Red color with full opacity
     context.select_font_face("Sans", 0, 0)
-    context.set_font_size(36)
-    context.move_to(50, 50)
-    context.show_text("Sample Overlay")
+    context.set_font_size(FONT_SIZE)
+    context.move_to(*TEXT_POSITION)
+    context.show_text(OVERLAY_TEXT)
     context.stroke()
 
 
@@ -46,10 +119,14 @@ def main():
     Gst.init(None)
 
     # Define the pipeline using gst-launch syntax
+    if OVERLAY_MODE == "cached":
+        overlay_element = "gdkpixbufoverlay name=overlay"
+    else:
+        overlay_element = "cairooverlay name=overlay"
     launch_description = (
         'webrtcsink name=ws meta="meta,name=kataglyphiswebfrontend-webfrontend-stream" '
         "pylonsrc ! video/x-raw,format=RGB  ! videoconvert ! video/x-raw,format=BGRA ! "
-        "cairooverlay name=overlay ! videoconvert ! video/x-raw,format=I420 ! ws. "
+        f"{overlay_element} ! videoconvert ! video/x-raw,format=I420 ! ws. "
         "audiotestsrc ! ws."
     )
 
@@ -60,12 +137,15 @@ def main():
         print(f"Failed to create pipeline: {e}")
         sys.exit(1)
 
-    # Get the cairooverlay element and attach the drawing callback
+    # Get the overlay element: either hand it the cached surface or attach the drawing callback
     overlay = pipeline.get_by_name("overlay")
     if not overlay:
-        print("Failed to find cairooverlay element in the pipeline.")
+        print("Failed to find the overlay element in the pipeline.")
         sys.exit(1)
-    overlay.connect("draw", draw_overlay)
+    if OVERLAY_MODE == "cached":
+        cached = CachedOverlay(overlay, OVERLAY_TEXT)
+    else:
+        overlay.connect("draw", draw_overlay)
 
     # Create a GLib MainLoop
     loop = GObject.MainLoop()
@@ -90,6 +170,8 @@ def main():
     finally:
         # Clean up
         pipeline.set_state(Gst.State.NULL)
+        if OVERLAY_MODE == "cached":
+            print(f"Overlay surface rendered {cached.renders} time(s)")
 
 
 if __name__ == "__main__":
@@ -1,17 +1,25 @@
 #!/usr/bin/env python3
+"""
+Orange Pi USB camera, YOLO11, kyh264enc, webrtcsink.
+
+Frozen reference script, kept as it was deployed and no longer extended; new
+work goes into run.py and the device profiles. The maintained equivalent is
+
+    python run.py profiles/cocksorange_yolo11.toml
+"""
 import gi
 import sys
-import torch
-import numpy as np
-import cv2
-
-# Ultralytics YOLO11
-from ultralytics import YOLO
 
 gi.require_version('Gst', '1.0')
 gi.require_version('GstWebRTC', '1.0')
 from gi.repository import Gst, GObject, GLib
 
+from detectors import lazy_detector
+from frame_buffers import FrameBufferPool, push_frame, sample_to_frame
+from models import startup
+from overlay import draw_center_marker, draw_detections
+from pipelines import model_format
+
 # ---- Config ----
 VIDEO_DEVICE = "/dev/video20"
 WIDTH = 1280
@@ -20,95 +28,51 @@ FPS_NUM = 5
 FPS_DEN = 1
 YOLO_SIZE = 640  # inference resize (tweak for perf/accuracy)
 MODEL_NAME = 'yolo11n'  # yolo11 variants: yolo11n, yolo11s, yolo11m, yolo11l, yolo11x
+FRAME_FORMAT = model_format('ultralytics')  # RGB, fed to the model without conversion
 
-# Load model once before pipeline
-model_path = MODEL_NAME if MODEL_NAME.endswith('.pt') else MODEL_NAME + '.pt'
-print(f"Loading model {model_path} ...")
-model = YOLO(model_path)  # downloads official weights automatically if needed
-
-# Inference params (we'll pass them per-call)
+# Inference params, resolved once by the inference session
 MODEL_CONF = 0.25
 MODEL_IOU = 0.45
+TORCH_THREADS = None  # intra-op threads, None = torch default (all cores)
+
+# Inference session: device, threads, input size and thresholds are fixed at
+# load time (from the local model cache, in the background while the pipelines
+# start); per frame only detector.infer(frame) runs
+detector = lazy_detector('ultralytics', model_name=MODEL_NAME, imgsz=YOLO_SIZE,
+                         conf=MODEL_CONF, iou=MODEL_IOU, threads=TORCH_THREADS)
+
+# Reusable output buffers: frames are copied once into them and pushed as is
+OUTPUT_POOL = FrameBufferPool(count=8)
 
 
 def on_new_sample(sink, appsrc):
     """
-    appsink -> pull sample, convert to numpy BGR, run YOLO11, draw,
-    then push to appsrc (which will be converted to I420 and encoded).
+    appsink -> pull sample, copy it into a pooled output buffer (RGB), run YOLO11,
+    draw in place, then push the same buffer to appsrc (converted to I420 and encoded).
     """
     sample = sink.emit("pull-sample")
     if not sample:
         return Gst.FlowReturn.ERROR
 
-    buffer = sample.get_buffer()
-    caps = sample.get_caps()
-    struct = caps.get_structure(0)
-    width = struct.get_value('width')
-    height = struct.get_value('height')
+    frame = sample_to_frame(sample, pool=OUTPUT_POOL)
+    if frame is None:
+        return Gst.FlowReturn.OK  # pool exhausted: drop the frame (counted in OUTPUT_POOL.dropped)
 
-    # Map incoming buffer for read
-    success, map_info = buffer.map(Gst.MapFlags.READ)
-    if not success:
-        return Gst.FlowReturn.ERROR
+    # ---- YOLO11 Inference ----
+    # the pipeline negotiates RGB, the model's input order, so the session only
+    # letterboxes
+    boxes, confs, cls_ids = detector.infer(frame.image)
 
-    try:
-        # Build HxWx3 uint8 numpy frame (BGR) — ensure appsink sends BGR
-        frame = np.ndarray((height, width, 3), buffer=map_info.data, dtype=np.uint8).copy()
-
-        # ---- YOLO11 Inference ----
-        # Ultralytics expects RGB images for best compatibility
-        img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        # choose device automatically
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-
-        # run prediction (returns a list-like Results object)
-        results = model.predict(source=img_rgb, imgsz=YOLO_SIZE, conf=MODEL_CONF, iou=MODEL_IOU, device=device)
-
-        if len(results) == 0:
-            detections = []
-        else:
-            res = results[0]
-            # res.boxes.xyxy, res.boxes.conf, res.boxes.cls are accessible
-            if hasattr(res, 'boxes') and len(res.boxes) > 0:
-                boxes = res.boxes.xyxy.cpu().numpy()
-                confs = res.boxes.conf.cpu().numpy()
-                cls_ids = res.boxes.cls.cpu().numpy().astype(int)
-            else:
-                boxes = np.empty((0, 4))
-                confs = np.empty((0,))
-                cls_ids = np.empty((0,), dtype=int)
-
-        # draw detections if any
-        if len(results) and len(boxes):
-            for (x1, y1, x2, y2), conf, cid in zip(boxes, confs, cls_ids):
-                x1, y1, x2, y2 = map(int, (x1, y1, x2, y2))
-                label = model.names[int(cid)] if hasattr(model, 'names') else str(int(cid))
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                text = f"{label} {conf:.2f}"
-                (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-                cv2.rectangle(frame, (x1, y1 - h - 4), (x1 + w, y1), (0, 255, 0), -1)
-                cv2.putText(frame, text, (x1, y1 - 2), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-
-        # (Optional) red circle as before
-        center = (width // 2, height // 2)
-        cv2.circle(frame, center, 50, (255, 0, 0), thickness=5)
-
-        # Pack into Gst.Buffer for appsrc — keep same caps as appsrc (BGR)
-        data = frame.tobytes()
-        out_buffer = Gst.Buffer.new_allocate(None, len(data), None)
-        out_buffer.fill(0, data)
-
-        # Preserve timestamps to keep webrtc timing reasonable
-        out_buffer.pts = buffer.pts
-        out_buffer.dts = buffer.dts
-        out_buffer.duration = buffer.duration
+    # draw detections if any
+    draw_detections(frame.image, boxes, confs, cls_ids, detector.names, channel_order=FRAME_FORMAT)
 
-    finally:
-        buffer.unmap(map_info)
+    # (Optional) red circle as before
+    draw_center_marker(frame.image, channel_order=FRAME_FORMAT)
+
+    startup.first_frame()
 
-    # Push into appsrc pipeline
-    appsrc.emit("push-buffer", out_buffer)
+    # Push the pooled buffer into the appsrc pipeline, no serialisation needed
+    push_frame(appsrc, frame)
     return Gst.FlowReturn.OK
 
 
@@ -126,18 +90,18 @@ def on_message(bus, message, loop):
 def main():
     Gst.init(None)
 
-    # Source pipeline: v4l2src (YUY2) -> videoconvert -> BGR -> appsink
+    # Source pipeline: v4l2src (YUY2) -> videoconvert -> FRAME_FORMAT (RGB) -> appsink
     pipeline1_str = (
         f'v4l2src device={VIDEO_DEVICE} ! '
         f'video/x-raw,format=YUY2,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
         'videoconvert ! '
-        f'video/x-raw,format=BGR,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
+        f'video/x-raw,format={FRAME_FORMAT},width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
         'appsink name=ai_sink emit-signals=true max-buffers=1 drop=true'
     )
 
-    # Sender pipeline: appsrc (BGR) -> videoconvert -> I420 -> kyh264enc -> h264parse -> capsfilter -> queue -> webrtcsink
+    # Sender pipeline: appsrc (RGB) -> videoconvert -> I420 -> kyh264enc -> h264parse -> capsfilter -> queue -> webrtcsink
     pipeline2_str = (
-        f'appsrc name=ai_src is-live=true block=true format=time caps=video/x-raw,format=BGR,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
+        f'appsrc name=ai_src is-live=true block=true format=time caps=video/x-raw,format={FRAME_FORMAT},width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
         'videoconvert ! '
         'video/x-raw,format=I420 ! '
         'kyh264enc ! '
@@ -172,6 +136,9 @@ def main():
     bus1.connect("message", on_message, loop)
     bus2.connect("message", on_message, loop)
 
+    # Load the model in the background while the pipelines start
+    detector.preload()
+
     # Start pipelines
     ret1 = pipeline1.set_state(Gst.State.PLAYING)
     ret2 = pipeline2.set_state(Gst.State.PLAYING)
@@ -187,8 +154,13 @@ def main():
     except KeyboardInterrupt:
         print("Interrupted by user, stopping pipelines.")
     finally:
+        OUTPUT_POOL.close()
         pipeline1.set_state(Gst.State.NULL)
         pipeline2.set_state(Gst.State.NULL)
+        print(f"Output buffers: {OUTPUT_POOL.summary()}")
+        if detector.loaded:
+            print(f"Inference latency: {detector.latency_summary()}")
+            print(f"Per-frame overhead: {detector.overhead_summary()}")
 
 
 if __name__ == "__main__":
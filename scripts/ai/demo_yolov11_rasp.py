@@ -1,17 +1,32 @@
 #!/usr/bin/env python3
+"""
+Raspberry Pi camera, YOLO11 on the CPU, VP8 over webrtcsink.
+
+Frozen reference script, kept as it was deployed and no longer extended; new
+work goes into run.py and the device profiles. The maintained equivalent is
+
+    python run.py profiles/rasp_yolo11.toml
+"""
 import gi
 import sys
-import torch
+import time
 import numpy as np
-import cv2
-
-# Ultralytics YOLO11
-from ultralytics import YOLO
 
 gi.require_version('Gst', '1.0')
 gi.require_version('GstWebRTC', '1.0')
 from gi.repository import Gst, GObject, GLib
 
+from detectors import lazy_detector
+from frame_buffers import FrameBufferPool, push_frame, sample_to_frame
+from models import startup
+from overlay import OverlayRenderer, draw_center_marker, empty_detections
+from pipelines import (
+    Letterbox, appsink_tail, appsrc_head, channel_order, inference_branch, model_format, planar_format,
+)
+from quantize import quantized_path
+from stages import AsyncDetector, Frame, StagePipeline
+from tracker import KeyframeTracker
+
 # ---- Config ----
 # Matches the gst-launch pipeline the user provided:
 WIDTH = 1280
@@ -20,107 +35,200 @@ FPS_NUM = 30
 FPS_DEN = 1
 YOLO_SIZE = 640  # inference resize (tweak for perf/accuracy)
 MODEL_NAME = 'yolo11n'  # yolo11 variants: yolo11n, yolo11s, yolo11m, yolo11l, yolo11x
-
-# Inference params
+# 'ultralytics' (PyTorch) or 'onnx' (ONNX Runtime CPU, no PyTorch needed).
+# Export the ONNX model with: yolo export model=yolo11n.pt format=onnx
+DETECTOR_BACKEND = 'ultralytics'
+ONNX_MODEL_PATH = MODEL_NAME + '.onnx'
+# ONNX backend only: 'fp32', 'fp16', 'int8-dynamic' or 'int8-static'. Loads the
+# variant written by quantize.py; compare_precision.py reports accuracy/latency.
+MODEL_PRECISION = 'fp32'
+CAMERA_FORMAT = 'RGB'  # what libcamerasrc delivers
+# Frames are negotiated in the layout the detector consumes (RGB for both
+# backends, as delivered by libcamerasrc), so neither GStreamer nor Python
+# converts colours. The letterboxed inference branch uses the planar variant
+# (RGBP) for ONNX, which is the NCHW layout of the model input.
+FRAME_FORMAT = model_format(DETECTOR_BACKEND)
+INFERENCE_FORMAT = planar_format(FRAME_FORMAT) if DETECTOR_BACKEND == 'onnx' else FRAME_FORMAT
+
+# Inference params, resolved once by the detector session
 MODEL_CONF = 0.25
 MODEL_IOU = 0.45
+TORCH_THREADS = None  # intra-op threads of the ultralytics backend, None = torch default
+
+# Queue between appsink and the inference worker: 'drop-oldest', 'latest-only' or 'block'
+QUEUE_POLICY = 'drop-oldest'
+QUEUE_SIZE = 2
+
+# 'staged': every frame waits for inference (output fps == inference fps)
+# 'passthrough': every frame is pushed immediately with the latest detections,
+#                inference runs on every Nth frame, N adapted to hit TARGET_FPS
+# 'letterbox':   like 'passthrough', but inference gets its own tee'd branch that
+#                GStreamer letterboxes to YOLO_SIZE x YOLO_SIZE; boxes are mapped
+#                back to WIDTH x HEIGHT for the overlay
+# 'tracking':    like 'staged', but the detector only runs on keyframes (every
+#                KEYFRAME_INTERVAL frames or when a track's confidence decays
+#                below TRACK_MIN_CONF); a Kalman tracker moves the boxes in between
+#                and the overlay shows stable track IDs
+PIPELINE_MODE = 'staged'
+TARGET_FPS = FPS_NUM / FPS_DEN
+LETTERBOX = Letterbox.fit(WIDTH, HEIGHT, YOLO_SIZE)
+KEYFRAME_INTERVAL = 10
+TRACK_MIN_CONF = 0.2
+
+# Synthetic frames run through detector and overlay before going live; the
+# first calls are several times slower than steady state
+WARMUP_FRAMES = 3
+
+# Reusable output buffers: frames are copied once into them and pushed as is
+OUTPUT_POOL = FrameBufferPool(count=8)
+
+# Overlay with cached label sprites, much cheaper than per-box cv2 text calls
+# in crowded scenes (see bench_overlay.py)
+RENDERER = OverlayRenderer(channel_order(FRAME_FORMAT))
+
+# The model is loaded in the background while the pipelines start (see main),
+# weights come from the local model cache
+if DETECTOR_BACKEND == 'onnx':
+    detector = lazy_detector('onnx', model_path=quantized_path(ONNX_MODEL_PATH, MODEL_PRECISION),
+                             channel_order=FRAME_FORMAT,
+                             imgsz=YOLO_SIZE, conf=MODEL_CONF, iou=MODEL_IOU)
+else:
+    detector = lazy_detector(DETECTOR_BACKEND, model_name=MODEL_NAME, threads=TORCH_THREADS,
+                             imgsz=YOLO_SIZE, conf=MODEL_CONF, iou=MODEL_IOU)
+
+def detect(frame):
+    """
+    Inference stage: run the detector on the frame and attach (boxes, confs, cls_ids).
+    """
+    frame.detections = detector(frame.image)
+    return frame
+
+
+def detect_letterboxed(frame):
+    """
+    Inference on a letterboxed YOLO_SIZE frame of the inference branch, with the
+    boxes mapped back to display resolution.
+    """
+    detect(frame)
+    boxes, confs, cls_ids = frame.detections
+    frame.detections = (LETTERBOX.to_source(boxes), confs, cls_ids)
+    return frame
+
+
+def track(frame, keyframe_tracker):
+    """
+    Tracking stage: detector on keyframes only, tracked boxes and IDs on every frame.
+    """
+    frame.detections, frame.extra["track_ids"] = keyframe_tracker(frame.image)
+    return frame
+
+
+def annotate(frame):
+    """
+    Overlay stage: draw detections and the red circle in the negotiated layout.
+    """
+    order = channel_order(FRAME_FORMAT)
+    boxes, confs, cls_ids = frame.detections
+    # passthrough frames can arrive before the model finished loading
+    names = detector.names if detector.loaded else None
+    RENDERER.draw(frame.image, boxes, confs, cls_ids, names, frame.extra.get("track_ids"))
+    # (Optional) red circle as before
+    draw_center_marker(frame.image, radius=30, thickness=3, channel_order=order)
+    return frame
+
+
+def push(appsrc, frame):
+    """
+    Push an annotated frame into the sender pipeline.
+    """
+    if detector.loaded:
+        startup.first_frame()
+    return push_frame(appsrc, frame)
+
+
+def warm_up(model):
+    """
+    Run WARMUP_FRAMES synthetic frames in the negotiated layout through the
+    loaded detector ``model`` and the overlay, so that the first live frames do
+    not stall the stream. Warm-up latency is reported apart from steady-state
+    latency. Registered with detector.on_load, so it runs right after the
+    model is loaded; main waits for both before the pipelines go to PLAYING.
+    """
+    if PIPELINE_MODE == 'letterbox':
+        size = LETTERBOX.size
+        shape = (3, size, size) if INFERENCE_FORMAT != FRAME_FORMAT else (size, size, 3)
+    else:
+        shape = (HEIGHT, WIDTH, 3)
+    inference_ms = [t * 1000 for t in model.warm_up(shape, WARMUP_FRAMES)]
+
+    boxes = np.array([[100, 100, 300, 400], [600, 200, 900, 500]], dtype=np.float32)
+    detections = (boxes, np.array([0.9, 0.5]), np.array([0, 1]))
+    overlay_ms = []
+    for _ in range(WARMUP_FRAMES):
+        frame = Frame(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8), 0, 0, 0, detections=detections)
+        start = time.perf_counter()
+        annotate(frame)
+        overlay_ms.append((time.perf_counter() - start) * 1000)
+    print(
+        f"Warm-up: inference {', '.join(f'{t:.0f}' for t in inference_ms)} ms, "
+        f"overlay {', '.join(f'{t:.1f}' for t in overlay_ms)} ms"
+    )
+    startup.mark("warm-up done")
 
-# Load model once before pipeline
-model_path = MODEL_NAME if MODEL_NAME.endswith('.pt') else MODEL_NAME + '.pt'
-print(f"Loading model {model_path} ...")
-model = YOLO(model_path)  # downloads official weights automatically if needed
 
-def on_new_sample(sink, appsrc):
+def on_new_sample(sink, stage_pipeline):
     """
-    appsink -> pull sample, convert to numpy BGR, run YOLO11, draw,
-    then push to appsrc (which will be converted to I420 and encoded).
+    appsink -> pull sample, copy it into a pooled output buffer and hand
+    it to the inference worker. Nothing heavy runs on the streaming thread.
     """
     sample = sink.emit("pull-sample")
     if not sample:
         return Gst.FlowReturn.ERROR
 
-    buffer = sample.get_buffer()
-    caps = sample.get_caps()
-    if not caps:
-        return Gst.FlowReturn.ERROR
+    frame = sample_to_frame(sample, WIDTH, HEIGHT, pool=OUTPUT_POOL)
+    if frame is None:
+        return Gst.FlowReturn.OK  # pool exhausted: drop the frame (counted in OUTPUT_POOL.dropped)
 
-    struct = caps.get_structure(0)
-    # Try to read width/height from caps (fallback to constants)
-    try:
-        width = struct.get_value('width') or WIDTH
-        height = struct.get_value('height') or HEIGHT
-    except Exception:
-        width = WIDTH
-        height = HEIGHT
-
-    # Map incoming buffer for read
-    success, map_info = buffer.map(Gst.MapFlags.READ)
-    if not success:
-        return Gst.FlowReturn.ERROR
+    stage_pipeline.submit(frame)
+    return Gst.FlowReturn.OK
 
-    try:
-        # Build HxWx3 uint8 numpy frame (BGR) — ensure appsink sends BGR
-        frame = np.ndarray((height, width, 3), buffer=map_info.data, dtype=np.uint8).copy()
 
-        # ---- YOLO11 Inference ----
-        # Ultralytics expects RGB images for best compatibility
-        img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+def on_new_sample_passthrough(sink, async_detector, appsrc, offer=True):
+    """
+    appsink -> pull sample, offer it to the async detector when due (unless the
+    detector is fed by a separate inference branch), draw the most recent
+    detections and push it to appsrc right away.
+    """
+    sample = sink.emit("pull-sample")
+    if not sample:
+        return Gst.FlowReturn.ERROR
 
-        # choose device automatically
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    frame = sample_to_frame(sample, WIDTH, HEIGHT, pool=OUTPUT_POOL)
+    if frame is None:
+        return Gst.FlowReturn.OK  # pool exhausted: drop the frame (counted in OUTPUT_POOL.dropped)
 
-        # run prediction (returns a list-like Results object)
-        results = model.predict(source=img_rgb, imgsz=YOLO_SIZE, conf=MODEL_CONF, iou=MODEL_IOU, device=device)
+    if offer:
+        async_detector.offer(frame)
+    detections, _ = async_detector.latest()
+    frame.detections = detections if detections is not None else empty_detections()
+    annotate(frame)
+    return push(appsrc, frame)
 
-        if len(results) == 0:
-            boxes = np.empty((0, 4))
-            confs = np.empty((0,))
-            cls_ids = np.empty((0,), dtype=int)
-        else:
-            res = results[0]
-            if hasattr(res, 'boxes') and len(res.boxes) > 0:
-                # move to cpu and numpy
-                boxes = res.boxes.xyxy.cpu().numpy()
-                confs = res.boxes.conf.cpu().numpy()
-                cls_ids = res.boxes.cls.cpu().numpy().astype(int)
-            else:
-                boxes = np.empty((0, 4))
-                confs = np.empty((0,))
-                cls_ids = np.empty((0,), dtype=int)
-
-        # draw detections if any
-        if len(boxes):
-            for (x1, y1, x2, y2), conf, cid in zip(boxes, confs, cls_ids):
-                x1, y1, x2, y2 = map(int, (x1, y1, x2, y2))
-                label = model.names[int(cid)] if hasattr(model, 'names') else str(int(cid))
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                text = f"{label} {conf:.2f}"
-                (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-                cv2.rectangle(frame, (x1, y1 - h - 4), (x1 + w, y1), (0, 255, 0), -1)
-                cv2.putText(frame, text, (x1, y1 - 2), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-
-        # (Optional) red circle as before
-        center = (width // 2, height // 2)
-        cv2.circle(frame, center, 30, (255, 0, 0), thickness=3)
-
-        # Pack into Gst.Buffer for appsrc — keep same caps as appsrc (BGR)
-        data = frame.tobytes()
-        out_buffer = Gst.Buffer.new_allocate(None, len(data), None)
-        out_buffer.fill(0, data)
-
-        # Preserve timestamps to keep webrtc timing reasonable
-        out_buffer.pts = buffer.pts
-        out_buffer.dts = buffer.dts
-        out_buffer.duration = buffer.duration
 
-    finally:
-        buffer.unmap(map_info)
+def on_inference_sample(sink, async_detector):
+    """
+    Inference branch appsink -> pull the letterboxed sample and offer it to the
+    async detector. The small frame is already a private copy.
+    """
+    sample = sink.emit("pull-sample")
+    if not sample:
+        return Gst.FlowReturn.ERROR
 
-    # Push into appsrc pipeline
-    ret = appsrc.emit("push-buffer", out_buffer)
-    if ret != Gst.FlowReturn.OK:
-        print("Warning: push-buffer returned", ret)
-        return ret
+    frame = sample_to_frame(sample, YOLO_SIZE, YOLO_SIZE)
+    if frame is None:
+        return Gst.FlowReturn.ERROR
+
+    async_detector.offer(frame, copy=lambda image: image)
     return Gst.FlowReturn.OK
 
 def on_message(bus, message, loop):
@@ -137,21 +245,28 @@ def on_message(bus, message, loop):
 def main():
     Gst.init(None)
 
-    # Source pipeline: libcamerasrc -> videoflip rotate-180 -> videoconvert -> BGR -> appsink
+    # Source pipeline: libcamerasrc -> videoflip rotate-180 -> (videoconvert) -> FRAME_FORMAT -> appsink
     pipeline1_str = (
         f'libcamerasrc ! '
-        f'video/x-raw,format=RGB,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
+        f'video/x-raw,format={CAMERA_FORMAT},width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
         'videoflip method=rotate-180 ! '
-        'videoconvert ! '
-        f'video/x-raw,format=BGR,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
-        'appsink name=ai_sink emit-signals=true max-buffers=1 drop=true'
     )
-
-    # Sender pipeline: appsrc (BGR) -> videoconvert -> I420 -> vp8enc -> webrtcsink
+    if PIPELINE_MODE == 'letterbox':
+        # full resolution -> ai_sink (display/encoder), letterboxed YOLO_SIZE -> ai_infer_sink
+        pipeline1_str += (
+            'tee name=t '
+            't. ! queue ! '
+            + appsink_tail(CAMERA_FORMAT, FRAME_FORMAT, WIDTH, HEIGHT, FPS_NUM, FPS_DEN)
+            + ' '
+            + inference_branch(LETTERBOX, INFERENCE_FORMAT)
+        )
+    else:
+        pipeline1_str += appsink_tail(CAMERA_FORMAT, FRAME_FORMAT, WIDTH, HEIGHT, FPS_NUM, FPS_DEN)
+
+    # Sender pipeline: appsrc (FRAME_FORMAT) -> videoconvert -> I420 -> vp8enc -> webrtcsink
     pipeline2_str = (
-        f'appsrc name=ai_src is-live=true block=true format=time caps=video/x-raw,format=BGR,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
-        'videoconvert ! '
-        'video/x-raw,format=I420 ! '
+        appsrc_head(FRAME_FORMAT, WIDTH, HEIGHT, FPS_NUM, FPS_DEN)
+        + 'video/x-raw,format=I420 ! '
         'queue ! '
         'vp8enc deadline=1 threads=2 ! '
         'queue ! '
@@ -171,8 +286,35 @@ def main():
         print("Failed to get app elements by name.")
         return
 
-    # Connect appsink new-sample -> on_new_sample, pass ai_src as user_data
-    ai_sink.connect("new-sample", on_new_sample, ai_src)
+    if PIPELINE_MODE == 'letterbox':
+        # display branch: every frame -> overlay (latest detections) -> push
+        # inference branch: letterboxed frames -> async detector
+        ai_infer_sink = pipeline1.get_by_name("ai_infer_sink")
+        if not ai_infer_sink:
+            print("Failed to get inference appsink by name.")
+            return
+        worker = AsyncDetector(detect_letterboxed, TARGET_FPS)
+        ai_sink.connect("new-sample", on_new_sample_passthrough, worker, ai_src, False)
+        ai_infer_sink.connect("new-sample", on_inference_sample, worker)
+    elif PIPELINE_MODE == 'passthrough':
+        # every frame -> overlay (latest detections) -> push, inference every Nth frame
+        worker = AsyncDetector(detect, TARGET_FPS)
+        ai_sink.connect("new-sample", on_new_sample_passthrough, worker, ai_src)
+    else:
+        # capture -> inference (or tracking) -> overlay -> push, fed by appsink new-sample
+        if PIPELINE_MODE == 'tracking':
+            keyframe_tracker = KeyframeTracker(detector, KEYFRAME_INTERVAL, TRACK_MIN_CONF)
+            first_stage = ("tracking", lambda frame: track(frame, keyframe_tracker))
+        else:
+            first_stage = ("inference", detect)
+        worker = StagePipeline(
+            [first_stage, ("overlay", annotate)],
+            sink=lambda frame: push(ai_src, frame),
+            maxsize=QUEUE_SIZE,
+            policy=QUEUE_POLICY,
+        )
+        ai_sink.connect("new-sample", on_new_sample, worker)
+    worker.start()
 
     # Message handling
     loop = GLib.MainLoop()
@@ -183,6 +325,14 @@ def main():
     bus1.connect("message", on_message, loop)
     bus2.connect("message", on_message, loop)
 
+    # Load and warm up the model in the background while the pipelines get
+    # ready, then wait for both before any live frame arrives
+    detector.on_load(warm_up)
+    detector.preload()
+    pipeline1.set_state(Gst.State.READY)
+    pipeline2.set_state(Gst.State.READY)
+    detector.load()
+
     # Start pipelines
     ret1 = pipeline1.set_state(Gst.State.PLAYING)
     ret2 = pipeline2.set_state(Gst.State.PLAYING)
@@ -190,16 +340,32 @@ def main():
         print("Unable to set pipelines to playing state")
         pipeline1.set_state(Gst.State.NULL)
         pipeline2.set_state(Gst.State.NULL)
+        worker.stop()
         return
 
+    startup.mark("pipelines PLAYING")
+
     try:
         print("Running pipelines... (Ctrl+C to stop)")
         loop.run()
     except KeyboardInterrupt:
         print("Interrupted by user, stopping pipelines.")
     finally:
+        OUTPUT_POOL.close()
         pipeline1.set_state(Gst.State.NULL)
+        worker.stop()
         pipeline2.set_state(Gst.State.NULL)
+        if PIPELINE_MODE in ('passthrough', 'letterbox'):
+            print(f"Inference ran on {worker.inferred}/{worker.offered} frames (stride {worker.stride.stride})")
+        else:
+            print(f"Frames dropped before inference: {worker.dropped}")
+        if PIPELINE_MODE == 'tracking':
+            print(f"Tracking: {keyframe_tracker.summary()}")
+        if detector.loaded:
+            print(f"Inference latency: {detector.latency_summary()}")
+            print(f"Per-frame overhead: {detector.overhead_summary()}")
+        print(f"Cold start: {startup.summary()}")
+        print(f"Output buffers: {OUTPUT_POOL.summary()}")
 
 if __name__ == "__main__":
     main()
@@ -1,82 +1,72 @@
 #!/usr/bin/env python3
+"""
+USB webcam, YOLOv5s via torch.hub, webrtcsink.
+
+Frozen reference script, kept as it was deployed and no longer extended; new
+work goes into run.py and the device profiles. The maintained equivalent is
+
+    python run.py profiles/usb_yolov5.toml
+"""
 import gi
 import sys
 
-import torch
-import numpy as np
-import cv2
-
 gi.require_version("Gst", "1.0")
 gi.require_version("GstWebRTC", "1.0")
 from gi.repository import Gst, GObject, GLib
 
-# Load the YOLOv5 model once, ideally before you start the pipeline:
-# (you can choose 'yolov5s', 'yolov5m', etc. depending on your needs)
-model = torch.hub.load("ultralytics/yolov5", "yolov5s", pretrained=True)
-model.conf = 0.25  # confidence threshold (optional)
-model.iou = 0.45  # NMS IoU threshold (optional)
+from frame_buffers import FrameBufferPool, push_frame, sample_to_frame
+from models import load_yolov5, registry, startup
+from overlay import draw_center_marker, draw_detections
+from pipelines import model_format
+from stages import StagePipeline
 
+# Queue between appsink and the inference worker: "drop-oldest", "latest-only" or "block"
+QUEUE_POLICY = "drop-oldest"
+QUEUE_SIZE = 2
 
-def on_new_sample(sink, appsrc):
-    sample = sink.emit("pull-sample")
-    if not sample:
-        return Gst.FlowReturn.ERROR
+# The camera pipeline negotiates RGB, which is what YOLOv5 (AutoShape) expects
+FRAME_FORMAT = model_format("yolov5")
 
-    buffer = sample.get_buffer()
-    caps = sample.get_caps()
-    struct = caps.get_structure(0)
-    width = struct.get_value("width")
-    height = struct.get_value("height")
+# Reusable output buffers: frames are copied once into them and pushed as is
+OUTPUT_POOL = FrameBufferPool(count=8)
 
-    success, map_info = buffer.map(Gst.MapFlags.READ)
-    if not success:
-        return Gst.FlowReturn.ERROR
+# Load the YOLOv5 model once, from the local model cache and in the background
+# while the pipelines start (you can choose 'yolov5s', 'yolov5m', etc.)
+model = registry.model("yolov5s", lambda: load_yolov5("yolov5s", conf=0.25, iou=0.45))
 
-    try:
-        # build a HxWx3 uint8 numpy frame (BGR)
-        frame = np.ndarray(
-            (height, width, 3), buffer=map_info.data, dtype=np.uint8
-        ).copy()
-
-        # ---- YOLOv5 Inference ----
-        # convert BGR→RGB
-        img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        # run inference (will return a "Results" object)
-        results = model(img, size=640)  # you can tweak size for speed/accuracy
-
-        # parse detections
-        # results.xyxy[0] is a tensor of [x1, y1, x2, y2, conf, cls]
-        for *box, conf, cls in results.xyxy[0].cpu().numpy():
-            x1, y1, x2, y2 = map(int, box)
-            label = results.names[int(cls)]
-            # draw rectangle (green) and label (white on black bg)
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            text = f"{label} {conf:.2f}"
-            # get text size
-            (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-            # background
-            cv2.rectangle(frame, (x1, y1 - h - 4), (x1 + w, y1), (0, 255, 0), -1)
-            # text
-            cv2.putText(
-                frame, text, (x1, y1 - 2), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1
-            )
-        # ---------------------------
-
-        # (Optional) also draw your red circle
-        center = (width // 2, height // 2)
-        cv2.circle(frame, center, 50, (255, 0, 0), thickness=5)
-
-        # pack back into a Gst.Buffer
-        out_buffer = Gst.Buffer.new_allocate(None, frame.nbytes, None)
-        out_buffer.fill(0, frame.tobytes())
-        out_buffer.pts = buffer.pts
-        out_buffer.dts = buffer.dts
-        out_buffer.duration = buffer.duration
 
-    finally:
-        buffer.unmap(map_info)
+def detect(frame):
+    """Inference stage: run YOLOv5 and attach (boxes, confs, cls_ids) to the frame."""
+    # frame is already RGB, run inference (will return a "Results" object)
+    results = model(frame.image, size=640)  # you can tweak size for speed/accuracy
+
+    # results.xyxy[0] is a tensor of [x1, y1, x2, y2, conf, cls]
+    det = results.xyxy[0].cpu().numpy()
+    frame.detections = (det[:, :4], det[:, 4], det[:, 5].astype(int))
+    return frame
+
 
-    appsrc.emit("push-buffer", out_buffer)
+def annotate(frame):
+    """Overlay stage: draw detections and the red circle."""
+    boxes, confs, cls_ids = frame.detections
+    draw_detections(frame.image, boxes, confs, cls_ids, model.names, FRAME_FORMAT)
+    # (Optional) also draw your red circle
+    draw_center_marker(frame.image, channel_order=FRAME_FORMAT)
+    startup.first_frame()
+    return frame
+
+
+def on_new_sample(sink, stage_pipeline):
+    sample = sink.emit("pull-sample")
+    if not sample:
+        return Gst.FlowReturn.ERROR
+
+    # only copy the frame into an output buffer and enqueue it, inference runs on the worker
+    frame = sample_to_frame(sample, pool=OUTPUT_POOL)
+    if frame is None:
+        return Gst.FlowReturn.OK  # pool exhausted: drop the frame (counted in OUTPUT_POOL.dropped)
+
+    stage_pipeline.submit(frame)
     return Gst.FlowReturn.OK
 
 
@@ -102,13 +92,13 @@ def main():
         "image/jpeg,width=640,height=360,framerate=30/1 ! "
         "jpegdec ! "
         "videoconvert ! "
-        "video/x-raw,format=RGB,width=640,height=360,framerate=30/1 ! "
+        f"video/x-raw,format={FRAME_FORMAT},width=640,height=360,framerate=30/1 ! "
         "appsink name=ai_sink emit-signals=true max-buffers=1 drop=true"
     )
 
     # Pipeline 2: appsrc -> webrtcsink
     pipeline2_str = (
-        "appsrc name=ai_src is-live=true block=true format=time caps=video/x-raw,format=RGB,width=640,height=360,framerate=30/1 ! "
+        f"appsrc name=ai_src is-live=true block=true format=time caps=video/x-raw,format={FRAME_FORMAT},width=640,height=360,framerate=30/1 ! "
         "videoconvert ! "
         'webrtcsink name=ws meta="meta,name=kataglyphiswebfrontend-webfrontend-stream"'
     )
@@ -121,7 +111,16 @@ def main():
 
     ai_sink = pipeline1.get_by_name("ai_sink")
     ai_src = pipeline2.get_by_name("ai_src")
-    ai_sink.connect("new-sample", on_new_sample, ai_src)
+
+    # capture -> inference -> overlay -> push, fed by appsink new-sample
+    stage_pipeline = StagePipeline(
+        [("inference", detect), ("overlay", annotate)],
+        sink=lambda frame: push_frame(ai_src, frame),
+        maxsize=QUEUE_SIZE,
+        policy=QUEUE_POLICY,
+    )
+    stage_pipeline.start()
+    ai_sink.connect("new-sample", on_new_sample, stage_pipeline)
 
     # Message handling für beide Pipelines
     loop = GLib.MainLoop()
@@ -132,11 +131,15 @@ def main():
     bus1.connect("message", on_message, loop)
     bus2.connect("message", on_message, loop)
 
+    # Modell im Hintergrund laden, während die Pipelines starten
+    model.preload()
+
     # Pipelines starten
     ret1 = pipeline1.set_state(Gst.State.PLAYING)
     ret2 = pipeline2.set_state(Gst.State.PLAYING)
     if ret1 == Gst.StateChangeReturn.FAILURE or ret2 == Gst.StateChangeReturn.FAILURE:
         print("Unable to set pipelines to playing state")
+        stage_pipeline.stop()
         return
 
     try:
@@ -145,8 +148,12 @@ def main():
     except KeyboardInterrupt:
         print("Interrupted by user, stopping pipelines.")
     finally:
+        OUTPUT_POOL.close()
         pipeline1.set_state(Gst.State.NULL)
+        stage_pipeline.stop()
         pipeline2.set_state(Gst.State.NULL)
+        print(f"Frames dropped before inference: {stage_pipeline.dropped}")
+        print(f"Output buffers: {OUTPUT_POOL.summary()}")
 
 
 if __name__ == "__main__":
@@ -1,14 +1,25 @@
 #!/usr/bin/env python3
+"""
+Orange Pi USB camera, motion-gated YOLOv5, kyh264enc, webrtcsink.
+
+Frozen reference script, kept as it was deployed and no longer extended; new
+work goes into run.py and the device profiles. The maintained equivalent is
+
+    python run.py profiles/cocksorange_yolov5.toml
+"""
 import gi
 import sys
-import torch
-import numpy as np
-import cv2
 
 gi.require_version('Gst', '1.0')
 gi.require_version('GstWebRTC', '1.0')
 from gi.repository import Gst, GObject, GLib
 
+from frame_buffers import FrameBufferPool, push_frame, sample_to_frame
+from models import load_yolov5, registry, startup
+from motion import MotionGate, MotionGatedDetector
+from overlay import draw_center_marker, draw_detections
+from pipelines import model_format
+
 # ---- Config ----
 VIDEO_DEVICE = "/dev/video20"
 WIDTH = 1280
@@ -17,76 +28,61 @@ FPS_NUM = 5
 FPS_DEN = 1
 YOLO_SIZE = 640  # inference resize (tweak for perf/accuracy)
 MODEL_NAME = 'yolov5n'  # or yolov5m, etc.
+FRAME_FORMAT = model_format('yolov5')  # RGB, fed to the model without conversion
+
+# Loaded from the local model cache in the background while the pipelines start
+model = registry.model(MODEL_NAME, lambda: load_yolov5(MODEL_NAME, conf=0.25, iou=0.45))
+
+# Reusable output buffers: frames are copied once into them and pushed as is
+OUTPUT_POOL = FrameBufferPool(count=8)
+
+# Motion gate: skip YOLO while less than MOTION_THRESHOLD of the (downscaled)
+# frame changed since the last inference, and only infer the changed tiles
+# when the motion is local. Set MOTION_GATE = False to run YOLO on every frame.
+MOTION_GATE = True
+MOTION_THRESHOLD = 0.002
+
 
-# Load model once before pipeline
-model = torch.hub.load('ultralytics/yolov5', MODEL_NAME, pretrained=True)
-model.conf = 0.25
-model.iou = 0.45
+def detect_batch(images):
+    """YOLOv5 on a list of RGB images (full frame or changed tiles)."""
+    results = model(list(images), size=YOLO_SIZE)
+    return [(det[:, :4], det[:, 4], det[:, 5].astype(int)) for det in (d.cpu().numpy() for d in results.xyxy)]
+
+
+if MOTION_GATE:
+    detector = MotionGatedDetector(detect_batch, MotionGate(threshold=MOTION_THRESHOLD))
+else:
+    detector = lambda image: detect_batch([image])[0]
 
 
 def on_new_sample(sink, appsrc):
     """
-    appsink -> pull sample, convert to numpy BGR, run YOLO, draw,
-    then push to appsrc (which will be converted to I420 and encoded).
+    appsink -> pull sample, copy it into a pooled output buffer (RGB), run YOLO,
+    draw in place, then push the same buffer to appsrc (converted to I420 and encoded).
     """
     sample = sink.emit("pull-sample")
     if not sample:
         return Gst.FlowReturn.ERROR
 
-    buffer = sample.get_buffer()
-    caps = sample.get_caps()
-    struct = caps.get_structure(0)
-    width = struct.get_value('width')
-    height = struct.get_value('height')
+    frame = sample_to_frame(sample, pool=OUTPUT_POOL)
+    if frame is None:
+        return Gst.FlowReturn.OK  # pool exhausted: drop the frame (counted in OUTPUT_POOL.dropped)
 
-    # Map incoming buffer for read
-    success, map_info = buffer.map(Gst.MapFlags.READ)
-    if not success:
-        return Gst.FlowReturn.ERROR
+    # ---- YOLOv5 Inference ----
+    # the pipeline negotiates RGB, which is what AutoShape expects; static
+    # frames reuse the previous detections (motion gate)
+    boxes, confs, cls_ids = detector(frame.image)
 
-    try:
-        # Build HxWx3 uint8 numpy frame (BGR) — ensure appsink sends BGR
-        frame = np.ndarray(
-            (height, width, 3),
-            buffer=map_info.data,
-            dtype=np.uint8
-        ).copy()
-
-        # ---- YOLOv5 Inference ----
-        img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = model(img, size=YOLO_SIZE)
-
-        # draw detections
-        if len(results.xyxy) and len(results.xyxy[0]):
-            for *box, conf, cls in results.xyxy[0].cpu().numpy():
-                x1, y1, x2, y2 = map(int, box)
-                label = results.names[int(cls)]
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                text = f"{label} {conf:.2f}"
-                (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-                cv2.rectangle(frame, (x1, y1 - h - 4), (x1 + w, y1), (0, 255, 0), -1)
-                cv2.putText(frame, text, (x1, y1 - 2),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-
-        # (Optional) red circle as before
-        center = (width // 2, height // 2)
-        cv2.circle(frame, center, 50, (255, 0, 0), thickness=5)
-
-        # Pack into Gst.Buffer for appsrc — keep same caps as appsrc (BGR)
-        data = frame.tobytes()
-        out_buffer = Gst.Buffer.new_allocate(None, len(data), None)
-        out_buffer.fill(0, data)
-
-        # Preserve timestamps to keep webrtc timing reasonable
-        out_buffer.pts = buffer.pts
-        out_buffer.dts = buffer.dts
-        out_buffer.duration = buffer.duration
+    # draw detections
+    draw_detections(frame.image, boxes, confs, cls_ids, model.names, FRAME_FORMAT)
 
-    finally:
-        buffer.unmap(map_info)
+    # (Optional) red circle as before
+    draw_center_marker(frame.image, channel_order=FRAME_FORMAT)
+
+    startup.first_frame()
 
-    # Push into appsrc pipeline
-    appsrc.emit("push-buffer", out_buffer)
+    # Push the pooled buffer into the appsrc pipeline, no serialisation needed
+    push_frame(appsrc, frame)
     return Gst.FlowReturn.OK
 
 
@@ -104,18 +100,18 @@ def on_message(bus, message, loop):
 def main():
     Gst.init(None)
 
-    # Source pipeline: v4l2src (YUY2) -> videoconvert -> BGR -> appsink
+    # Source pipeline: v4l2src (YUY2) -> videoconvert -> FRAME_FORMAT (RGB) -> appsink
     pipeline1_str = (
         f'v4l2src device={VIDEO_DEVICE} ! '
         f'video/x-raw,format=YUY2,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
         'videoconvert ! '
-        f'video/x-raw,format=BGR,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
+        f'video/x-raw,format={FRAME_FORMAT},width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
         'appsink name=ai_sink emit-signals=true max-buffers=1 drop=true'
     )
 
-    # Sender pipeline: appsrc (BGR) -> videoconvert -> I420 -> kyh264enc -> h264parse -> capsfilter -> queue -> webrtcsink
+    # Sender pipeline: appsrc (RGB) -> videoconvert -> I420 -> kyh264enc -> h264parse -> capsfilter -> queue -> webrtcsink
     pipeline2_str = (
-        f'appsrc name=ai_src is-live=true block=true format=time caps=video/x-raw,format=BGR,width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
+        f'appsrc name=ai_src is-live=true block=true format=time caps=video/x-raw,format={FRAME_FORMAT},width={WIDTH},height={HEIGHT},framerate={FPS_NUM}/{FPS_DEN} ! '
         'videoconvert ! '
         'video/x-raw,format=I420 ! '
         'kyh264enc ! '
@@ -150,6 +146,9 @@ def main():
     bus1.connect("message", on_message, loop)
     bus2.connect("message", on_message, loop)
 
+    # Load the model in the background while the pipelines start
+    model.preload()
+
     # Start pipelines
     ret1 = pipeline1.set_state(Gst.State.PLAYING)
     ret2 = pipeline2.set_state(Gst.State.PLAYING)
@@ -165,8 +164,12 @@ def main():
     except KeyboardInterrupt:
         print("Interrupted by user, stopping pipelines.")
     finally:
+        OUTPUT_POOL.close()
         pipeline1.set_state(Gst.State.NULL)
         pipeline2.set_state(Gst.State.NULL)
+        print(f"Output buffers: {OUTPUT_POOL.summary()}")
+        if MOTION_GATE:
+            print(f"Motion gate: {detector.summary()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Pluggable object detectors for the demos.
+
+Every backend implements ``predict(frames) -> [(boxes, confs, cls_ids), ...]``
+on a batch of frames: boxes are xyxy float arrays in the coordinates of the
+frame that was passed in, confs floats, cls_ids ints. This is exactly what
+``overlay.draw_detections`` consumes.
+
+    ultralytics -> ultralytics.YOLO (YOLO11/YOLOv8 .pt, PyTorch)
+    yolov5      -> torch.hub ultralytics/yolov5 (PyTorch)
+    onnx        -> ONNX Runtime CPU session on an exported .onnx model
+
+Backends import their framework lazily, so the ONNX backend works without
+PyTorch installed. Use ``create_detector(backend, ...)`` to switch by config,
+or ``lazy_detector(backend, ...)`` to defer loading (see models.py).
+"""
+
+from __future__ import annotations
+
+import ast
+import collections
+import os
+import time
+from typing import Callable, Sequence
+
+import cv2
+import numpy as np
+
+from models import LazyModel, exported_model, load_ultralytics, load_yolov5, registry
+from pipelines import Letterbox, model_format
+from postprocess import decode_batch
+
+Detections = tuple  # (boxes [N,4] xyxy, confs [N], cls_ids [N])
+
+# Per-frame time outside the forward pass (preprocess, postprocess, Python glue)
+OVERHEAD_BUDGET_MS = 3.0
+
+
+class Detector:
+    """
+    Base class: times every ``predict`` call and keeps the recent latencies,
+    backends record their preprocess / forward / postprocess stages with ``_lap``.
+    ``observers`` are called with ``(stage, seconds)`` for every stage and for
+    the whole ``predict`` call (stage "predict"), e.g. by metrics.Metrics.
+    """
+
+    backend = ""
+
+    def __init__(self, imgsz: int = 640, conf: float = 0.25, iou: float = 0.45) -> None:
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.names: dict | Sequence[str] | None = None
+        self.latencies: collections.deque = collections.deque(maxlen=1000)
+        self.warmup_latencies: list[float] = []
+        self.stage_times: dict[str, collections.deque] = {}
+        self.observers: list[Callable[[str, float], None]] = []
+
+    @property
+    def input_format(self) -> str:
+        """Raw video format the backend consumes without conversion."""
+        return model_format(self.backend)
+
+    def _predict(self, frames: Sequence[np.ndarray]) -> list[Detections]:
+        raise NotImplementedError
+
+    def predict(self, frames: Sequence[np.ndarray]) -> list[Detections]:
+        start = time.perf_counter()
+        detections = self._predict(frames)
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        for observer in self.observers:
+            observer("predict", elapsed)
+        return detections
+
+    def __call__(self, frame: np.ndarray) -> Detections:
+        return self.predict([frame])[0]
+
+    infer = __call__
+
+    def _lap(self, stage: str, start: float) -> float:
+        """Record the time since ``start`` for ``stage`` and return the current time."""
+        now = time.perf_counter()
+        self.stage_times.setdefault(stage, collections.deque(maxlen=1000)).append(now - start)
+        for observer in self.observers:
+            observer(stage, now - start)
+        return now
+
+    def warm_up(self, shape: tuple, runs: int = 3, batch: int = 1) -> list[float]:
+        """
+        Run ``runs`` predictions on synthetic frames of ``shape`` (the negotiated
+        frame layout) so that allocator warm-up and kernel selection happen
+        before going live. Their latencies are kept apart in ``warmup_latencies``.
+        """
+        frame = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+        for _ in range(runs):
+            self.predict([frame] * batch)
+        self.warmup_latencies = list(self.latencies)
+        self.latencies.clear()
+        self.stage_times.clear()
+        return self.warmup_latencies
+
+    def latency_summary(self) -> str:
+        warmup = ""
+        if self.warmup_latencies:
+            warmup = f" (warm-up: {', '.join(f'{t * 1000:.0f}' for t in self.warmup_latencies)} ms)"
+        if not self.latencies:
+            return f"{self.backend}: no inferences{warmup}"
+        ms = np.asarray(self.latencies) * 1000.0
+        return (
+            f"{self.backend}: {len(ms)} calls, mean {ms.mean():.1f} ms, "
+            f"p50 {np.percentile(ms, 50):.1f} ms, p95 {np.percentile(ms, 95):.1f} ms{warmup}"
+        )
+
+    def overhead_summary(self) -> str:
+        """Mean time per stage and the per-call overhead outside the forward pass."""
+        if not self.latencies or "forward" not in self.stage_times:
+            return f"{self.backend}: no stage timings"
+        calls = min(len(self.latencies), len(self.stage_times["forward"]))
+        total = np.asarray(self.latencies)[-calls:] * 1000.0
+        overhead = total - np.asarray(self.stage_times["forward"])[-calls:] * 1000.0
+        stages = ", ".join(f"{name} {np.mean(times) * 1000:.2f} ms" for name, times in self.stage_times.items())
+        verdict = "within" if np.percentile(overhead, 95) <= OVERHEAD_BUDGET_MS else "OVER"
+        return (
+            f"{stages}; overhead mean {overhead.mean():.2f} ms, p95 {np.percentile(overhead, 95):.2f} ms "
+            f"({verdict} {OVERHEAD_BUDGET_MS:.1f} ms budget)"
+        )
+
+
+def letterbox_chw(frame: np.ndarray, size: int, channel_order: str = "RGB") -> tuple[np.ndarray, Letterbox]:
+    """Letterbox a packed HxWx3 frame (grey 114 borders) into a 3 x size x size array in ``channel_order``."""
+    height, width = frame.shape[:2]
+    letterbox = Letterbox.fit(width, height, size)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[letterbox.top:letterbox.top + letterbox.height, letterbox.left:letterbox.left + letterbox.width] = (
+        cv2.resize(frame, (letterbox.width, letterbox.height), interpolation=cv2.INTER_LINEAR)
+    )
+    chw = canvas.transpose(2, 0, 1)
+    if channel_order == "BGR":
+        chw = chw[::-1]
+    return chw, letterbox
+
+
+def configure_torch_threads(threads: int | None = None, interop_threads: int | None = None) -> None:
+    """Set torch's intra-/inter-op thread counts once, before the first forward pass."""
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # only allowed before any inter-op parallel work started
+            print(f"torch inter-op threads already fixed at {torch.get_num_interop_threads()}")
+
+
+class UltralyticsDetector(Detector):
+    """
+    YOLO11/YOLOv8 weights of ``ultralytics.YOLO`` as an inference session:
+    device, threads, input size and thresholds are resolved once here, the
+    input tensor is preallocated, and every call runs only letterbox ->
+    forward -> postprocess.decode_batch. ``model.predict`` re-validates its
+    arguments and rebuilds the source on every call, so it is not used.
+    Frames are RGB, the model's input order; pass ``channel_order="BGR"`` for
+    cv2 frames.
+    """
+
+    backend = "ultralytics"
+
+    def __init__(
+        self,
+        model_name: str = "yolo11n",
+        device: str | None = None,
+        threads: int | None = None,
+        interop_threads: int | None = None,
+        half: bool = False,
+        channel_order: str = "RGB",
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        import torch
+
+        configure_torch_threads(threads, interop_threads)
+        yolo = load_ultralytics(model_name)  # official weights are downloaded into the cache once
+        self.names = getattr(yolo, "names", None)
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.half = half and self.device.type == "cuda"
+        self.model = yolo.model.fuse(verbose=False).to(self.device).eval()
+        if self.half:
+            self.model.half()
+        self.channel_order = channel_order
+        self._torch = torch
+        self._input = torch.empty((1, 3, self.imgsz, self.imgsz), dtype=torch.float16 if self.half else torch.float32, device=self.device)
+
+    def _predict(self, frames):
+        torch = self._torch
+        start = time.perf_counter()
+        chws, letterboxes = zip(*(letterbox_chw(frame, self.imgsz, self.channel_order) for frame in frames))
+        if self._input.shape[0] != len(chws):
+            self._input = self._input.new_empty((len(chws), 3, self.imgsz, self.imgsz))
+        self._input.copy_(torch.from_numpy(np.ascontiguousarray(np.stack(chws))))
+        self._input.mul_(1.0 / 255.0)
+        start = self._lap("preprocess", start)
+
+        with torch.inference_mode():
+            outputs = self.model(self._input)
+        outputs = outputs[0] if isinstance(outputs, (list, tuple)) else outputs
+        outputs = outputs.float().cpu().numpy()  # synchronises with the device
+        start = self._lap("forward", start)
+
+        detections = [
+            (letterbox.to_source(boxes), confs, cls_ids)
+            for (boxes, confs, cls_ids), letterbox in zip(decode_batch(outputs, self.conf, self.iou), letterboxes)
+        ]
+        self._lap("postprocess", start)
+        return detections
+
+    @property
+    def input_format(self) -> str:
+        return self.channel_order
+
+
+class Yolov5Detector(Detector):
+    """YOLOv5 through ``torch.hub`` (the code the YOLOv5 demos used)."""
+
+    backend = "yolov5"
+
+    def __init__(
+        self,
+        model_name: str = "yolov5n",
+        threads: int | None = None,
+        interop_threads: int | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        configure_torch_threads(threads, interop_threads)
+        self.model = load_yolov5(model_name, self.conf, self.iou)
+        self.names = self.model.names
+
+    def _predict(self, frames):
+        results = self.model(list(frames), size=self.imgsz)
+        detections = []
+        for det in results.xyxy:
+            det = det.cpu().numpy()
+            detections.append((det[:, :4], det[:, 4], det[:, 5].astype(int)))
+        return detections
+
+
+class OnnxDetector(Detector):
+    """
+    Exported YOLO model on ONNX Runtime (CPU). Accepts packed HxWx3 frames,
+    which are letterboxed here, or planar 3xSxS frames that GStreamer already
+    letterboxed to the model size (see pipelines.inference_branch). If
+    ``model_path`` does not exist and ``model_name`` is given, the model is
+    exported into the model cache on first use (models.exported_model).
+    """
+
+    backend = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        channel_order: str = "RGB",
+        providers: Sequence[str] | None = None,
+        intra_op_threads: int | None = None,
+        model_name: str | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        import onnxruntime as ort
+
+        if model_name and not os.path.exists(model_path):
+            model_path = exported_model(model_name, "onnx", self.imgsz)
+
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, options, providers=list(providers or ["CPUExecutionProvider"]))
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        if isinstance(model_input.shape[2], int):
+            self.imgsz = model_input.shape[2]
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        # fp16 exports without keep_io_types take half precision input
+        self.input_dtype = np.float16 if model_input.type == "tensor(float16)" else np.float32
+        self.channel_order = channel_order
+
+        names = self.session.get_modelmeta().custom_metadata_map.get("names")
+        self.names = ast.literal_eval(names) if names else None
+
+    @property
+    def input_format(self) -> str:
+        return self.channel_order
+
+    def _to_chw(self, frame: np.ndarray) -> tuple[np.ndarray, Letterbox | None]:
+        if frame.shape == (3, self.imgsz, self.imgsz):
+            return frame, None
+        return letterbox_chw(frame, self.imgsz, self.channel_order)
+
+    def _predict(self, frames):
+        start = time.perf_counter()
+        chws, letterboxes = zip(*(self._to_chw(frame) for frame in frames))
+        blob = np.stack(chws).astype(np.float32)
+        blob *= 1.0 / 255.0
+        blob = blob.astype(self.input_dtype, copy=False)
+        start = self._lap("preprocess", start)
+        if self.dynamic_batch or len(frames) == 1:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: blob[i:i + 1]})[0] for i in range(len(blob))])
+        start = self._lap("forward", start)
+
+        detections = []
+        for (boxes, confs, cls_ids), letterbox in zip(decode_batch(outputs, self.conf, self.iou), letterboxes):
+            if letterbox is not None:
+                boxes = letterbox.to_source(boxes)
+            detections.append((boxes, confs, cls_ids))
+        self._lap("postprocess", start)
+        return detections
+
+
+BACKENDS = {
+    "ultralytics": UltralyticsDetector,
+    "yolov5": Yolov5Detector,
+    "onnx": OnnxDetector,
+}
+
+
+def create_detector(backend: str, **kwargs) -> Detector:
+    """Instantiate a detector backend by name, e.g. ``create_detector("onnx", model_path="yolo11n.onnx")``."""
+    try:
+        cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown detector backend {backend!r}, expected one of {sorted(BACKENDS)}") from None
+    return cls(**kwargs)
+
+
+def lazy_detector(backend: str, **kwargs) -> LazyModel:
+    """
+    Shared, lazily created detector: loads on first use or in the background
+    after ``.preload()``, and is created only once per backend and arguments.
+    """
+    key = f"{backend}({', '.join(f'{k}={v!r}' for k, v in sorted(kwargs.items()))})"
+    return registry.model(key, lambda: create_detector(backend, **kwargs))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+COCO-style mean average precision between two sets of per-frame detections.
+
+Used to measure how far a model variant (quantised, smaller input size, ...)
+drifts from a reference. Without labelled data the reference detections of
+the FP32 model serve as ground truth, so the number is "agreement with the
+reference model" rather than absolute accuracy.
+
+Detections are the usual (boxes xyxy, confs, cls_ids) tuples, one per frame.
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+from postprocess import box_iou
+
+COCO_IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """Area under the precision/recall curve, 101-point interpolation as in COCO."""
+    envelope = np.maximum.accumulate(np.concatenate([precision, [0.0]])[::-1])[::-1]
+    points = np.linspace(0, 1, 101)
+    idx = np.searchsorted(recall, points, side="left")
+    return float(np.where(idx < len(recall), envelope[np.minimum(idx, len(envelope) - 1)], 0.0).mean())
+
+
+def _match(pred_boxes, pred_confs, ref_boxes, thresholds) -> np.ndarray:
+    """True positive flags (T, P) of one frame and class, predictions in score order."""
+    tp = np.zeros((len(thresholds), len(pred_boxes)), dtype=bool)
+    if not len(pred_boxes) or not len(ref_boxes):
+        return tp
+    ious = box_iou(pred_boxes, ref_boxes)
+    order = np.argsort(-pred_confs, kind="stable")
+    for t, threshold in enumerate(thresholds):
+        taken = np.zeros(len(ref_boxes), dtype=bool)
+        for p in order:
+            candidates = np.where(~taken & (ious[p] >= threshold), ious[p], -1.0)
+            best = candidates.argmax()
+            if candidates[best] >= 0:
+                taken[best] = True
+                tp[t, p] = True
+    return tp
+
+
+def mean_average_precision(
+    predictions: Sequence[tuple],
+    references: Sequence[tuple],
+    thresholds: Sequence[float] = COCO_IOU_THRESHOLDS,
+) -> dict:
+    """
+    mAP of ``predictions`` against ``references`` (same number of frames).
+
+    Returns {"map50": ..., "map50_95": ..., "classes": n}; classes only present
+    in the predictions count as AP 0.
+    """
+    if len(predictions) != len(references):
+        raise ValueError(f"{len(predictions)} prediction frames but {len(references)} reference frames")
+    thresholds = np.asarray(thresholds, dtype=float)
+    confs, tps, totals = {}, {}, {}
+
+    for (p_boxes, p_confs, p_cls), (r_boxes, _, r_cls) in zip(predictions, references):
+        p_boxes, p_confs, p_cls = np.asarray(p_boxes).reshape(-1, 4), np.asarray(p_confs), np.asarray(p_cls)
+        r_boxes, r_cls = np.asarray(r_boxes).reshape(-1, 4), np.asarray(r_cls)
+        for c in np.union1d(p_cls, r_cls):
+            p_sel, r_sel = p_cls == c, r_cls == c
+            totals[c] = totals.get(c, 0) + int(r_sel.sum())
+            confs.setdefault(c, []).append(p_confs[p_sel])
+            tps.setdefault(c, []).append(_match(p_boxes[p_sel], p_confs[p_sel], r_boxes[r_sel], thresholds))
+
+    if not totals:
+        return {"map50": 1.0, "map50_95": 1.0, "classes": 0}
+
+    ap = np.zeros((len(totals), len(thresholds)))
+    for i, c in enumerate(totals):
+        if totals[c] == 0:
+            continue
+        class_confs = np.concatenate(confs[c])
+        class_tp = np.concatenate(tps[c], axis=1)[:, np.argsort(-class_confs, kind="stable")]
+        tp_cum = class_tp.cumsum(axis=1)
+        fp_cum = (~class_tp).cumsum(axis=1)
+        for t in range(len(thresholds)):
+            recall = tp_cum[t] / totals[c]
+            precision = tp_cum[t] / np.maximum(tp_cum[t] + fp_cum[t], 1)
+            ap[i, t] = average_precision(recall, precision)
+
+    map50 = ap[:, np.argmin(np.abs(thresholds - 0.5))].mean()
+    return {"map50": float(map50), "map50_95": float(ap.mean()), "classes": len(totals)}
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Helpers to move frames between an appsink sample and an appsrc buffer.
+
+Two frame paths are available:
+
+    legacy (pool=None): copy the sample into a NumPy array, then serialise it
+        with ``tobytes`` into a freshly allocated Gst.Buffer (3 frame copies).
+    pooled (pool=FrameBufferPool): copy the sample once into a buffer of a
+        fixed ring of pre-allocated output Gst.Buffers that is mapped writable
+        as a NumPy array. Overlays are drawn in place and the very same buffer
+        is pushed into appsrc. An exhausted ring applies back-pressure.
+
+Buffers are mapped through ctypes because PyGObject exposes ``map_info.data``
+read-only (and, depending on the version, as a copy).
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import threading
+import time
+
+import numpy as np
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst
+
+from stages import Frame
+
+
+class CopyStats:
+    """Counts frame-sized memory copies done by the frame path."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.frames = 0
+            self.copies = 0
+            self.bytes = 0
+
+    def record(self, nbytes: int, copies: int = 1) -> None:
+        with self._lock:
+            self.copies += copies
+            self.bytes += nbytes * copies
+
+    def frame_done(self) -> None:
+        with self._lock:
+            self.frames += 1
+
+    def summary(self) -> str:
+        frames = max(1, self.frames)
+        return (
+            f"{self.copies / frames:.2f} copies/frame, "
+            f"{self.bytes / frames / 1e6:.2f} MB copied/frame over {self.frames} frames"
+        )
+
+
+copy_stats = CopyStats()
+
+
+class _GstMapInfo(ctypes.Structure):
+    _fields_ = [
+        ("memory", ctypes.c_void_p),
+        ("flags", ctypes.c_int),
+        ("data", ctypes.POINTER(ctypes.c_uint8)),
+        ("size", ctypes.c_size_t),
+        ("maxsize", ctypes.c_size_t),
+        ("user_data", ctypes.c_void_p * 4),
+        ("_gst_reserved", ctypes.c_void_p * 4),
+    ]
+
+
+_libgst = None
+
+
+def _gst_lib() -> ctypes.CDLL:
+    global _libgst
+    if _libgst is None:
+        name = ctypes.util.find_library("gstreamer-1.0") or "libgstreamer-1.0.so.0"
+        lib = ctypes.CDLL(name)
+        lib.gst_buffer_map.argtypes = [ctypes.c_void_p, ctypes.POINTER(_GstMapInfo), ctypes.c_int]
+        lib.gst_buffer_map.restype = ctypes.c_int
+        lib.gst_buffer_unmap.argtypes = [ctypes.c_void_p, ctypes.POINTER(_GstMapInfo)]
+        lib.gst_buffer_unmap.restype = None
+        lib.gst_mini_object_is_writable.argtypes = [ctypes.c_void_p]
+        lib.gst_mini_object_is_writable.restype = ctypes.c_int
+        lib.gst_buffer_get_size.argtypes = [ctypes.c_void_p]
+        lib.gst_buffer_get_size.restype = ctypes.c_size_t
+        _libgst = lib
+    return _libgst
+
+
+_capsule_name = ctypes.pythonapi.PyCapsule_GetName
+_capsule_name.argtypes = [ctypes.py_object]
+_capsule_name.restype = ctypes.c_char_p
+_capsule_pointer = ctypes.pythonapi.PyCapsule_GetPointer
+_capsule_pointer.argtypes = [ctypes.py_object, ctypes.c_char_p]
+_capsule_pointer.restype = ctypes.c_void_p
+
+# PyGObject boxed wrappers store the C pointer right after the PyObject header
+_BOXED_POINTER_OFFSET = object.__basicsize__
+_pointer_checked = False
+
+
+def _buffer_ptr(buffer: Gst.Buffer) -> int:
+    """The GstBuffer* wrapped by ``buffer``."""
+    global _pointer_checked
+    capsule = getattr(buffer, "__gpointer__", None)
+    if capsule is not None:
+        ptr = _capsule_pointer(capsule, _capsule_name(capsule))
+    else:
+        ptr = ctypes.c_void_p.from_address(id(buffer) + _BOXED_POINTER_OFFSET).value
+    if not _pointer_checked:
+        # the wrapper layout is not a public API: check it once against GStreamer itself
+        if not ptr or _gst_lib().gst_buffer_get_size(ptr) != buffer.get_size():
+            raise RuntimeError("Cannot get the GstBuffer pointer of this PyGObject version")
+        _pointer_checked = True
+    return ptr
+
+
+def is_writable(buffer: Gst.Buffer) -> bool:
+    """True if nobody else (appsrc, encoder, ...) holds a reference to ``buffer``."""
+    return bool(_gst_lib().gst_mini_object_is_writable(_buffer_ptr(buffer)))
+
+
+def video_stride(width: int, channels: int) -> int:
+    """Row stride of packed RGB/BGR(x) raw video, GStreamer rounds rows up to 4 bytes."""
+    return (width * channels + 3) & ~3
+
+
+def frame_nbytes(width: int, height: int, channels: int = 3, planar: bool = False) -> int:
+    if planar:
+        return video_stride(width, 1) * height * channels
+    return video_stride(width, channels) * height
+
+
+def caps_format(caps: Gst.Caps) -> str | None:
+    return caps.get_structure(0).get_string("format")
+
+
+def is_planar_format(fmt: str | None) -> bool:
+    """Planar RGB formats (RGBP/BGRP) map to CxHxW arrays, i.e. one NCHW sample."""
+    return fmt in ("RGBP", "BGRP")
+
+
+class MappedBuffer:
+    """
+    A Gst.Buffer mapped via ctypes with a uint8 NumPy view on its memory:
+    HxWxC for packed formats, CxHxW for planar ones. The view is only valid
+    until ``unmap``.
+    """
+
+    def __init__(
+        self,
+        buffer: Gst.Buffer,
+        shape: tuple[int, int, int],
+        flags: Gst.MapFlags = Gst.MapFlags.READ,
+        planar: bool = False,
+    ) -> None:
+        self.buffer = buffer
+        self._info = _GstMapInfo()
+        if not _gst_lib().gst_buffer_map(_buffer_ptr(buffer), ctypes.byref(self._info), int(flags)):
+            raise ValueError("Failed to map buffer" + (" writable" if flags & Gst.MapFlags.WRITE else ""))
+        self._mapped = True
+        if not self._info.data:
+            self.unmap()
+            raise ValueError("Mapped buffer has no memory")
+
+        if planar:
+            channels, height, width = shape
+            stride = video_stride(width, 1)
+            strides = (stride * height, stride, 1)
+        else:
+            height, width, channels = shape
+            stride = video_stride(width, channels)
+            strides = (stride, channels, 1)
+        if self._info.size < frame_nbytes(width, height, channels, planar):
+            self.unmap()
+            raise ValueError(f"Buffer of {self._info.size} bytes is too small for {width}x{height}x{channels}")
+        raw = np.ctypeslib.as_array(self._info.data, shape=(self._info.size,))
+        self.array = np.lib.stride_tricks.as_strided(
+            raw, shape=shape, strides=strides, writeable=bool(flags & Gst.MapFlags.WRITE)
+        )
+
+    def unmap(self) -> None:
+        if self._mapped:
+            self.array = None
+            _gst_lib().gst_buffer_unmap(_buffer_ptr(self.buffer), ctypes.byref(self._info))
+            self._mapped = False
+
+    def __enter__(self) -> MappedBuffer:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.unmap()
+
+
+class FrameBufferPool:
+    """
+    Fixed-size ring of pre-allocated output Gst.Buffers, shared between appsink
+    consumption (``sample_to_frame``) and appsrc production (``push_frame``).
+
+    A buffer is free when it is not mapped by us and nobody downstream (appsrc
+    queue, encoder, ...) still references it. When the ring is exhausted
+    ``acquire`` blocks until a buffer comes back (back-pressure) or ``timeout``
+    seconds have passed, in which case the frame is dropped.
+    The ring is (re)allocated from the negotiated caps of the first sample.
+    """
+
+    # downstream releases buffers without telling us, so waiters re-check periodically
+    POLL_INTERVAL = 0.002
+
+    def __init__(self, count: int = 8, timeout: float | None = None) -> None:
+        self.count = count
+        self.timeout = timeout
+        self.shape: tuple[int, int, int] | None = None
+        self.allocations = 0
+        self.acquired = 0
+        self.dropped = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.occupancy = 0
+        self.max_occupancy = 0
+        self._occupancy_sum = 0
+        self._buffers: list[Gst.Buffer] = []
+        self._in_use: set[int] = set()
+        self._next = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _allocate(self) -> Gst.Buffer:
+        height, width, channels = self.shape
+        self.allocations += 1
+        return Gst.Buffer.new_allocate(None, frame_nbytes(width, height, channels), None)
+
+    def configure(self, shape: tuple[int, int, int]) -> None:
+        """Allocate the ring for frames of ``shape`` (H, W, C), if not already done."""
+        with self._cond:
+            if shape == self.shape:
+                return
+            self.shape = shape
+            self._buffers = [self._allocate() for _ in range(self.count)]
+            self._in_use.clear()
+            self._next = 0
+
+    def configure_from_caps(self, caps: Gst.Caps, channels: int = 3) -> None:
+        width, height = caps_size(caps)
+        self.configure((height, width, channels))
+
+    def _is_free(self, buffer: Gst.Buffer) -> bool:
+        return id(buffer) not in self._in_use and is_writable(buffer)
+
+    def _take_free(self) -> Gst.Buffer | None:
+        for _ in range(len(self._buffers)):
+            buffer = self._buffers[self._next]
+            self._next = (self._next + 1) % len(self._buffers)
+            if self._is_free(buffer):
+                return buffer
+        return None
+
+    def _update_occupancy(self) -> None:
+        self.occupancy = sum(not self._is_free(buffer) for buffer in self._buffers)
+        self.max_occupancy = max(self.max_occupancy, self.occupancy)
+        self._occupancy_sum += self.occupancy
+
+    def acquire(self, shape: tuple[int, int, int], timeout: float | None = None) -> MappedBuffer | None:
+        """
+        Map a free ring buffer writable as an array of ``shape``. Returns None if
+        no buffer became free within ``timeout`` (default: the ring timeout) or
+        the ring was closed.
+        """
+        self.configure(shape)
+        timeout = self.timeout if timeout is None else timeout
+        with self._cond:
+            buffer = self._take_free()
+            if buffer is None:
+                self.waits += 1
+                start = time.monotonic()
+                deadline = None if timeout is None else start + timeout
+                while buffer is None and not self._closed:
+                    remaining = self.POLL_INTERVAL if deadline is None else deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(min(remaining, self.POLL_INTERVAL))
+                    buffer = self._take_free()
+                self.wait_time += time.monotonic() - start
+            if buffer is None:
+                self.dropped += 1
+                return None
+            self._in_use.add(id(buffer))
+            self.acquired += 1
+            self._update_occupancy()
+        return _PooledMapping(self, buffer, shape)
+
+    def _release(self, buffer: Gst.Buffer) -> None:
+        with self._cond:
+            self._in_use.discard(id(buffer))
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Wake up and fail every pending ``acquire``."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "size": len(self._buffers),
+                "occupancy": self.occupancy,
+                "max_occupancy": self.max_occupancy,
+                "mean_occupancy": self._occupancy_sum / self.acquired if self.acquired else 0.0,
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "wait_time_s": self.wait_time,
+                "dropped": self.dropped,
+            }
+
+    def summary(self) -> str:
+        m = self.metrics()
+        return (
+            f"ring {m['occupancy']}/{m['size']} in use (max {m['max_occupancy']}, "
+            f"mean {m['mean_occupancy']:.1f}), {m['waits']} waits ({m['wait_time_s'] * 1000:.0f} ms), "
+            f"{m['dropped']} frames dropped on exhaustion"
+        )
+
+
+class _PooledMapping(MappedBuffer):
+    def __init__(self, pool: FrameBufferPool, buffer: Gst.Buffer, shape: tuple[int, int, int]) -> None:
+        self.pool = pool
+        try:
+            super().__init__(buffer, shape, Gst.MapFlags.READ | Gst.MapFlags.WRITE)
+        except ValueError:
+            pool._release(buffer)
+            raise
+
+    def unmap(self, release: bool = True) -> None:
+        """Unmap; with ``release=False`` the buffer stays reserved until ``release()``."""
+        was_mapped = self._mapped
+        super().unmap()
+        if was_mapped and release:
+            self.release()
+
+    def release(self) -> None:
+        self.pool._release(self.buffer)
+
+
+def caps_size(
+    caps: Gst.Caps, default_width: int | None = None, default_height: int | None = None
+) -> tuple[int, int]:
+    """Read width/height from negotiated caps (fallback to the given defaults)."""
+    struct = caps.get_structure(0)
+    try:
+        width = struct.get_value("width") or default_width
+        height = struct.get_value("height") or default_height
+    except Exception:
+        width = default_width
+        height = default_height
+    return width, height
+
+
+def sample_to_frame(
+    sample: Gst.Sample,
+    default_width: int | None = None,
+    default_height: int | None = None,
+    channels: int = 3,
+    pool: FrameBufferPool | None = None,
+) -> Frame | None:
+    """
+    Copy the buffer of an appsink sample into a Frame (HxWxC uint8, or CxHxW
+    for planar formats such as RGBP).
+
+    The copy is required because the input buffer belongs to the source pipeline
+    and the frame outlives the appsink callback. With a ``pool`` this is the only
+    copy: the frame image is a writable view on a pooled output buffer that
+    ``push_frame`` hands to appsrc as is. Returns None if the pool is exhausted
+    (see ``FrameBufferPool.timeout``) and the frame has to be dropped.
+    """
+    buffer = sample.get_buffer()
+    caps = sample.get_caps()
+    if buffer is None or caps is None:
+        return None
+    width, height = caps_size(caps, default_width, default_height)
+    planar = is_planar_format(caps_format(caps))
+    if planar and pool is not None:
+        raise ValueError("Pooled output frames must be packed, got planar caps")
+    shape = (channels, height, width) if planar else (height, width, channels)
+
+    try:
+        with MappedBuffer(buffer, shape, planar=planar) as src:
+            if pool is None:
+                image = src.array.copy()
+                out = None
+            else:
+                out = pool.acquire(shape)
+                if out is None:
+                    return None
+                np.copyto(out.array, src.array)
+                image = out.array
+    except ValueError as e:
+        print(f"Warning: {e}")
+        return None
+    copy_stats.record(image.nbytes)
+
+    frame = Frame(image=image, pts=buffer.pts, dts=buffer.dts, duration=buffer.duration)
+    if out is not None:
+        frame.extra["mapped"] = out
+    return frame
+
+
+def push_frame(appsrc: Gst.Element, frame: Frame) -> Gst.FlowReturn:
+    """
+    Push a Frame into appsrc. Pooled frames are unmapped and pushed without any
+    copy; ``frame.image`` must not be used afterwards. Other frames are packed
+    into a new Gst.Buffer.
+    """
+    mapped = frame.extra.pop("mapped", None)
+    if mapped is not None:
+        # keep the buffer reserved until appsrc holds its own reference
+        mapped.unmap(release=False)
+        frame.image = None
+        out_buffer = mapped.buffer
+    else:
+        data = frame.image.tobytes()
+        out_buffer = Gst.Buffer.new_allocate(None, len(data), None)
+        out_buffer.fill(0, data)
+        copy_stats.record(len(data), copies=2)
+    copy_stats.frame_done()
+
+    # Preserve timestamps to keep webrtc timing reasonable
+    out_buffer.pts = frame.pts
+    out_buffer.dts = frame.dts
+    out_buffer.duration = frame.duration
+
+    ret = appsrc.emit("push-buffer", out_buffer)
+    if mapped is not None:
+        mapped.release()
+    if ret != Gst.FlowReturn.OK:
+        print("Warning: push-buffer returned", ret)
+    return ret
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Glass-to-glass latency: a timestamp pattern stamped into the outgoing frames
+and a headless WebRTC receiver that reads it back.
+
+Sender (run.py with ``[metrics] stamp = true``): a cairooverlay in front of the
+encoder draws a grid of black/white blocks into the top-left corner of every
+frame, carrying two CLOCK_MONOTONIC times in microseconds plus a CRC:
+
+    capture  capture pipeline base time + buffer PTS (when the camera delivered it)
+    stamp    when the frame reached the encoder (after appsink/Python/appsrc)
+
+Receiver (this script): webrtcsrc consumes the stream from the signalling
+server, decodes it and reads the pattern back from every frame, then reports
+per-stage latency distributions:
+
+    capture -> stamp     capture, inference / overlay queues, appsrc
+    stamp -> received    encoder, webrtcsink, network, jitter buffer, decoder
+    capture -> received  glass to glass, minus the display
+
+Both sides must share CLOCK_MONOTONIC, i.e. the receiver runs on the same host
+as the sender (glass_to_glass.toml starts webrtcsink's own signalling server,
+so nothing else is needed).
+
+    python3 run.py profiles/glass_to_glass.toml
+    python3 glass_to_glass.py --uri ws://127.0.0.1:8443 --frames 600 --json g2g.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+import zlib
+
+import numpy as np
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import GLib, Gst
+
+BLOCK = 10  # block edge in pixels, large enough to survive VP8/H.264 at low bitrates
+COLUMNS = 16
+ROWS = 7  # 16 x 7 = 112 bits: 48 bit capture, 48 bit stamp, 16 bit CRC
+ORIGIN = (8, 8)  # top-left corner of the pattern (x, y)
+_MASK_48 = (1 << 48) - 1
+
+
+def encode_bits(capture_us: int, stamp_us: int) -> np.ndarray:
+    payload = (capture_us & _MASK_48).to_bytes(6, "big") + (stamp_us & _MASK_48).to_bytes(6, "big")
+    crc = zlib.crc32(payload) & 0xFFFF
+    return np.unpackbits(np.frombuffer(payload + crc.to_bytes(2, "big"), dtype=np.uint8))
+
+
+def decode_bits(bits: np.ndarray) -> tuple[int, int] | None:
+    """(capture_us, stamp_us), or None if the CRC does not match."""
+    data = np.packbits(bits.astype(np.uint8)).tobytes()
+    if zlib.crc32(data[:12]) & 0xFFFF != int.from_bytes(data[12:], "big"):
+        return None
+    return int.from_bytes(data[:6], "big"), int.from_bytes(data[6:12], "big")
+
+
+def draw_pattern_cairo(context, capture_ns: int, stamp_ns: int) -> None:
+    """Draw the pattern with the cairo context of a cairooverlay draw callback."""
+    x0, y0 = ORIGIN
+    context.set_source_rgb(0, 0, 0)
+    context.rectangle(x0, y0, COLUMNS * BLOCK, ROWS * BLOCK)
+    context.fill()
+    context.set_source_rgb(1, 1, 1)
+    bits = encode_bits(capture_ns // 1000, stamp_ns // 1000).reshape(ROWS, COLUMNS)
+    for row, col in zip(*np.nonzero(bits)):
+        context.rectangle(x0 + col * BLOCK, y0 + row * BLOCK, BLOCK, BLOCK)
+    context.fill()
+
+
+def read_pattern(gray: np.ndarray) -> tuple[int, int] | None:
+    """Read (capture_us, stamp_us) from a grey frame; block centres only, edges blur when encoded."""
+    x0, y0 = ORIGIN
+    patch = gray[y0:y0 + ROWS * BLOCK, x0:x0 + COLUMNS * BLOCK]
+    if patch.shape != (ROWS * BLOCK, COLUMNS * BLOCK):
+        return None
+    inner = slice(BLOCK // 4, BLOCK - BLOCK // 4)
+    blocks = patch.reshape(ROWS, BLOCK, COLUMNS, BLOCK)[:, inner, :, inner].mean(axis=(1, 3))
+    return decode_bits((blocks > 128).ravel())
+
+
+def stamp_callback(capture_pipeline: Gst.Pipeline):
+    """cairooverlay ``draw`` handler stamping the capture and current clock time."""
+    def on_draw(overlay, context, timestamp, duration):
+        clock = capture_pipeline.get_clock()
+        if clock is None or timestamp == Gst.CLOCK_TIME_NONE:
+            return
+        draw_pattern_cairo(context, capture_pipeline.get_base_time() + timestamp, clock.get_time())
+
+    return on_draw
+
+
+class Receiver:
+    """Headless webrtcsrc consumer that reads the pattern from every decoded frame."""
+
+    STAGES = ("capture->stamp", "stamp->received", "capture->received")
+
+    def __init__(self, uri: str, producer: str | None = None, frames: int = 600) -> None:
+        self.uri = uri
+        self.producer = producer
+        self.frames = frames
+        self.samples: dict[str, list[float]] = {stage: [] for stage in self.STAGES}
+        self.unreadable = 0
+        self._last_capture = None
+        self.pipeline = None
+        self.loop = None
+
+    def build(self) -> None:
+        self.pipeline = Gst.Pipeline.new("glass-to-glass-receiver")
+        src = Gst.ElementFactory.make("webrtcsrc", "src")
+        if src is None:
+            raise RuntimeError("webrtcsrc not found (gst-plugins-rs webrtc plugin)")
+        signaller = src.get_property("signaller")
+        signaller.set_property("uri", self.uri)
+        if self.producer:
+            signaller.set_property("producer-peer-id", self.producer)
+        elif src.find_property("connect-to-first-producer"):
+            src.set_property("connect-to-first-producer", True)
+        else:
+            raise RuntimeError("this webrtcsrc needs --producer (the peer id of the webrtcsink)")
+        src.connect("pad-added", self.on_pad_added)
+        self.pipeline.add(src)
+
+    def on_pad_added(self, src, pad):
+        if pad.get_name().startswith("video"):
+            branch = Gst.parse_bin_from_description(
+                "videoconvert ! video/x-raw,format=GRAY8 ! "
+                "appsink name=g2g_sink emit-signals=true sync=false max-buffers=4 drop=false",
+                True,
+            )
+            branch.get_by_name("g2g_sink").connect("new-sample", self.on_new_sample)
+        else:
+            branch = Gst.ElementFactory.make("fakesink")
+        self.pipeline.add(branch)
+        branch.sync_state_with_parent()
+        pad.link(branch.get_static_pad("sink"))
+
+    def on_new_sample(self, sink):
+        received_us = time.monotonic_ns() // 1000
+        sample = sink.emit("pull-sample")
+        if sample is None:
+            return Gst.FlowReturn.ERROR
+        structure = sample.get_caps().get_structure(0)
+        width, height = structure.get_value("width"), structure.get_value("height")
+        stride = (width + 3) & ~3  # GRAY8 rows are 4-byte aligned
+        rows = min(height, ORIGIN[1] + ROWS * BLOCK)
+        data = sample.get_buffer().extract_dup(0, stride * rows)
+        gray = np.frombuffer(data, dtype=np.uint8).reshape(rows, stride)[:, :width]
+
+        stamps = read_pattern(gray)
+        if stamps is None:
+            self.unreadable += 1
+        elif stamps[0] != self._last_capture:  # repeated frames carry the same stamp
+            capture_us, stamp_us = stamps
+            self._last_capture = capture_us
+            received_us &= _MASK_48
+            self.samples["capture->stamp"].append((stamp_us - capture_us) / 1000)
+            self.samples["stamp->received"].append((received_us - stamp_us) / 1000)
+            self.samples["capture->received"].append((received_us - capture_us) / 1000)
+            if len(self.samples["capture->received"]) >= self.frames:
+                GLib.idle_add(self.loop.quit)
+        return Gst.FlowReturn.OK
+
+    def on_message(self, bus, message):
+        if message.type == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            print(f"Error: {err} - {debug}")
+            self.loop.quit()
+        elif message.type == Gst.MessageType.EOS:
+            self.loop.quit()
+
+    def run(self, timeout: float) -> None:
+        Gst.init(None)
+        self.build()
+        self.loop = GLib.MainLoop()
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self.on_message)
+        GLib.timeout_add(int(timeout * 1000), self.loop.quit)
+        self.pipeline.set_state(Gst.State.PLAYING)
+        try:
+            self.loop.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.pipeline.set_state(Gst.State.NULL)
+
+    def stats(self) -> dict:
+        stats = {"frames": len(self.samples["capture->received"]), "unreadable": self.unreadable}
+        for stage, values in self.samples.items():
+            if values:
+                p50, p95, p99 = np.percentile(values, (50, 95, 99))
+                stats[stage] = {
+                    "mean": round(float(np.mean(values)), 2), "p50": round(float(p50), 2),
+                    "p95": round(float(p95), 2), "p99": round(float(p99), 2), "max": round(float(np.max(values)), 2),
+                }
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="ws://127.0.0.1:8443", help="signalling server of the webrtcsink")
+    parser.add_argument("--producer", help="peer id of the webrtcsink (default: first producer)")
+    parser.add_argument("--frames", type=int, default=600, help="stamped frames to measure")
+    parser.add_argument("--timeout", type=float, default=120.0, help="give up after this many seconds")
+    parser.add_argument("--json", help="also write the distributions to this file")
+    args = parser.parse_args()
+
+    receiver = Receiver(args.uri, args.producer, args.frames)
+    receiver.run(args.timeout)
+    stats = receiver.stats()
+    print(f"{stats['frames']} stamped frames, {stats['unreadable']} unreadable")
+    print(f"{'stage':<18} {'mean':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}   (ms)")
+    for stage in Receiver.STAGES:
+        if stage in stats:
+            s = stats[stage]
+            print(f"{stage:<18} {s['mean']:>7.1f} {s['p50']:>7.1f} {s['p95']:>7.1f} {s['p99']:>7.1f} {s['max']:>7.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(stats, f, indent=2, sort_keys=True)
+    return 0 if stats["frames"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
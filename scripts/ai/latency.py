@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Capture-to-encoder latency of buffers in a running pipeline.
+
+A buffer probe on a pad (usually the input of the encoder) computes, for every
+buffer, ``clock now - (capture pipeline base time + buffer PTS)``. Live sources
+timestamp buffers with the running time at capture, so this is the time a
+frame spent between the camera and that pad, queues and Python included. It
+works across the appsink -> appsrc bridge too, since the demos keep the capture
+PTS and both pipelines run on the system clock.
+"""
+
+from __future__ import annotations
+
+import collections
+
+import numpy as np
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst
+
+
+class LatencyProbe:
+    """Records the latency of every buffer passing ``pad``."""
+
+    def __init__(self, pad: Gst.Pad, capture_pipeline: Gst.Pipeline, maxlen: int = 10000) -> None:
+        self.capture_pipeline = capture_pipeline
+        self.latencies: collections.deque = collections.deque(maxlen=maxlen)
+        self._probe_id = pad.add_probe(Gst.PadProbeType.BUFFER, self._on_buffer)
+        self._pad = pad
+
+    @classmethod
+    def on_element(cls, element: Gst.Element, capture_pipeline: Gst.Pipeline, pad: str = "src") -> LatencyProbe:
+        return cls(element.get_static_pad(pad), capture_pipeline)
+
+    def _on_buffer(self, pad, info):
+        buffer = info.get_buffer()
+        clock = self.capture_pipeline.get_clock()
+        if buffer is not None and clock is not None and buffer.pts != Gst.CLOCK_TIME_NONE:
+            captured = self.capture_pipeline.get_base_time() + buffer.pts
+            self.latencies.append((clock.get_time() - captured) / Gst.SECOND)
+        return Gst.PadProbeReturn.OK
+
+    def remove(self) -> None:
+        self._pad.remove_probe(self._probe_id)
+
+    def stats(self) -> dict:
+        if not self.latencies:
+            return {"frames": 0}
+        ms = np.asarray(self.latencies) * 1000.0
+        return {
+            "frames": len(ms),
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "max_ms": float(ms.max()),
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        if not stats["frames"]:
+            return "no frames"
+        return (
+            f"{stats['frames']} frames, mean {stats['mean_ms']:.1f} ms, p50 {stats['p50_ms']:.1f} ms, "
+            f"p95 {stats['p95_ms']:.1f} ms, max {stats['max_ms']:.1f} ms"
+        )
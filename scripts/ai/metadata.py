@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Detections as per-frame metadata for the WebRTC consumers, instead of (or in
+addition to) burning them into the pixels.
+
+``DetectionChannel.attach(webrtcsink)`` opens a ``detections`` data channel on
+every consumer's webrtcbin as it connects. The channel is unordered with no
+retransmits, so a late message is dropped instead of delaying newer ones.
+``publish`` sends one compact JSON message per frame (or per inference) to all
+open channels:
+
+    {"names": ["person", "bicycle", ...]}                 before the first detections, then every NAMES_INTERVAL s
+    {"pts": 1234566789, "size": [1280, 720],
+     "det": [[x1, y1, x2, y2, class, conf%], ...],
+     "ids": [3, 7, ...]}                                  per frame; "ids" only when tracking
+
+``pts`` is the buffer PTS in nanoseconds of the frame the detections belong to,
+boxes are integer pixels of a ``size`` frame and confidences are percent. The
+names message is repeated because the channel may lose it like any other. The
+frontend can toggle and style the overlay, and the encoded frames stay
+unmodified.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Callable, Sequence
+
+import numpy as np
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst
+
+CHANNEL_LABEL = "detections"
+# unordered and unreliable: stale detections are worthless
+CHANNEL_OPTIONS = "config,ordered=(boolean)false,max-retransmits=(int)0"
+# seconds between repetitions of the class names on a channel
+NAMES_INTERVAL = 2.0
+
+
+def encode_detections(
+    pts: int,
+    detections: tuple[np.ndarray, np.ndarray, np.ndarray],
+    size: tuple[int, int],
+    track_ids: np.ndarray | None = None,
+) -> str:
+    boxes, confs, cls_ids = detections
+    rows = np.column_stack([
+        np.asarray(boxes, dtype=np.float32).reshape(-1, 4).round(),
+        np.asarray(cls_ids).reshape(-1),
+        (np.asarray(confs, dtype=np.float32).reshape(-1) * 100).round(),
+    ]).astype(int)
+    message = {"pts": int(pts), "size": list(size), "det": rows.tolist()}
+    if track_ids is not None:
+        message["ids"] = np.asarray(track_ids, dtype=int).tolist()
+    return json.dumps(message, separators=(",", ":"))
+
+
+class DetectionChannel:
+    """One ``detections`` data channel per webrtcsink consumer."""
+
+    def __init__(self, names: Callable[[], Sequence[str] | dict | None] = lambda: None) -> None:
+        self.names = names  # None while the model is still loading
+        self.sent = 0
+        self._channels: dict[str, object] = {}
+        self._open: set = set()
+        self._named: dict[str, float] = {}  # peer id -> monotonic time the names were last sent
+        self._lock = threading.Lock()
+
+    def attach(self, webrtcsink: Gst.Element) -> None:
+        webrtcsink.connect("consumer-added", self._on_consumer_added)
+        webrtcsink.connect("consumer-removed", self._on_consumer_removed)
+
+    def _on_consumer_added(self, webrtcsink, peer_id, webrtcbin):
+        # emitted before the offer is created, so the channel is part of the SDP
+        channel = webrtcbin.emit("create-data-channel", CHANNEL_LABEL, Gst.Structure.new_from_string(CHANNEL_OPTIONS))
+        if channel is None:
+            print(f"Could not create a data channel for consumer {peer_id}")
+            return
+        channel.connect("on-open", self._on_open, peer_id)
+        channel.connect("on-close", self._on_close, peer_id)
+        with self._lock:
+            self._channels[peer_id] = channel
+
+    def _on_consumer_removed(self, webrtcsink, peer_id, webrtcbin):
+        with self._lock:
+            self._channels.pop(peer_id, None)
+            self._open.discard(peer_id)
+            self._named.pop(peer_id, None)
+
+    def _on_open(self, channel, peer_id):
+        with self._lock:
+            self._open.add(peer_id)
+
+    def _on_close(self, channel, peer_id):
+        with self._lock:
+            self._open.discard(peer_id)
+
+    @property
+    def consumers(self) -> int:
+        with self._lock:
+            return len(self._open)
+
+    def publish(
+        self,
+        pts: int,
+        detections: tuple[np.ndarray, np.ndarray, np.ndarray],
+        size: tuple[int, int],
+        track_ids: np.ndarray | None = None,
+    ) -> None:
+        with self._lock:
+            targets = [(peer_id, self._channels[peer_id]) for peer_id in self._open]
+        if not targets:
+            return
+        message = encode_detections(pts, detections, size, track_ids)
+        now = time.monotonic()
+        for peer_id, channel in targets:
+            if now - self._named.get(peer_id, -NAMES_INTERVAL) >= NAMES_INTERVAL:
+                names = self.names()
+                if names is not None:
+                    names = [names[i] for i in sorted(names)] if isinstance(names, dict) else list(names)
+                    channel.emit("send-string", json.dumps({"names": names}))
+                    self._named[peer_id] = now
+            channel.emit("send-string", message)
+        self.sent += 1
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Per-stage latency and frame counters of a running pipeline, served in the
+Prometheus text format on a local HTTP endpoint:
+
+    metrics = Metrics()
+    with metrics.timed("draw"):
+        ...
+    metrics.inc("frames_pushed_total")
+    metrics.sampled("appsrc_queue_buffers", lambda: appsrc.get_property("current-level-buffers"))
+    metrics.serve(9100)            # curl http://127.0.0.1:9100/metrics
+
+Stage times are exported as a summary per stage
+(``kataglyphis_stage_seconds{stage="inference",quantile="0.95"}``) over the
+last ``window`` observations, plus cumulative ``_sum`` and ``_count``.
+Counters and sampled values (read at scrape time, e.g. queue levels or
+counters kept elsewhere) are exported as they are.
+
+The stages of the demos' frame path are map_copy, preprocess, inference,
+postprocess, draw and push; ``watch_detector`` feeds the detector's own stage
+timings.
+"""
+
+from __future__ import annotations
+
+import collections
+import contextlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# detector stage names (see detectors.Detector._lap) -> metric stage names
+DETECTOR_STAGES = {"preprocess": "preprocess", "forward": "inference", "postprocess": "postprocess", "predict": "detector"}
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Metrics:
+    """Thread-safe registry of stage timings, counters and sampled values."""
+
+    def __init__(self, prefix: str = "kataglyphis", window: int = 1000) -> None:
+        self.prefix = prefix
+        self.window = window
+        self._stages: dict[str, collections.deque] = {}
+        self._stage_totals: dict[str, list[float]] = {}  # stage -> [sum, count]
+        self._counters: dict[tuple[str, str], float] = {}
+        self._sampled: dict[tuple[str, str], tuple[Callable[[], float], str]] = {}
+        self._help: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+
+    # ---- recording ----
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = collections.deque(maxlen=self.window)
+                self._stage_totals[stage] = [0.0, 0]
+            self._stages[stage].append(seconds)
+            totals = self._stage_totals[stage]
+            totals[0] += seconds
+            totals[1] += 1
+
+    @contextlib.contextmanager
+    def timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, name: str, value: float = 1, help: str = "", **labels) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            if help:
+                self._help[name] = help
+
+    def sampled(self, name: str, fn: Callable[[], float], kind: str = "gauge", help: str = "", **labels) -> None:
+        """Export ``fn()`` as a gauge (or counter), read on every scrape."""
+        with self._lock:
+            self._sampled[(name, _labels(labels))] = (fn, kind)
+            if help:
+                self._help[name] = help
+
+    def watch_detector(self, detector) -> None:
+        """Record the stage timings of a detectors.Detector (or LazyModel of one) once it is loaded."""
+        def observe(stage, seconds):
+            self.observe(DETECTOR_STAGES.get(stage, stage), seconds)
+
+        if hasattr(detector, "on_load"):
+            detector.on_load(lambda model: model.observers.append(observe))
+        else:
+            detector.observers.append(observe)
+
+    # ---- reading ----
+
+    def stage_stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            windows = {stage: np.asarray(times) for stage, times in self._stages.items()}
+            totals = {stage: tuple(total) for stage, total in self._stage_totals.items()}
+        stats = {}
+        for stage, times in windows.items():
+            if not len(times):
+                continue
+            quantiles = np.quantile(times, QUANTILES)
+            stats[stage] = {f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, quantiles)}
+            stats[stage].update(sum=totals[stage][0], count=totals[stage][1])
+        return stats
+
+    def count(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, _labels(labels)), 0)
+
+    def values(self) -> dict[tuple[str, str], tuple[float, str]]:
+        """Counters and sampled values: (name, labels) -> (value, kind)."""
+        with self._lock:
+            values = {key: (value, "counter") for key, value in self._counters.items()}
+            sampled = dict(self._sampled)
+        for key, (fn, kind) in sampled.items():
+            try:
+                values[key] = (float(fn()), kind)
+            except Exception:
+                continue  # e.g. element already disposed
+        return values
+
+    def exposition(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Processing time per frame path stage", f"# TYPE {name} summary"]
+        for stage, stats in self.stage_stats().items():
+            for q in QUANTILES:
+                lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {stats[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {stats["count"]}')
+
+        declared = set()
+        for (metric, labels), (value, kind) in sorted(self.values().items()):
+            full = f"{self.prefix}_{metric}"
+            if metric not in declared:
+                declared.add(metric)
+                if metric in self._help:
+                    lines.append(f"# HELP {full} {self._help[metric]}")
+                lines.append(f"# TYPE {full} {kind}")
+            lines.append(f"{full}{labels} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        stages = ", ".join(
+            f"{stage} p50 {s['p50'] * 1000:.2f} / p95 {s['p95'] * 1000:.2f} / p99 {s['p99'] * 1000:.2f} ms"
+            for stage, s in self.stage_stats().items()
+        )
+        counters = ", ".join(f"{metric}{labels} {value:g}" for (metric, labels), (value, _) in sorted(self.values().items()))
+        return f"{stages or 'no stage timings'}; {counters}"
+
+    # ---- HTTP endpoint ----
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """Serve /metrics from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.exposition().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Metrics on http://{host}:{self._server.server_port}/metrics")
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
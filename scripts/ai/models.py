@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Lazy, cached model loading for the demos.
+
+Loading used to happen at import time: ``YOLO(...)`` downloads weights into
+the working directory, and ``torch.hub.load`` contacts GitHub on every start.
+This module keeps weights and exported artefacts in one on-disk cache
+(``$KATAGLYPHIS_MODEL_CACHE``, default ``~/.cache/kataglyphis/models``). It
+loads the YOLOv5 hub code from torch's local hub checkout once that exists,
+so a warm start needs no network.
+
+``registry.model(key, factory)`` returns a ``LazyModel``. It loads on first
+use, or in the background after ``preload()``, e.g. while the GStreamer
+pipelines go to PLAYING. Attribute access and calls block until the model is
+loaded.
+
+``startup`` measures cold start, from process launch to the first annotated
+frame.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable
+
+CACHE_DIR = os.environ.get("KATAGLYPHIS_MODEL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "kataglyphis", "models"))
+
+
+def cache_path(filename: str) -> str:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
+
+
+def _store(source: str | None, filename: str) -> None:
+    """Copy a freshly downloaded file into the cache (best effort)."""
+    if source and os.path.isfile(source) and not os.path.exists(cache_path(filename)):
+        shutil.copy2(source, cache_path(filename))
+
+
+def load_ultralytics(model_name: str):
+    """``ultralytics.YOLO`` from the cache, downloading the official weights once."""
+    from ultralytics import YOLO
+
+    filename = model_name if model_name.endswith(".pt") else model_name + ".pt"
+    cached = cache_path(os.path.basename(filename))
+    if os.path.exists(cached):
+        return YOLO(cached)
+    print(f"Downloading {filename} into the model cache ...")
+    model = YOLO(filename)
+    _store(getattr(model, "ckpt_path", None) or filename, os.path.basename(filename))
+    return model
+
+
+def load_yolov5(model_name: str, conf: float = 0.25, iou: float = 0.45):
+    """
+    YOLOv5 through torch.hub. Uses torch's local checkout of the hub repo and
+    cached weights when present, so only the very first start needs GitHub.
+    """
+    import torch
+
+    repo = os.path.join(torch.hub.get_dir(), "ultralytics_yolov5_master")
+    weights = cache_path(model_name + ".pt")
+    if os.path.isdir(repo) and os.path.exists(weights):
+        model = torch.hub.load(repo, "custom", path=weights, source="local")
+    else:
+        print(f"Fetching {model_name} from torch.hub into the model cache ...")
+        model = torch.hub.load("ultralytics/yolov5", model_name, pretrained=True, skip_validation=True)
+        _store(model_name + ".pt", model_name + ".pt")
+    model.conf = conf
+    model.iou = iou
+    return model
+
+
+def exported_model(model_name: str, fmt: str = "onnx", imgsz: int = 640) -> str:
+    """
+    Path of a pre-exported artefact (e.g. ONNX) of an Ultralytics model in the
+    cache, exported on first use. Loading it needs neither torch nor ultralytics.
+    """
+    extension = {"onnx": ".onnx", "torchscript": ".torchscript"}[fmt]
+    path = cache_path(f"{model_name}.{imgsz}{extension}")
+    if not os.path.exists(path):
+        exported = load_ultralytics(model_name).export(format=fmt, imgsz=imgsz)
+        shutil.move(str(exported), path)
+    return path
+
+
+class LazyModel:
+    """Proxy that builds the wrapped model with ``factory()`` on first use."""
+
+    def __init__(self, name: str, factory: Callable[[], Any]) -> None:
+        self.name = name
+        self.factory = factory
+        self.load_time: float | None = None
+        self._model = None
+        # reentrant: on_load callbacks may use the proxy while the load holds the lock
+        self._lock = threading.RLock()
+        self._thread: threading.Thread | None = None
+        self._on_load: list[Callable[[Any], None]] = []
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        with self._lock:
+            if self._model is None:
+                start = time.perf_counter()
+                self._model = self.factory()
+                self.load_time = time.perf_counter() - start
+                print(f"Loaded {self.name} in {self.load_time:.2f} s")
+                # other threads wait on the lock until every callback (e.g. a warm-up) is done
+                for callback in self._on_load:
+                    self._notify(callback)
+        return self._model
+
+    def on_load(self, callback: Callable[[Any], None]) -> None:
+        """Call ``callback(model)`` once the model is loaded (right away if it already is)."""
+        with self._lock:
+            if self._model is None:
+                self._on_load.append(callback)
+                return
+        self._notify(callback)
+
+    def _notify(self, callback: Callable[[Any], None]) -> None:
+        try:
+            callback(self._model)
+        except Exception as e:
+            print(f"Warning: on_load callback of {self.name} failed: {e}")
+
+    def preload(self) -> LazyModel:
+        """Start loading in a background thread; later calls wait for it."""
+        if self._thread is None and not self.loaded:
+            self._thread = threading.Thread(target=self.load, name=f"load-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        # only reached for attributes of the wrapped model
+        return getattr(self.load(), attr)
+
+
+class ModelRegistry:
+    """One LazyModel per key, shared by everything in the process."""
+
+    def __init__(self) -> None:
+        self._models: dict[str, LazyModel] = {}
+        self._lock = threading.Lock()
+
+    def model(self, key: str, factory: Callable[[], Any]) -> LazyModel:
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = LazyModel(key, factory)
+            return self._models[key]
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{key}: {f'{m.load_time:.2f} s' if m.load_time is not None else 'not loaded'}"
+            for key, m in self._models.items()
+        )
+
+
+registry = ModelRegistry()
+
+
+_IMPORT_TIME = time.perf_counter()
+
+
+def process_uptime() -> float:
+    """Seconds since this process was launched (interpreter start included)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        # no procfs: count from the import of this module instead
+        return time.perf_counter() - _IMPORT_TIME
+
+
+class StartupTimer:
+    """Cold-start milestones, in seconds since process launch."""
+
+    def __init__(self) -> None:
+        self.marks: list[tuple[str, float]] = []
+        self._first_frame = False
+
+    def mark(self, event: str) -> None:
+        self.marks.append((event, process_uptime()))
+
+    def first_frame(self) -> None:
+        """Call for every annotated frame; only the first one is recorded and reported."""
+        if self._first_frame:
+            return
+        self._first_frame = True
+        self.mark("first annotated frame")
+        print(f"Cold start: {self.summary()}")
+
+    def summary(self) -> str:
+        return ", ".join(f"{event} {t:.2f} s" for event, t in self.marks)
+
+
+startup = StartupTimer()
+startup.mark("models imported")
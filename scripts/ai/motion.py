@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Motion gate in front of the detector for cameras looking at mostly static scenes.
+
+Every frame is downscaled to a small blurred grey image and compared with the
+image at the time the current detections were computed. Then:
+
+    changed fraction < threshold  -> skip, reuse the previous detections
+    only some tiles changed       -> run the detector on crops around the changed
+                                     tiles only; detections outside them are kept
+    most of the frame changed     -> run the detector on the full frame
+
+Because the comparison is against the last *inferred* content (not the
+previous frame), slow changes accumulate until they trigger inference.
+``MotionGatedDetector.summary()`` reports how many inferences were saved.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Sequence
+
+import cv2
+import numpy as np
+
+from overlay import empty_detections
+
+
+class MotionGate:
+    """Changed-pixel analysis on a downscaled frame, split into a grid of tiles."""
+
+    def __init__(
+        self,
+        threshold: float = 0.002,
+        pixel_threshold: int = 25,
+        width: int = 160,
+        grid: tuple[int, int] = (4, 4),
+        tile_threshold: float = 0.01,
+    ) -> None:
+        self.threshold = threshold  # changed pixel fraction that triggers inference
+        self.pixel_threshold = pixel_threshold  # grey level difference of a changed pixel
+        self.width = width
+        self.grid = grid  # (rows, cols)
+        self.tile_threshold = tile_threshold  # changed pixel fraction of a changed tile
+        self.reference: np.ndarray | None = None
+
+    def downscale(self, image: np.ndarray) -> np.ndarray:
+        height, width = image.shape[:2]
+        small = cv2.resize(image, (self.width, max(int(height * self.width / width), 1)), interpolation=cv2.INTER_AREA)
+        grey = small.mean(axis=2, dtype=np.float32) if small.ndim == 3 else small.astype(np.float32)
+        return cv2.GaussianBlur(grey, (5, 5), 0)
+
+    def analyse(self, small: np.ndarray) -> tuple[float, np.ndarray]:
+        """(changed fraction, changed tile mask [rows, cols]) against the reference."""
+        rows, cols = self.grid
+        if self.reference is None:
+            return 1.0, np.ones((rows, cols), dtype=bool)
+        changed = np.abs(small - self.reference) > self.pixel_threshold
+        height, width = changed.shape
+        tiles = changed[:height - height % rows, :width - width % cols].reshape(rows, height // rows, cols, width // cols)
+        return float(changed.mean()), tiles.mean(axis=(1, 3)) > self.tile_threshold
+
+    def commit(self, small: np.ndarray, tiles: np.ndarray | None = None) -> None:
+        """Make ``small`` the reference, only inside ``tiles`` if given."""
+        if self.reference is None or tiles is None:
+            self.reference = small.copy()
+            return
+        mask = cv2.resize(tiles.astype(np.uint8), small.shape[::-1], interpolation=cv2.INTER_NEAREST).astype(bool)
+        self.reference[mask] = small[mask]
+
+
+def tile_regions(tiles: np.ndarray, width: int, height: int) -> list[tuple[int, int, int, int]]:
+    """
+    xyxy frame regions covering the changed tiles: the tile mask is dilated by
+    one tile (objects crossing a tile border) and split into connected blocks.
+    """
+    rows, cols = tiles.shape
+    dilated = cv2.dilate(tiles.astype(np.uint8), np.ones((3, 3), np.uint8))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(dilated, connectivity=8)
+    tile_w, tile_h = width / cols, height / rows
+    regions = []
+    for x, y, w, h, _ in stats[1:count]:
+        regions.append((int(x * tile_w), int(y * tile_h), int(round((x + w) * tile_w)), int(round((y + h) * tile_h))))
+    return regions
+
+
+class MotionGatedDetector:
+    """
+    Wraps ``detect_batch(images) -> [(boxes, confs, cls_ids), ...]`` with a
+    MotionGate. Calling it with a frame returns detections for that frame.
+    """
+
+    def __init__(
+        self,
+        detect_batch: Callable[[Sequence[np.ndarray]], list],
+        gate: MotionGate | None = None,
+        roi_max_fraction: float = 0.5,
+        refresh_interval: int = 150,
+    ) -> None:
+        self.detect_batch = detect_batch
+        self.gate = gate or MotionGate()
+        self.roi_max_fraction = roi_max_fraction  # above this tile fraction, infer the full frame
+        self.refresh_interval = refresh_interval  # full inference at least every N frames, 0 = never
+        self.detections = empty_detections()
+        self.frames = 0
+        self.skipped = 0
+        self.roi_runs = 0
+        self.full_runs = 0
+        self._since_full = 0
+
+    def __call__(self, image: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self.frames += 1
+        self._since_full += 1
+        small = self.gate.downscale(image)
+        fraction, tiles = self.gate.analyse(small)
+        refresh = self.refresh_interval and self._since_full >= self.refresh_interval
+
+        if fraction < self.gate.threshold and not refresh:
+            self.skipped += 1
+        elif tiles.any() and tiles.mean() <= self.roi_max_fraction and not refresh:
+            self.detections = self._infer_regions(image, tiles)
+            self.gate.commit(small, tiles)
+            self.roi_runs += 1
+        else:
+            # also diffuse changes above the threshold that no single tile reaches
+            self.detections = self.detect_batch([image])[0]
+            self.gate.commit(small)
+            self.full_runs += 1
+            self._since_full = 0
+        return self.detections
+
+    def _infer_regions(self, image: np.ndarray, tiles: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        height, width = image.shape[:2]
+        regions = tile_regions(tiles, width, height)
+        results = self.detect_batch([image[y1:y2, x1:x2] for x1, y1, x2, y2 in regions])
+
+        # keep previous detections whose centre lies outside every inferred region
+        boxes, confs, cls_ids = self.detections
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        cx, cy = (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2
+        keep = np.ones(len(boxes), dtype=bool)
+        for x1, y1, x2, y2 in regions:
+            keep &= ~((cx >= x1) & (cx < x2) & (cy >= y1) & (cy < y2))
+        merged = [(boxes[keep], np.asarray(confs)[keep], np.asarray(cls_ids)[keep])]
+        for (x1, y1, _, _), (r_boxes, r_confs, r_cls) in zip(regions, results):
+            merged.append((np.asarray(r_boxes, dtype=np.float32).reshape(-1, 4) + (x1, y1, x1, y1), r_confs, r_cls))
+        return (
+            np.concatenate([m[0] for m in merged]),
+            np.concatenate([np.asarray(m[1], dtype=np.float32) for m in merged]),
+            np.concatenate([np.asarray(m[2], dtype=int) for m in merged]),
+        )
+
+    @property
+    def inferences(self) -> int:
+        return self.roi_runs + self.full_runs
+
+    def summary(self) -> str:
+        return (
+            f"{self.frames} frames: {self.full_runs} full, {self.roi_runs} ROI inferences, "
+            f"{self.skipped} skipped (saved {self.skipped}/{self.frames} inferences)"
+        )
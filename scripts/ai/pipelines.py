@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+gst-launch snippets for the capture (-> appsink) and sender (appsrc ->) pipelines.
+
+The capture side negotiates the colour format the model consumes, so frames can
+be handed to the model without any per-frame conversion in Python:
+
+    ultralytics (YOLO11)  -> RGB  (the inference session letterboxes the frame itself)
+    yolov5 (torch.hub)    -> RGB  (AutoShape expects RGB numpy input)
+    onnx (exported YOLO)  -> RGB, or RGBP (planar) when already letterboxed
+
+Planar formats (RGBP/BGRP, i.e. CHW) can be requested for backends that take raw
+NCHW tensors, usually together with ``scale=True`` so that videoscale resizes
+to the model input size. Any conversion or resize needed to get there is done
+by videoconvert/videoscale, never in Python.
+
+``inference_branch`` builds a tee'd low-resolution branch that letterboxes the
+frame to the model input size in GStreamer; ``Letterbox.to_source`` maps the
+boxes back to the full-resolution display frame.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+MODEL_FORMATS = {
+    "ultralytics": "RGB",
+    "yolov5": "RGB",
+    "onnx": "RGB",
+}
+
+PLANAR_FORMATS = {"RGBP": "RGB", "BGRP": "BGR"}
+
+
+def model_format(backend: str) -> str:
+    """Raw video format a detector backend consumes without conversion."""
+    try:
+        return MODEL_FORMATS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {sorted(MODEL_FORMATS)}") from None
+
+
+def is_planar(fmt: str) -> bool:
+    return fmt in PLANAR_FORMATS
+
+
+def channel_order(fmt: str) -> str:
+    """'RGB' or 'BGR' for a packed or planar 3-channel format."""
+    return PLANAR_FORMATS.get(fmt, fmt)
+
+
+def planar_format(fmt: str) -> str:
+    """Planar counterpart (CHW) of a packed 3-channel format: RGB -> RGBP."""
+    return fmt if is_planar(fmt) else fmt + "P"
+
+
+def raw_caps(fmt: str, width: int, height: int, fps_num: int | None = None, fps_den: int = 1) -> str:
+    caps = f"video/x-raw,format={fmt},width={width},height={height}"
+    if fps_num is not None:
+        caps += f",framerate={fps_num}/{fps_den}"
+    return caps
+
+
+def appsink_tail(
+    source_format: str,
+    fmt: str,
+    width: int,
+    height: int,
+    fps_num: int,
+    fps_den: int = 1,
+    name: str = "ai_sink",
+    scale: bool = False,
+) -> str:
+    """
+    '... ! appsink' part of a capture pipeline. videoconvert is only inserted
+    when the source format differs from the one the model wants, videoscale
+    only with ``scale=True`` (width/height differ from the source).
+    """
+    convert = "" if source_format == fmt else "videoconvert ! "
+    if scale:
+        convert = "videoscale ! " + convert
+    return (
+        f"{convert}{raw_caps(fmt, width, height, fps_num, fps_den)} ! "
+        f"appsink name={name} emit-signals=true max-buffers=1 drop=true"
+    )
+
+
+def appsrc_head(fmt: str, width: int, height: int, fps_num: int, fps_den: int = 1, name: str = "ai_src") -> str:
+    """'appsrc ! videoconvert ! ' start of a sender pipeline for frames in ``fmt``."""
+    return (
+        f"appsrc name={name} is-live=true block=true format=time "
+        f"caps={raw_caps(fmt, width, height, fps_num, fps_den)} ! "
+        "videoconvert ! "
+    )
+
+
+@dataclass(frozen=True)
+class Letterbox:
+    """
+    Geometry of a letterbox resize of a ``src_width`` x ``src_height`` frame
+    into a ``size`` x ``size`` model input (aspect ratio kept, borders padded).
+    """
+
+    src_width: int
+    src_height: int
+    size: int
+    width: int
+    height: int
+    left: int
+    top: int
+
+    @classmethod
+    def fit(cls, src_width: int, src_height: int, size: int) -> Letterbox:
+        scale = min(size / src_width, size / src_height)
+        width = int(round(src_width * scale))
+        height = int(round(src_height * scale))
+        return cls(src_width, src_height, size, width, height, (size - width) // 2, (size - height) // 2)
+
+    @property
+    def scale(self) -> float:
+        return self.width / self.src_width
+
+    def elements(self) -> str:
+        """videoscale + videobox snippet producing the letterboxed frame."""
+        right = self.size - self.width - self.left
+        bottom = self.size - self.height - self.top
+        return (
+            f"videoscale ! video/x-raw,width={self.width},height={self.height} ! "
+            f"videobox left={-self.left} right={-right} top={-self.top} bottom={-bottom} fill=black ! "
+        )
+
+    def to_source(self, boxes: np.ndarray) -> np.ndarray:
+        """Map xyxy boxes from letterbox to source frame coordinates."""
+        if not len(boxes):
+            return boxes
+        mapped = (np.asarray(boxes, dtype=np.float32) - (self.left, self.top, self.left, self.top)) / self.scale
+        mapped[:, 0::2] = mapped[:, 0::2].clip(0, self.src_width)
+        mapped[:, 1::2] = mapped[:, 1::2].clip(0, self.src_height)
+        return mapped
+
+
+def inference_branch(
+    letterbox: Letterbox,
+    fmt: str,
+    tee: str = "t",
+    name: str = "ai_infer_sink",
+) -> str:
+    """
+    Low-resolution branch off ``tee``: leaky queue (never stalls the display
+    branch) -> letterbox to the model size -> ``fmt`` -> appsink.
+    """
+    return (
+        f"{tee}. ! queue leaky=downstream max-size-buffers=1 ! "
+        + letterbox.elements()
+        + f"videoconvert ! {raw_caps(fmt, letterbox.size, letterbox.size)} ! "
+        f"appsink name={name} emit-signals=true max-buffers=1 drop=true"
+    )
+
+
+# kyh264enc (Orange Pi) output caps expected by webrtcsink, as in demo_yolov5_cocksorange.py
+KYH264_CAPS = (
+    'video/x-h264, stream-format=(string)byte-stream,alignment=(string)au, profile=(string)main,'
+    'level=(string)3.1, coded-picture-structure=(string)frame, chroma-format=(string)4:2:0, '
+    'bit-depth-luma=(uint)8, bit-depth-chroma=(uint)8, parsed=(boolean)true'
+)
+
+
+def source_head(source) -> tuple[str, str]:
+    """
+    'source ! caps ! ' start of a capture pipeline for a profiles.SourceConfig,
+    and the raw format it delivers (to decide whether videoconvert is needed).
+    """
+    fps = f"framerate={source.fps_num}/{source.fps_den}"
+    num_buffers = f" num-buffers={source.num_buffers}" if source.num_buffers else ""
+    fmt = source.format
+    if source.kind == "libcamerasrc":
+        head = f"libcamerasrc ! {raw_caps(fmt, source.width, source.height, source.fps_num, source.fps_den)} ! "
+    elif source.kind == "v4l2src":
+        device = f" device={source.device}" if source.device else ""
+        if fmt == "jpeg":
+            head = f"v4l2src{device} ! image/jpeg,width={source.width},height={source.height},{fps} ! jpegdec ! "
+            fmt = "I420"
+        else:
+            head = f"v4l2src{device} ! {raw_caps(fmt, source.width, source.height, source.fps_num, source.fps_den)} ! "
+    elif source.kind == "pylonsrc":
+        head = f"pylonsrc ! video/x-raw,format={fmt} ! "
+    elif source.kind == "videotestsrc":
+        head = (
+            f"videotestsrc is-live=true pattern={source.pattern}{num_buffers} ! "
+            f"{raw_caps(fmt, source.width, source.height, source.fps_num, source.fps_den)} ! "
+        )
+    elif source.kind == "filesrc":
+        head = (
+            f'filesrc location="{source.location}"{num_buffers} ! decodebin ! videoconvert ! videoscale ! videorate ! '
+            f"{raw_caps(fmt, source.width, source.height, source.fps_num, source.fps_den)} ! "
+        )
+    else:
+        raise ValueError(f"Unknown source {source.kind!r}")
+    if source.flip:
+        head += f"videoflip method={source.flip} ! "
+    return head, fmt
+
+
+def encoder_chain(encoder) -> str:
+    """'... ! ' encoder part of a sender pipeline for a profiles.EncoderConfig."""
+    options = f" {encoder.options}" if encoder.options else ""
+    if encoder.kind == "none":
+        return ""
+    if encoder.kind == "vp8enc":
+        return f"video/x-raw,format=I420 ! queue ! vp8enc{options or ' deadline=1 threads=2'} ! queue ! "
+    if encoder.kind == "kyh264enc":
+        return (
+            f"video/x-raw,format=I420 ! kyh264enc{options} ! h264parse config-interval=1 ! "
+            f'capsfilter caps="{KYH264_CAPS}" ! queue ! '
+        )
+    if encoder.kind == "x264enc":
+        return (
+            f"video/x-raw,format=I420 ! x264enc{options or ' tune=zerolatency speed-preset=ultrafast'} ! "
+            "h264parse config-interval=1 ! queue ! "
+        )
+    raise ValueError(f"Unknown encoder {encoder.kind!r}")
+
+
+def sink_tail(sink) -> str:
+    """Final sink element(s) of a sender pipeline for a profiles.SinkConfig."""
+    options = f" {sink.options}" if sink.options else ""
+    if sink.kind == "webrtcsink":
+        uri = f' signaller::uri="{sink.signaller_uri}"' if sink.signaller_uri else ""
+        tail = f'webrtcsink name=ws{uri} meta="meta,name={sink.meta_name}"{options}'
+        if sink.audio:
+            tail += " audiotestsrc is-live=true ! ws."
+        return tail
+    if sink.kind == "fakesink":
+        return f"fakesink sync=false{options}"
+    if sink.kind == "autovideosink":
+        return f"videoconvert ! autovideosink{options}"
+    raise ValueError(f"Unknown sink {sink.kind!r}")
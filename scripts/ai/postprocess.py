@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Vectorised NumPy decoding and class-aware NMS for raw YOLO head outputs.
+
+The confidence filter runs on the whole batch at once; the candidate cap and
+NMS then run per image, so an image decodes to the same detections alone or in
+a batch. Classes are kept apart by offsetting their boxes, so one NMS pass per
+image never suppresses across classes. Greedy NMS only compares each kept box
+with the candidates still alive and stops after ``max_det`` boxes, so no N x N
+IoU matrix is built. Returns the per-image (boxes xyxy, confs, cls_ids) tuples
+that overlay.draw_detections consumes.
+
+Supported layouts (batch dimension first):
+
+    YOLOv8/YOLO11 export: (B, 4 + nc, anchors), no objectness
+    YOLOv5 export:        (B, anchors, 5 + nc), objectness in column 4
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+# Defaults match MODEL_CONF / MODEL_IOU of demo_yolov11_rasp.py
+MODEL_CONF = 0.25
+MODEL_IOU = 0.45
+
+# Candidates kept per image (by score) before NMS
+MAX_CANDIDATES = 3000
+MAX_DETECTIONS = 300
+
+def _empty() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return np.empty((0, 4), dtype=np.float32), np.empty((0,), dtype=np.float32), np.empty((0,), dtype=int)
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU matrix (N, M) between two sets of xyxy boxes."""
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = w * h
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def box_ios(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Intersection over the smaller box (N, M): 1 when one box lies inside the other."""
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    return w * h / (np.minimum(area_a[:, None], area_b[None, :]) + 1e-9)
+
+
+_OVERLAPS = {"iou": box_iou, "ios": box_ios}
+
+
+def nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou: float = MODEL_IOU,
+    method: str = "greedy",
+    metric: str = "iou",
+    max_det: int | None = None,
+) -> np.ndarray:
+    """
+    Indices of the boxes kept by NMS, highest score first, at most ``max_det``.
+
+    greedy -> exact standard NMS (same result as torchvision/Ultralytics); each
+              kept box is compared with the boxes still alive only, one
+              vectorised row per kept box
+    fast   -> "Fast NMS": a box is dropped if any higher scored box overlaps it,
+              one vectorised N x N matrix, slightly more aggressive
+
+    ``metric="ios"`` compares intersection over the smaller box instead of IoU,
+    which also suppresses partial boxes of an object cut by a tile border.
+    """
+    if metric not in _OVERLAPS:
+        raise ValueError(f"Unknown NMS metric {metric!r}")
+    if method not in ("greedy", "fast"):
+        raise ValueError(f"Unknown NMS method {method!r}")
+    if len(boxes) == 0:
+        return np.empty((0,), dtype=int)
+    overlap = _OVERLAPS[metric]
+    order = np.argsort(-scores, kind="stable")
+    boxes = boxes[order]
+    if method == "fast":
+        keep = ~np.triu(overlap(boxes, boxes) > iou, k=1).any(axis=0)
+        return order[keep][:max_det]
+    alive = np.arange(len(order))
+    keep = []
+    while len(alive) and (max_det is None or len(keep) < max_det):
+        best, alive = alive[0], alive[1:]
+        keep.append(best)
+        alive = alive[overlap(boxes[best:best + 1], boxes[alive])[0] <= iou]
+    return order[np.asarray(keep, dtype=int)]
+
+
+def _split_layout(outputs: np.ndarray) -> tuple[np.ndarray, np.ndarray, int]:
+    """(B, A, 4) cxcywh boxes, class scores and the class axis of the scores."""
+    if outputs.shape[1] < outputs.shape[2]:
+        # reduce over the contiguous class axis instead of transposing (B, nc, A)
+        return outputs[:, :4, :].transpose(0, 2, 1), outputs[:, 4:, :], 1
+    return outputs[..., :4], outputs[..., 5:] * outputs[..., 4:5], 2
+
+
+def decode_batch(
+    outputs: np.ndarray,
+    conf: float = MODEL_CONF,
+    iou: float = MODEL_IOU,
+    max_det: int = MAX_DETECTIONS,
+    method: str = "greedy",
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Decode a batch of raw outputs into per-image (boxes, confs, cls_ids)."""
+    outputs = np.asarray(outputs, dtype=np.float32)
+    if outputs.ndim == 2:
+        outputs = outputs[None]
+    batch = outputs.shape[0]
+    cxcywh, scores, class_axis = _split_layout(outputs)
+
+    cls_ids = scores.argmax(axis=class_axis)
+    confs = np.take_along_axis(scores, np.expand_dims(cls_ids, class_axis), axis=class_axis).squeeze(class_axis)
+    image_idx, anchor_idx = np.nonzero(confs > conf)
+    if len(image_idx) == 0:
+        return [_empty() for _ in range(batch)]
+
+    confs = confs[image_idx, anchor_idx]
+    cls_ids = cls_ids[image_idx, anchor_idx]
+    # image_idx is sorted (np.nonzero order), so every image is one contiguous run
+    bounds = np.searchsorted(image_idx, np.arange(batch + 1))
+    results = []
+    for b in range(batch):
+        start, stop = bounds[b], bounds[b + 1]
+        results.append(
+            _decode_image(cxcywh[b], anchor_idx[start:stop], confs[start:stop], cls_ids[start:stop], iou, max_det, method)
+        )
+    return results
+
+
+def _decode_image(
+    cxcywh: np.ndarray,
+    anchor_idx: np.ndarray,
+    confs: np.ndarray,
+    cls_ids: np.ndarray,
+    iou: float,
+    max_det: int,
+    method: str,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Candidate cap and class-aware NMS for the candidates of one image."""
+    if len(confs) == 0:
+        return _empty()
+    if len(confs) > MAX_CANDIDATES:
+        top = np.argpartition(-confs, MAX_CANDIDATES)[:MAX_CANDIDATES]
+        anchor_idx, confs, cls_ids = anchor_idx[top], confs[top], cls_ids[top]
+
+    c = cxcywh[anchor_idx]
+    boxes = np.empty_like(c)
+    boxes[:, :2] = c[:, :2] - c[:, 2:] / 2
+    boxes[:, 2:] = c[:, :2] + c[:, 2:] / 2
+
+    # move every class into its own coordinate range: one NMS pass, no cross-class suppression
+    span = float(boxes.max() - boxes.min()) + 1.0
+    offsets = cls_ids.astype(np.float64)[:, None] * span
+    keep = nms(boxes + offsets, confs, iou, method, max_det=max_det)
+    return boxes[keep], confs[keep], cls_ids[keep].astype(int)
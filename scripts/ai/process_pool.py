@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Detector workers in separate processes, fed through shared-memory frame slots.
+
+In one process the GLib streaming threads, the overlay and the Python glue of
+torch/Ultralytics all contend for the GIL. ``ProcessPool`` runs N detector
+processes instead (spawned, so no GStreamer/GLib state is forked):
+
+    submit(frame)   copy the image into a free slot of one SharedMemory block
+                    (the only copy, the frame itself is never pickled) and send
+                    (seq, slot, shape) to the least busy worker
+    worker          view the slot as an ndarray, detect, send back
+                    (seq, slot, boxes, confs, cls_ids, seconds, error)
+    collector       thread that attaches the detections to the waiting frames
+                    and hands them to ``sink`` in PTS order
+
+Every worker has its own task and result pipe, so the pool knows which slots
+a worker holds. When a worker dies its slots are freed, its frames dropped
+(``lost``) and the worker restarted, up to ``max_restarts`` times.
+
+When every slot is busy the new frame is dropped (``dropped``), so a slow pool
+bounds latency instead of queueing. Each worker should use one intra-op
+thread; bench_process_pool.py reports throughput as the worker count varies.
+"""
+
+from __future__ import annotations
+
+import collections
+import heapq
+import multiprocessing
+import threading
+import time
+from dataclasses import dataclass, field
+from multiprocessing import connection, shared_memory
+from typing import Any, Callable
+
+import numpy as np
+
+from overlay import empty_detections
+from stages import Frame
+
+
+def _worker_main(factory, tiles, shm_name, slot_shape, warmup_frames, tasks, results) -> None:
+    """Worker process: build the detector, then serve slots until a None task."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        detector = factory()
+        infer = detector
+        if tiles:
+            from tiles import TiledDetector
+
+            infer = TiledDetector(detector.predict, **tiles)
+        if warmup_frames:
+            detector.warm_up(slot_shape, warmup_frames)
+        results.send(("ready", detector.names))
+    except Exception as e:
+        results.send(("failed", f"{type(e).__name__}: {e}"))
+        shm.close()
+        return
+
+    slot_bytes = int(np.prod(slot_shape))
+    while True:
+        try:
+            task = tasks.recv()
+        except EOFError:  # the pool went away
+            break
+        if task is None:
+            break
+        seq, slot, shape = task
+        image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+        start = time.perf_counter()
+        error = None
+        try:
+            boxes, confs, cls_ids = infer(image)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            boxes, confs, cls_ids = empty_detections()
+        del image  # no exported pointers into shm.buf may outlive the loop
+        results.send(
+            (seq, slot, np.asarray(boxes), np.asarray(confs), np.asarray(cls_ids), time.perf_counter() - start, error)
+        )
+    shm.close()
+
+
+@dataclass(eq=False)
+class _Worker:
+    process: Any
+    tasks: Any  # parent end of the task pipe
+    results: Any  # parent end of the result pipe
+    ready: bool = False
+    assigned: dict = field(default_factory=dict)  # seq -> slot in flight on this worker
+
+
+class ProcessPool:
+    """
+    ``workers`` detector processes built by ``factory()`` (a picklable callable,
+    e.g. a functools.partial of detectors.create_detector) for frames of at
+    most ``shape`` (height, width, channels) uint8.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        shape: tuple[int, int, int],
+        sink: Callable[[Frame], Any],
+        workers: int = 4,
+        slots: int = 0,
+        tiles: dict | None = None,
+        warmup_frames: int = 3,
+        max_restarts: int = 3,
+        start_method: str = "spawn",
+    ) -> None:
+        self.factory = factory
+        self.shape = tuple(shape)
+        self.sink = sink
+        self.workers = max(1, workers)
+        self.slots = slots or 2 * self.workers  # one in flight and one queued per worker
+        self.tiles = tiles
+        self.warmup_frames = warmup_frames
+        self.max_restarts = max_restarts
+        self.names = None
+        self.loaded = False  # all workers ready
+        self.observers: list[Callable[[str, float], None]] = []
+        self.latencies: collections.deque = collections.deque(maxlen=1000)
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.lost = 0  # frames in flight on a worker that died
+        self.restarts = 0
+        self.reordered = 0  # results that arrived before an earlier frame's
+        self.errors = 0  # inferences that raised in a worker, passed on with empty detections
+        self.last_error: str | None = None
+        self._context = multiprocessing.get_context(start_method)
+        self._slot_bytes = int(np.prod(self.shape))
+        self._shm: shared_memory.SharedMemory | None = None
+        self._workers: list[_Worker] = []
+        self._collector: threading.Thread | None = None
+        self._wake = None  # (reader, writer) pipe that stops the collector
+        self._stopping = False
+        self._free: list[int] = []
+        self._cond = threading.Condition()
+        self._pending: dict[int, Frame] = {}
+        self._order: list[tuple[int, int]] = []  # heap of (pts, seq) still to be emitted
+        self._done: dict[int, Frame] = {}
+        self._lost: set[int] = set()  # seqs that will never come back
+        self._seq = 0
+
+    @property
+    def in_flight(self) -> int:
+        with self._cond:
+            return self.slots - len(self._free)
+
+    @property
+    def alive(self) -> int:
+        with self._cond:
+            return sum(worker.process.is_alive() for worker in self._workers)
+
+    def _spawn(self) -> _Worker:
+        task_reader, task_writer = self._context.Pipe(duplex=False)
+        result_reader, result_writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            name="detector",
+            args=(self.factory, self.tiles, self._shm.name, self.shape, self.warmup_frames, task_reader, result_writer),
+            daemon=True,
+        )
+        process.start()
+        task_reader.close()  # the child's ends, so a dead child shows up as EOF
+        result_writer.close()
+        return _Worker(process, task_writer, result_reader)
+
+    def start(self, timeout: float = 300.0) -> None:
+        """Spawn the workers and wait until all of them loaded and warmed up their detector."""
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self._slot_bytes)
+        self._free = list(range(self.slots))
+        self._stopping = False
+        self._wake = self._context.Pipe(duplex=False)
+        self._workers = [self._spawn() for _ in range(self.workers)]
+
+        start = time.perf_counter()
+        for worker in self._workers:
+            remaining = timeout - (time.perf_counter() - start)
+            if not connection.wait([worker.results, worker.process.sentinel], max(remaining, 0)):
+                self.stop()
+                raise RuntimeError("detector processes did not start")
+            try:
+                kind, payload = worker.results.recv()
+            except EOFError:
+                kind, payload = "failed", f"exit code {worker.process.exitcode}"
+            if kind == "failed":
+                self.stop()
+                raise RuntimeError(f"detector process {worker.process.pid} failed: {payload}")
+            worker.ready = True
+            self.names = payload
+        self.loaded = True
+        print(f"{self.workers} detector processes ready in {time.perf_counter() - start:.2f} s ({self.slots} frame slots)")
+        self._collector = threading.Thread(target=self._collect, name="process-pool-results", daemon=True)
+        self._collector.start()
+
+    def submit(self, frame: Frame, timeout: float | None = 0.0) -> bool:
+        """
+        Copy ``frame.image`` into a free slot and queue it. Waits up to
+        ``timeout`` seconds for a slot (None = forever); drops the frame if none
+        frees up. The frame is passed to ``sink`` once its detections are back.
+        Raises RuntimeError once every worker died and none may be restarted.
+        """
+        image = frame.image
+        if image.dtype != np.uint8 or image.size > self._slot_bytes:
+            raise ValueError(f"frame of {image.shape} {image.dtype} does not fit a {self.shape} uint8 slot")
+        with self._cond:
+            if not any(worker.process.is_alive() for worker in self._workers):
+                frame.release()
+                raise RuntimeError("all detector processes died")
+            if not self._free and timeout != 0.0:
+                self._cond.wait_for(lambda: self._free, timeout)
+            workers = [worker for worker in self._workers if worker.ready]
+            if not self._free or not workers:  # no slot, or only restarted workers still loading
+                self.dropped += 1
+                frame.release()
+                return False
+            slot = self._free.pop()
+            seq = self._seq
+            self._seq += 1
+            worker = min(workers, key=lambda w: len(w.assigned))
+            worker.assigned[seq] = slot
+            self._pending[seq] = frame
+            heapq.heappush(self._order, (frame.pts, seq))
+            self.submitted += 1
+            # copy under the lock: a dying worker's frames are released by the collector
+            view = np.ndarray(image.shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self._slot_bytes)
+            view[...] = image
+            del view
+            try:
+                worker.tasks.send((seq, slot, image.shape))
+            except OSError:
+                pass  # the worker just died; the collector frees the slot and drops the frame
+        return True
+
+    def _collect(self) -> None:
+        wake = self._wake[0]
+        while True:
+            with self._cond:
+                by_result = {worker.results: worker for worker in self._workers}
+                by_sentinel = {worker.process.sentinel: worker for worker in self._workers}
+            for ready in connection.wait([wake, *by_result, *by_sentinel]):
+                if ready is wake:
+                    return
+                worker = by_result.get(ready) or by_sentinel[ready]
+                if worker not in self._workers:
+                    continue  # already handled through its other handle
+                if ready is worker.results:
+                    try:
+                        message = worker.results.recv()
+                    except EOFError:
+                        self._on_exit(worker)
+                        continue
+                    self._on_message(worker, message)
+                elif not worker.results.poll():  # exited; read what it sent before first
+                    self._on_exit(worker)
+
+    def _on_message(self, worker: _Worker, message: tuple) -> None:
+        if message[0] == "ready":
+            worker.ready = True
+            return
+        if message[0] == "failed":
+            print(f"Restarted detector process failed: {message[1]}")
+            return
+        seq, slot, boxes, confs, cls_ids, seconds, error = message
+        if error is not None:
+            if self.errors == 0:
+                print(f"Error in detector process: {error}")
+            self.errors += 1
+            self.last_error = error
+        self.latencies.append(seconds)
+        for observer in self.observers:
+            observer("predict", seconds)
+        with self._cond:
+            worker.assigned.pop(seq, None)
+            self._free.append(slot)
+            self._cond.notify_all()
+            frame = self._pending.pop(seq)
+            frame.detections = (boxes, confs, cls_ids)
+            self._done[seq] = frame
+            if self._order[0][1] != seq:
+                self.reordered += 1
+        self._emit()
+
+    def _on_exit(self, worker: _Worker) -> None:
+        """Free the slots of a dead worker, drop its frames and restart it."""
+        worker.process.join(0.1)
+        if not self._stopping:
+            print(f"Detector process {worker.process.pid} exited with code {worker.process.exitcode}")
+        with self._cond:
+            self._workers.remove(worker)
+            for seq, slot in worker.assigned.items():
+                self._free.append(slot)
+                self._pending.pop(seq).release()
+                self._lost.add(seq)
+                self.lost += 1
+            worker.assigned.clear()
+            if not self._stopping and self.restarts < self.max_restarts:
+                self.restarts += 1
+                self._workers.append(self._spawn())
+            self._cond.notify_all()
+        worker.tasks.close()
+        worker.results.close()
+        self._emit()
+
+    def _emit(self) -> None:
+        """Hand the frames at the head of the PTS order to the sink."""
+        ready = []
+        with self._cond:
+            while self._order and (self._order[0][1] in self._done or self._order[0][1] in self._lost):
+                seq = heapq.heappop(self._order)[1]
+                if seq in self._lost:
+                    self._lost.discard(seq)
+                else:
+                    ready.append(self._done.pop(seq))
+            self.completed += len(ready)
+        for frame in ready:
+            try:
+                self.sink(frame)
+            except Exception as e:
+                print(f"Error in process pool sink: {e}")
+                frame.release()
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """Wait until every submitted frame went to the sink (or was lost with its worker)."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self.completed + self.lost < self.submitted:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Let the frames in flight reach the sink, then shut the workers down."""
+        if self._collector is not None:
+            self.drain(timeout)
+        with self._cond:
+            self._stopping = True
+            workers = list(self._workers)
+        for worker in workers:
+            try:
+                worker.tasks.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if self._collector is not None:
+            self._wake[1].send(None)
+            self._collector.join(timeout)
+            self._collector = None
+        with self._cond:
+            for worker in self._workers:
+                worker.tasks.close()
+                worker.results.close()
+            self._workers = []
+            for frame in list(self._pending.values()) + list(self._done.values()):
+                frame.release()
+            self._pending.clear()
+            self._done.clear()
+            self._order.clear()
+            self._lost.clear()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def latency_summary(self) -> str:
+        if not self.latencies:
+            return f"{self.workers} processes: no inferences"
+        ms = np.asarray(self.latencies) * 1000.0
+        return (
+            f"{self.workers} processes: {len(ms)} calls, mean {ms.mean():.1f} ms, "
+            f"p50 {np.percentile(ms, 50):.1f} ms, p95 {np.percentile(ms, 95):.1f} ms"
+        )
+
+    def summary(self) -> str:
+        errors = f", {self.errors} detector errors (last: {self.last_error})" if self.errors else ""
+        restarts = f", {self.lost} lost in {self.restarts} worker restarts" if self.lost or self.restarts else ""
+        return (
+            f"{self.completed}/{self.submitted} frames inferred in {self.workers} processes, "
+            f"{self.dropped} dropped (all {self.slots} slots busy), {self.reordered} out of order{errors}{restarts}"
+        )
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Device profiles for run.py: source, caps, detector, encoder and sink of one
+deployment in a TOML (or, with PyYAML installed, YAML) file.
+
+    [source]
+    kind = "v4l2src"          # libcamerasrc | v4l2src | pylonsrc | videotestsrc | filesrc
+    device = "/dev/video20"
+    format = "YUY2"           # raw format the source delivers, or "jpeg"
+    width = 1280
+    height = 720
+    fps_num = 5
+
+    [detector]
+    backend = "yolov5"        # ultralytics | yolov5 | onnx | none
+    model = "yolov5n"
+    mode = "staged"           # staged | passthrough | tracking
+    pipeline = "bridge"       # bridge (appsink -> appsrc) | single (tee, in-pipeline overlay)
+    overlay = "burn-in"       # burn-in | metadata (webrtcsink data channel) | both
+
+    [encoder]
+    kind = "kyh264enc"        # vp8enc | kyh264enc | x264enc | none (webrtcsink encodes)
+
+    [sink]
+    kind = "webrtcsink"       # webrtcsink | fakesink | autovideosink
+    signaller_uri = "ws://0.0.0.0:8443"
+
+    [metrics]
+    port = 9100               # Prometheus-style /metrics endpoint, 0 = off
+    stamp = false             # timestamp pattern for glass_to_glass.py
+
+Every key has a default (see the dataclasses below), unknown keys are an
+error. ``load_profile(path, overrides)`` applies ``section.key=value``
+overrides on top, e.g. from ``run.py --set detector.conf=0.4``.
+"""
+
+from __future__ import annotations
+
+import ast
+import os
+from dataclasses import asdict, dataclass, field, fields
+
+SOURCES = ("libcamerasrc", "v4l2src", "pylonsrc", "videotestsrc", "filesrc")
+BACKENDS = ("ultralytics", "yolov5", "onnx", "none")
+MODES = ("staged", "passthrough", "tracking")
+PIPELINES = ("bridge", "single")
+OVERLAYS = ("burn-in", "metadata", "both")
+TILE_MODES = ("all", "coarse")
+ENCODERS = ("vp8enc", "kyh264enc", "x264enc", "none")
+SINKS = ("webrtcsink", "fakesink", "autovideosink")
+
+
+@dataclass
+class SourceConfig:
+    kind: str = "videotestsrc"
+    device: str = ""  # v4l2src
+    location: str = ""  # filesrc
+    pattern: str = "ball"  # videotestsrc
+    format: str = "RGB"
+    width: int = 1280
+    height: int = 720
+    fps_num: int = 30
+    fps_den: int = 1
+    flip: str = ""  # videoflip method, e.g. "rotate-180"
+    num_buffers: int = 0  # stop after N frames (videotestsrc/filesrc), 0 = run forever
+
+
+@dataclass
+class DetectorConfig:
+    backend: str = "none"
+    model: str = "yolo11n"
+    model_path: str = ""  # onnx, defaults to <model>.onnx (exported into the model cache if missing, fp32)
+    precision: str = "fp32"  # onnx, see quantize.py
+    imgsz: int = 640
+    conf: float = 0.25
+    iou: float = 0.45
+    threads: int = 0  # torch intra-op / ONNX Runtime threads, 0 = default
+    mode: str = "staged"  # bridge pipeline only, "single" always infers asynchronously
+    pipeline: str = "bridge"
+    overlay: str = "burn-in"  # metadata needs sink.kind = "webrtcsink", see metadata.py
+    queue_policy: str = "drop-oldest"
+    queue_size: int = 2
+    keyframe_interval: int = 10  # tracking
+    min_confidence: float = 0.2  # tracking: run the detector early once a tracked box decays below this
+    processes: int = 0  # bridge pipeline, staged mode: detector worker processes, 0 = in-process (see process_pool.py)
+    tile_size: int = 0  # bridge pipeline: sliced inference in tiles of this size, 0 = off (see tiles.py)
+    tile_overlap: float = 0.2
+    tile_mode: str = "all"
+    tile_coarse_conf: float = 0.1  # coarse: detector threshold of the pass that flags tiles
+    warmup_frames: int = 3
+
+
+@dataclass
+class EncoderConfig:
+    kind: str = "vp8enc"
+    options: str = ""  # extra element properties, e.g. "deadline=1 threads=2"
+
+
+@dataclass
+class SinkConfig:
+    kind: str = "webrtcsink"
+    signaller_uri: str = "ws://0.0.0.0:8443"  # "" = webrtcsink default
+    meta_name: str = "gst-stream"
+    options: str = ""  # extra element properties, e.g. "congestion-control=disabled"
+    audio: bool = False  # webrtcsink: add an audiotestsrc track
+
+
+@dataclass
+class MetricsConfig:
+    port: int = 0  # 0 = no endpoint, stage timings are still printed at exit
+    host: str = "127.0.0.1"
+    stamp: bool = False  # draw the glass-to-glass timestamp pattern in front of the encoder
+
+
+@dataclass
+class Profile:
+    name: str = ""
+    source: SourceConfig = field(default_factory=SourceConfig)
+    detector: DetectorConfig = field(default_factory=DetectorConfig)
+    encoder: EncoderConfig = field(default_factory=EncoderConfig)
+    sink: SinkConfig = field(default_factory=SinkConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+_SECTIONS = {
+    "source": SourceConfig,
+    "detector": DetectorConfig,
+    "encoder": EncoderConfig,
+    "sink": SinkConfig,
+    "metrics": MetricsConfig,
+}
+_CHOICES = {
+    ("source", "kind"): SOURCES,
+    ("detector", "backend"): BACKENDS,
+    ("detector", "mode"): MODES,
+    ("detector", "pipeline"): PIPELINES,
+    ("detector", "overlay"): OVERLAYS,
+    ("detector", "tile_mode"): TILE_MODES,
+    ("encoder", "kind"): ENCODERS,
+    ("sink", "kind"): SINKS,
+}
+
+
+def _read(path: str) -> dict:
+    with open(path, "rb") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+
+            return yaml.safe_load(f) or {}
+        import tomllib
+
+        return tomllib.load(f)
+
+
+def _parse_value(text: str):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def apply_override(data: dict, override: str) -> None:
+    """Apply one ``section.key=value`` override to the raw profile dict."""
+    key, sep, value = override.partition("=")
+    section, dot, name = key.strip().partition(".")
+    if not sep or not dot:
+        raise ValueError(f"Override {override!r} is not of the form section.key=value")
+    data.setdefault(section, {})[name] = _parse_value(value.strip())
+
+
+def profile_from_dict(data: dict, name: str = "") -> Profile:
+    profile = Profile(name=data.get("name", name))
+    for section, value in data.items():
+        if section == "name":
+            continue
+        if section not in _SECTIONS:
+            raise ValueError(f"Unknown profile section [{section}], expected one of {sorted(_SECTIONS)}")
+        config = getattr(profile, section)
+        known = {f.name for f in fields(config)}
+        for key, item in (value or {}).items():
+            if key not in known:
+                raise ValueError(f"Unknown key {section}.{key}, expected one of {sorted(known)}")
+            default = getattr(config, key)
+            if isinstance(default, bool):
+                item = item if isinstance(item, bool) else str(item).lower() in ("1", "true", "yes")
+            elif isinstance(default, (int, float)):
+                item = type(default)(item)
+            else:
+                item = str(item)
+            choices = _CHOICES.get((section, key))
+            if choices and item not in choices:
+                raise ValueError(f"{section}.{key} = {item!r}, expected one of {choices}")
+            setattr(config, key, item)
+    return profile
+
+
+def load_profile(path: str, overrides: list[str] | None = None) -> Profile:
+    data = _read(path)
+    for override in overrides or ():
+        apply_override(data, override)
+    return profile_from_dict(data, name=os.path.splitext(os.path.basename(path))[0])
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Quantised variants of an exported YOLO .onnx model for the CPU-only boards.
+
+    fp32          the exported model as is
+    fp16          weights and activations in half precision (needs onnxconverter-common),
+                  inputs/outputs stay float32
+    int8-dynamic  INT8 weights, activations quantised on the fly; no calibration data
+    int8-static   INT8 weights and activations (QDQ), ranges calibrated on local frames
+
+Variants are written next to the source model as ``<name>.<precision>.onnx``
+(see ``quantized_path``), which is what the demos load for a MODEL_PRECISION.
+Static calibration reads frames from a directory of images or a recorded clip
+and letterboxes them exactly like OnnxDetector does at runtime.
+
+    python3 quantize.py yolo11n.onnx --precision int8-static --calibration clip.mp4 --frames 200
+
+Use compare_precision.py to check the accuracy/latency trade-off per device.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from typing import Iterator
+
+import cv2
+import numpy as np
+
+from detectors import letterbox_chw
+
+PRECISIONS = ("fp32", "fp16", "int8-dynamic", "int8-static")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def quantized_path(model_path: str, precision: str) -> str:
+    """Path of the ``precision`` variant of ``model_path``: yolo11n.onnx -> yolo11n.int8-static.onnx."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+    if precision == "fp32":
+        return model_path
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.{precision}{ext}"
+
+
+def read_frames(source: str, limit: int) -> Iterator[np.ndarray]:
+    """Up to ``limit`` BGR frames from an image directory or evenly spaced over a video clip."""
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(IMAGE_EXTENSIONS))
+        for name in names[:limit]:
+            image = cv2.imread(os.path.join(source, name))
+            if image is not None:
+                yield image
+        return
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Cannot open calibration source {source!r}")
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or limit
+    step = max(total // limit, 1)
+    try:
+        for index in range(0, total, step)[:limit]:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, image = capture.read()
+            if not ok:
+                break
+            yield image
+    finally:
+        capture.release()
+
+
+class CalibrationReader:
+    """ONNX Runtime calibration data reader feeding letterboxed frames one by one."""
+
+    def __init__(self, input_name: str, frames: Iterator[np.ndarray], size: int) -> None:
+        self.input_name = input_name
+        self.blobs = [
+            (letterbox_chw(frame, size, "BGR")[0][None].astype(np.float32) / 255.0) for frame in frames
+        ]
+        if not self.blobs:
+            raise ValueError("No calibration frames found")
+        self._iter = iter(self.blobs)
+
+    def get_next(self) -> dict | None:
+        blob = next(self._iter, None)
+        return None if blob is None else {self.input_name: blob}
+
+    def rewind(self) -> None:
+        self._iter = iter(self.blobs)
+
+
+def _model_input(model_path: str) -> tuple[str, int]:
+    import onnx
+
+    model_input = onnx.load(model_path, load_external_data=False).graph.input[0]
+    dims = model_input.type.tensor_type.shape.dim
+    return model_input.name, dims[2].dim_value or 640
+
+
+def quantize_model(
+    model_path: str,
+    precision: str,
+    calibration: str | None = None,
+    frames: int = 100,
+    output_path: str | None = None,
+) -> str:
+    """Write the ``precision`` variant of ``model_path`` and return its path."""
+    output_path = output_path or quantized_path(model_path, precision)
+    if precision == "fp32":
+        return model_path
+
+    if precision == "fp16":
+        import onnx
+        from onnxconverter_common import float16
+
+        model = float16.convert_float_to_float16(onnx.load(model_path), keep_io_types=True)
+        onnx.save(model, output_path)
+        return output_path
+
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    # shape inference + graph optimisation first, as recommended for quantisation
+    prepared_path = output_path + ".prep.onnx"
+    quant_pre_process(model_path, prepared_path)
+    try:
+        if precision == "int8-dynamic":
+            quantize_dynamic(prepared_path, output_path, weight_type=QuantType.QUInt8)
+        elif precision == "int8-static":
+            if calibration is None:
+                raise ValueError("int8-static needs calibration frames (image directory or video clip)")
+            input_name, size = _model_input(model_path)
+            reader = CalibrationReader(input_name, read_frames(calibration, frames), size)
+            print(f"Calibrating on {len(reader.blobs)} frames ...")
+            quantize_static(
+                prepared_path,
+                output_path,
+                reader,
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+            )
+        else:
+            raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+    finally:
+        if os.path.exists(prepared_path):
+            os.remove(prepared_path)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help="exported FP32 .onnx model")
+    parser.add_argument("--precision", choices=PRECISIONS[1:], default="int8-dynamic")
+    parser.add_argument("--calibration", help="image directory or video clip (int8-static)")
+    parser.add_argument("--frames", type=int, default=100, help="calibration frames to use")
+    parser.add_argument("--output", help="output path (default: <model>.<precision>.onnx)")
+    args = parser.parse_args()
+
+    output_path = quantize_model(args.model, args.precision, args.calibration, args.frames, args.output)
+    size_mb = os.path.getsize(output_path) / 1e6
+    print(f"Wrote {output_path} ({size_mb:.1f} MB, source {os.path.getsize(args.model) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
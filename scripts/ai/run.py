@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Profile-driven runner: one entry point for the camera/AI/WebRTC demos.
+
+Builds the pipelines from a device profile (see profiles.py and profiles/):
+
+    without detector:  source ! videoconvert ! [encoder] ! sink
+    bridge pipeline:   source ! appsink  ->  inference -> overlay  ->  appsrc ! [encoder] ! sink
+    single pipeline:   source ! tee ! queue ! cairooverlay ! [encoder] ! sink
+                              tee. ! queue leaky ! letterbox ! appsink  ->  async inference
+
+so per-device settings (source, caps, backend, thresholds, encoder, signalling
+URI) live in a profile instead of a forked script.
+
+With ``detector.pipeline = "single"`` frames never leave GStreamer: the
+inference branch only receives small letterboxed frames (dropped while the
+detector is busy), and cairooverlay draws the latest detections, tagged with
+the PTS of the frame they were computed on, before the encoder. No full-size
+frame is copied into or out of Python. Every run reports the capture-to-encoder
+latency (see latency.py); compare_pipelines.py runs a profile in both modes.
+
+With ``detector.overlay = "metadata"`` nothing is drawn: frames are encoded
+unmodified and the detections go to the WebRTC consumers over a data channel
+(see metadata.py). "both" does burn-in and metadata.
+
+With ``detector.processes`` set, inference runs in that many detector
+processes fed through shared-memory frame slots, so it does not contend with
+the streaming threads and the overlay for the GIL (see process_pool.py).
+
+With ``detector.tile_size`` set, high-resolution frames (e.g. a 5 MP
+pylonsrc) are inferred in overlapping tiles batched into one detector call,
+and the tile detections merged across the seams (see tiles.py).
+
+Per-stage timings (map/copy, preprocess, inference, postprocess, draw, push)
+and frame counters are printed at exit and, with ``metrics.port`` set, served
+on a Prometheus-style endpoint (see metrics.py). ``metrics.stamp`` draws a
+timestamp pattern into every outgoing frame for glass-to-glass measurements
+with glass_to_glass.py.
+
+    python3 run.py profiles/rasp_yolo11.toml
+    python3 run.py profiles/ci_testsrc.toml --set source.num_buffers=300
+    python3 run.py profiles/cocksorange_yolov5.toml --set detector.conf=0.4 --print
+    python3 run.py profiles/rasp_yolo11.toml --set detector.pipeline=single
+"""
+
+import argparse
+import collections
+import functools
+import sys
+import time
+
+import gi
+
+gi.require_version("Gst", "1.0")
+from gi.repository import GLib, Gst
+
+from detectors import create_detector, lazy_detector
+from frame_buffers import FrameBufferPool, push_frame, sample_to_frame
+from glass_to_glass import stamp_callback
+from latency import LatencyProbe
+from metadata import DetectionChannel
+from metrics import Metrics
+from models import startup
+from overlay import (
+    OverlayRenderer, draw_center_marker, draw_center_marker_cairo, draw_detections_cairo, empty_detections,
+)
+from pipelines import (
+    Letterbox, appsink_tail, appsrc_head, channel_order, encoder_chain, inference_branch, model_format, sink_tail,
+    source_head,
+)
+from process_pool import ProcessPool
+from profiles import load_profile
+from quantize import quantized_path
+from stages import AsyncDetector, StagePipeline
+from tiles import TiledDetector
+from tracker import KeyframeTracker
+
+# buffers reaching the encoder, measured by LatencyProbe
+LATENCY_PROBE = "identity name=ai_latency silent=true ! "
+# glass-to-glass timestamp pattern (every tail follows a videoconvert)
+STAMP = "video/x-raw,format=BGRx ! cairooverlay name=ai_stamp ! videoconvert ! "
+
+
+def detector_args(config, threads=None):
+    """(backend, create_detector keyword arguments) for a profiles.DetectorConfig."""
+    threads = config.threads or threads
+    conf = min(config.conf, config.tile_coarse_conf) if config.tile_size and config.tile_mode == "coarse" else config.conf
+    common = dict(imgsz=config.imgsz, conf=conf, iou=config.iou)
+    if config.backend == "onnx":
+        model_path = config.model_path or config.model + ".onnx"
+        kwargs = dict(model_path=quantized_path(model_path, config.precision), intra_op_threads=threads, **common)
+        if not config.model_path and config.precision == "fp32":
+            kwargs["model_name"] = config.model  # no <model>.onnx here: export it into the model cache
+        return "onnx", kwargs
+    return config.backend, dict(model_name=config.model, threads=threads, **common)
+
+
+def make_detector(config):
+    """Lazy detector for a profiles.DetectorConfig (loaded while the pipelines start)."""
+    backend, kwargs = detector_args(config)
+    return lazy_detector(backend, **kwargs)
+
+
+class Runner:
+    """Builds and runs the pipelines of one profile."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.source = profile.source
+        self.config = profile.detector
+        self.detector = None if self.config.backend == "none" else make_detector(self.config)
+        self.frame_format = model_format(self.config.backend) if self.detector else None
+        self.renderer = OverlayRenderer(channel_order(self.frame_format)) if self.detector else None
+        self.single = self.detector is not None and self.config.pipeline == "single"
+        self.letterbox = Letterbox.fit(self.source.width, self.source.height, self.config.imgsz)
+        self.burn_in = self.config.overlay != "metadata"
+        self.processes = self.detector is not None and self.config.processes > 0
+        if self.processes and (self.single or self.config.mode != "staged"):
+            raise ValueError("detector.processes needs detector.pipeline = 'bridge' and detector.mode = 'staged'")
+        self.infer = self.detector
+        if self.detector is not None and self.config.tile_size:
+            if self.single:
+                raise ValueError("detector.tile_size needs detector.pipeline = 'bridge'")
+            # predict through a lambda: the detector still loads lazily
+            self.infer = TiledDetector(
+                lambda images: self.detector.predict(images),
+                tile=self.config.tile_size,
+                overlap=self.config.tile_overlap,
+                mode=self.config.tile_mode,
+                conf=self.config.conf,
+            )
+        self.channel = None
+        if self.detector is not None and self.config.overlay != "burn-in":
+            if profile.sink.kind != "webrtcsink":
+                raise ValueError(f"detector.overlay = {self.config.overlay!r} needs sink.kind = 'webrtcsink'")
+            self.channel = DetectionChannel(lambda: self.names if self.loaded else None)
+        # frames wait in the pool's output buffers while their shared-memory slots are inferred;
+        # a frame that gets no buffer within two frame intervals is dropped
+        self.pool = FrameBufferPool(
+            count=max(8, 2 * self.config.processes + 4),
+            timeout=2.0 * self.source.fps_den / self.source.fps_num,
+        )
+        self.worker = None
+        self.tracker = None
+        self.pipelines = []
+        self.appsrc = None
+        self.latency = None
+        # display PTS - PTS of the drawn detections (single pipeline), last frames only
+        self.detection_ages: collections.deque = collections.deque(maxlen=10000)
+        self.metrics = Metrics()
+        self.timing = {}  # (wall, process CPU) seconds at "playing" and "stopped"
+        self.arrived = 0  # buffers reaching the appsink, including the ones it drops
+
+    # ---- pipeline descriptions ----
+
+    def descriptions(self):
+        head, source_format = source_head(self.source)
+        tail = LATENCY_PROBE + encoder_chain(self.profile.encoder) + sink_tail(self.profile.sink)
+        if self.profile.metrics.stamp:
+            tail = STAMP + tail
+        if self.detector is None:
+            return [head + "videoconvert ! " + tail]
+        if self.single:
+            overlay = "video/x-raw,format=BGRx ! cairooverlay name=ai_overlay ! videoconvert ! " if self.burn_in else ""
+            return [
+                head + "tee name=t "
+                "t. ! queue max-size-buffers=2 ! videoconvert ! " + overlay + tail + " "
+                + inference_branch(self.letterbox, self.frame_format)
+            ]
+        size = (self.source.width, self.source.height, self.source.fps_num, self.source.fps_den)
+        return [
+            head + appsink_tail(source_format, self.frame_format, *size),
+            appsrc_head(self.frame_format, *size) + tail,
+        ]
+
+    # ---- frame path ----
+
+    @property
+    def loaded(self):
+        """The model is loaded, in this process or in every detector process."""
+        return self.worker.loaded if self.processes else self.detector.loaded
+
+    @property
+    def names(self):
+        return self.worker.names if self.processes else self.detector.names
+
+    @property
+    def size(self):
+        return self.source.width, self.source.height
+
+    def annotate(self, frame):
+        if self.channel is not None:
+            self.channel.publish(frame.pts, frame.detections, self.size, frame.extra.get("track_ids"))
+        if not self.burn_in:
+            return frame
+        order = channel_order(self.frame_format)
+        boxes, confs, cls_ids = frame.detections
+        names = self.names if self.loaded else None
+        with self.metrics.timed("draw"):
+            self.renderer.draw(frame.image, boxes, confs, cls_ids, names, frame.extra.get("track_ids"))
+            draw_center_marker(frame.image, radius=30, thickness=3, channel_order=order)
+        return frame
+
+    def detect(self, frame):
+        frame.detections = self.infer(frame.image)
+        return frame
+
+    def detect_letterboxed(self, frame):
+        boxes, confs, cls_ids = self.detector(frame.image)
+        frame.detections = (self.letterbox.to_source(boxes), confs, cls_ids)
+        if self.channel is not None:
+            self.channel.publish(frame.pts, frame.detections, self.size)
+        if not self.burn_in:
+            startup.first_frame()
+        return frame
+
+    def track(self, frame):
+        frame.detections, frame.extra["track_ids"] = self.tracker(frame.image)
+        return frame
+
+    def push(self, frame):
+        if self.loaded:
+            startup.first_frame()
+        with self.metrics.timed("push"):
+            ret = push_frame(self.appsrc, frame)
+        self.metrics.inc("push_flow_returns_total", result=ret.value_nick)
+        if ret == Gst.FlowReturn.OK:
+            self.metrics.inc("frames_pushed_total")
+        return ret
+
+    def on_new_sample(self, sink):
+        sample = sink.emit("pull-sample")
+        if not sample:
+            return Gst.FlowReturn.ERROR
+        self.metrics.inc("frames_received_total")
+        with self.metrics.timed("map_copy"):
+            frame = sample_to_frame(sample, self.source.width, self.source.height, pool=self.pool)
+        if frame is None:
+            self.metrics.inc("frames_dropped_total", reason="pool")
+            return Gst.FlowReturn.OK  # back-pressure, not an error
+
+        if self.config.mode == "passthrough":
+            self.worker.offer(frame)
+            detections, _ = self.worker.latest()
+            frame.detections = detections if detections is not None else empty_detections()
+            self.annotate(frame)
+            return self.push(frame)
+        try:
+            self.worker.submit(frame)
+        except RuntimeError as e:  # every detector process died (process pool)
+            print(f"Error: {e}")
+            return Gst.FlowReturn.ERROR
+        return Gst.FlowReturn.OK
+
+    def on_inference_sample(self, sink):
+        """Inference branch: the letterboxed frame is already a private copy."""
+        sample = sink.emit("pull-sample")
+        if not sample:
+            return Gst.FlowReturn.ERROR
+        self.metrics.inc("frames_received_total")
+        with self.metrics.timed("map_copy"):
+            frame = sample_to_frame(sample, self.letterbox.size, self.letterbox.size)
+        if frame is None:
+            return Gst.FlowReturn.ERROR
+        self.worker.offer(frame, copy=lambda image: image)
+        return Gst.FlowReturn.OK
+
+    def on_draw(self, overlay, context, timestamp, duration):
+        """cairooverlay: draw the latest detections on the outgoing frame."""
+        start = time.perf_counter()
+        detections, pts = self.worker.latest()
+        if detections is not None:
+            boxes, confs, cls_ids = detections
+            draw_detections_cairo(context, boxes, confs, cls_ids, self.detector.names)
+            self.detection_ages.append(timestamp - pts)
+            startup.first_frame()
+        draw_center_marker_cairo(context, self.source.width, self.source.height, radius=30, thickness=3)
+        self.metrics.observe("draw", time.perf_counter() - start)
+
+    def make_worker(self):
+        if self.processes:
+            backend, kwargs = detector_args(self.config, threads=1)  # one intra-op thread per process
+            tiles = None
+            if self.config.tile_size:
+                tiles = dict(tile=self.config.tile_size, overlap=self.config.tile_overlap, mode=self.config.tile_mode,
+                             conf=self.config.conf)
+            return ProcessPool(
+                functools.partial(create_detector, backend, **kwargs),
+                (self.source.height, self.source.width, 3),
+                sink=lambda frame: self.push(self.annotate(frame)),
+                workers=self.config.processes,
+                tiles=tiles,
+                warmup_frames=self.config.warmup_frames,
+            )
+        if self.single:
+            return AsyncDetector(self.detect_letterboxed, self.source.fps_num / self.source.fps_den)
+        if self.config.mode == "passthrough":
+            return AsyncDetector(self.detect, self.source.fps_num / self.source.fps_den)
+        if self.config.mode == "tracking":
+            self.tracker = KeyframeTracker(self.infer, self.config.keyframe_interval, self.config.min_confidence)
+            first_stage = ("tracking", self.track)
+        else:
+            first_stage = ("inference", self.detect)
+        return StagePipeline(
+            [first_stage, ("overlay", self.annotate)],
+            sink=self.push,
+            maxsize=self.config.queue_size,
+            policy=self.config.queue_policy,
+        )
+
+    def warm_up(self, model):
+        """on_load callback: synthetic frames through the freshly loaded detector."""
+        if not self.config.warmup_frames:
+            return
+        shape = (self.letterbox.size,) * 2 + (3,) if self.single else (self.source.height, self.source.width, 3)
+        batch = 1
+        if isinstance(self.infer, TiledDetector) and self.infer.mode == "all":
+            batch = len(self.infer.grid(self.source.width, self.source.height)) + 1  # tiles + full frame
+        ms = model.warm_up(shape, self.config.warmup_frames, batch)
+        print(f"Warm-up: inference {', '.join(f'{t * 1000:.0f}' for t in ms)} ms")
+
+    # ---- metrics ----
+
+    def on_appsink_buffer(self, pad, info):
+        self.arrived += 1
+        return Gst.PadProbeReturn.OK
+
+    def register_metrics(self):
+        """Counters kept elsewhere and queue levels, read on every scrape."""
+        metrics = self.metrics
+        metrics.sampled("latency_frames_total", lambda: len(self.latency.latencies), kind="counter")
+        if self.detector is None:
+            return
+        if self.single:
+            metrics.sampled("inference_offered_total", lambda: self.worker.offered, kind="counter")
+            metrics.sampled("inference_ran_total", lambda: self.worker.inferred, kind="counter")
+            return
+        metrics.sampled(
+            "frames_dropped_total",
+            lambda: self.arrived - metrics.count("frames_received_total"),
+            kind="counter",
+            help="Frames dropped by the appsink, the inference queue or an exhausted buffer pool",
+            reason="appsink",
+        )
+        if self.config.mode == "passthrough":
+            metrics.sampled("inference_offered_total", lambda: self.worker.offered, kind="counter")
+            metrics.sampled("inference_ran_total", lambda: self.worker.inferred, kind="counter")
+        else:
+            metrics.sampled("frames_dropped_total", lambda: self.worker.dropped, kind="counter", reason="queue")
+        metrics.sampled("appsrc_queue_buffers", lambda: self.appsrc.get_property("current-level-buffers"))
+        metrics.sampled("appsrc_queue_bytes", lambda: self.appsrc.get_property("current-level-bytes"))
+
+    # ---- lifecycle ----
+
+    def on_message(self, bus, message, loop):
+        if message.type == Gst.MessageType.EOS:
+            if self.appsrc is not None and message.src is self.pipelines[0]:
+                # capture finished (num_buffers / end of file): drain the sender
+                self.worker.stop()
+                self.appsrc.emit("end-of-stream")
+                return
+            print("End-Of-Stream")
+            loop.quit()
+        elif message.type == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            src_name = message.src.get_name() if message.src else "unknown"
+            print(f"Error from {src_name}: {err} - {debug}")
+            loop.quit()
+
+    def build(self):
+        self.pipelines = [Gst.parse_launch(description) for description in self.descriptions()]
+        probed = self.pipelines[-1].get_by_name("ai_latency")
+        self.latency = LatencyProbe.on_element(probed, self.pipelines[0])
+        if self.profile.metrics.stamp:
+            self.pipelines[-1].get_by_name("ai_stamp").connect("draw", stamp_callback(self.pipelines[0]))
+        if self.detector is None:
+            return
+        if self.channel is not None:
+            self.channel.attach(self.pipelines[-1].get_by_name("ws"))
+        self.worker = self.make_worker()
+        if self.single:
+            self.pipelines[0].get_by_name("ai_infer_sink").connect("new-sample", self.on_inference_sample)
+            if self.burn_in:
+                self.pipelines[0].get_by_name("ai_overlay").connect("draw", self.on_draw)
+            return
+        ai_sink = self.pipelines[0].get_by_name("ai_sink")
+        self.appsrc = self.pipelines[1].get_by_name("ai_src")
+        ai_sink.connect("new-sample", self.on_new_sample)
+        ai_sink.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self.on_appsink_buffer)
+
+    def run(self, duration=None):
+        Gst.init(None)
+        self.build()
+        self.register_metrics()
+        if self.profile.metrics.port:
+            self.metrics.serve(self.profile.metrics.port, self.profile.metrics.host)
+        loop = GLib.MainLoop()
+        if duration:
+            GLib.timeout_add(int(duration * 1000), loop.quit)
+        for pipeline in self.pipelines:
+            bus = pipeline.get_bus()
+            bus.add_signal_watch()
+            bus.connect("message", self.on_message, loop)
+
+        if self.processes:
+            for pipeline in self.pipelines:
+                pipeline.set_state(Gst.State.READY)
+            self.metrics.watch_detector(self.worker)
+            self.worker.start()  # loads and warms up the detector in every process
+            startup.mark("warm-up done")
+        elif self.detector is not None:
+            # load and warm up in the background while the pipelines get ready,
+            # then wait for both; metrics start observing after the warm-up
+            self.detector.on_load(self.warm_up)
+            self.metrics.watch_detector(self.detector)
+            self.detector.preload()
+            for pipeline in self.pipelines:
+                pipeline.set_state(Gst.State.READY)
+            self.worker.start()
+            self.detector.load()
+            startup.mark("warm-up done")
+
+        start = time.perf_counter()
+        for pipeline in self.pipelines[::-1]:
+            if pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+                print("Unable to set pipelines to playing state")
+                self.stop()
+                return 1
+        startup.mark("pipelines PLAYING")
+        self.timing["playing"] = (time.perf_counter(), time.process_time())
+
+        try:
+            print(f"Running profile {self.profile.name}... (Ctrl+C to stop)")
+            loop.run()
+        except KeyboardInterrupt:
+            print("Interrupted by user, stopping pipelines.")
+        finally:
+            self.timing["stopped"] = (time.perf_counter(), time.process_time())
+            self.stop()
+            self.report(time.perf_counter() - start)
+            self.metrics.close()
+        return 0
+
+    def stop(self):
+        self.pool.close()
+        if self.pipelines:
+            self.pipelines[0].set_state(Gst.State.NULL)
+        if self.worker is not None:
+            self.worker.stop()
+        for pipeline in self.pipelines[1:]:
+            pipeline.set_state(Gst.State.NULL)
+
+    def report(self, elapsed):
+        print(f"Ran {elapsed:.1f} s, cold start: {startup.summary()}")
+        if self.latency is not None:
+            print(f"Capture-to-encoder latency: {self.latency.summary()}")
+        print(f"Metrics: {self.metrics.summary()}")
+        if self.processes and self.worker.loaded:
+            print(f"Inference latency: {self.worker.latency_summary()}")
+            print(f"Process pool: {self.worker.summary()}")
+            print(f"Output buffers: {self.pool.summary()}")
+            return
+        if self.detector is None or not self.detector.loaded:
+            return
+        print(f"Inference latency: {self.detector.latency_summary()}")
+        print(f"Per-frame overhead: {self.detector.overhead_summary()}")
+        if self.channel is not None:
+            print(f"Detection metadata: {self.channel.sent} messages sent")
+        if self.single:
+            print(f"Inference ran on {self.worker.inferred}/{self.worker.offered} letterboxed frames")
+            if self.detection_ages:
+                age = sum(self.detection_ages) / len(self.detection_ages) / Gst.MSECOND
+                print(f"Drawn detections were computed {age:.1f} ms before the frame on average "
+                      f"(last {len(self.detection_ages)} frames)")
+            return
+        print(f"Output buffers: {self.pool.summary()}")
+        if self.config.mode == "passthrough":
+            print(f"Inference ran on {self.worker.inferred}/{self.worker.offered} frames")
+        else:
+            print(f"Frames dropped before inference: {self.worker.dropped}")
+        if self.tracker is not None:
+            print(f"Tracking: {self.tracker.summary()}")
+        if isinstance(self.infer, TiledDetector):
+            print(f"Tiling: {self.infer.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("profile", help="device profile (.toml, or .yaml with PyYAML)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="override a profile value, may be repeated")
+    parser.add_argument("--print", action="store_true", help="only print the pipeline descriptions")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    profile = load_profile(args.profile, args.overrides)
+    runner = Runner(profile)
+    if args.print:
+        for description in runner.descriptions():
+            print(description)
+        return 0
+    return runner.run(args.duration)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
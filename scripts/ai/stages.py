@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Capture -> inference -> overlay -> push stage pipeline for the appsink/appsrc demos.
+
+The appsink ``new-sample`` callback only enqueues the mapped frame; every other
+step runs on dedicated worker threads that are connected through bounded queues.
+The policy of the first queue decides what happens when inference cannot keep up:
+
+    drop-oldest  -> evict the oldest queued frame (bounded latency, keeps order)
+    latest-only  -> keep only the newest frame (lowest latency)
+    block        -> block the streaming thread (highest throughput, no drops)
+
+AsyncDetector implements the passthrough mode: every frame goes straight to the
+output with the most recent detections, while inference runs on every Nth frame
+and N adapts to the measured inference latency.
+
+BatchCollector gathers frames from several streams into dynamic batches for one
+batched model call and routes the results back per stream.
+"""
+
+from __future__ import annotations
+
+import collections
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Sequence
+
+DROP_OLDEST = "drop-oldest"
+LATEST_ONLY = "latest-only"
+BLOCK = "block"
+QUEUE_POLICIES = (DROP_OLDEST, LATEST_ONLY, BLOCK)
+
+
+@dataclass
+class Frame:
+    """A captured frame travelling through the stages, with its buffer timestamps."""
+
+    image: Any
+    pts: int
+    dts: int
+    duration: int
+    detections: Any = None
+    extra: dict = field(default_factory=dict)
+
+    def release(self) -> None:
+        """Give back a pooled output buffer when the frame is dropped instead of pushed."""
+        mapped = self.extra.pop("mapped", None)
+        if mapped is not None:
+            mapped.unmap()
+            self.image = None
+
+
+def _release(item: Any) -> None:
+    if isinstance(item, Frame):
+        item.release()
+
+
+class QueueClosed(Exception):
+    """Raised by FrameQueue.get() once the queue is closed and drained."""
+
+
+class FrameQueue:
+    """Bounded queue with a configurable overflow policy."""
+
+    def __init__(self, maxsize: int = 2, policy: str = DROP_OLDEST) -> None:
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {QUEUE_POLICIES}")
+        self.policy = policy
+        self.maxsize = 1 if policy == LATEST_ONLY else max(1, maxsize)
+        self.dropped = 0
+        self._items: collections.deque = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item: Any) -> bool:
+        """Enqueue ``item``. Returns False if an item had to be dropped to make room."""
+        with self._cond:
+            dropped = False
+            if self.policy == BLOCK:
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            if self._closed:
+                _release(item)
+                return False
+            else:
+                while len(self._items) >= self.maxsize:
+                    _release(self._items.popleft())
+                    self.dropped += 1
+                    dropped = True
+            self._items.append(item)
+            self._cond.notify_all()
+            return not dropped
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Dequeue the next item; raises QueueClosed when closed and empty."""
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    raise QueueClosed()
+                if not self._cond.wait(timeout):
+                    raise TimeoutError()
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Stage(threading.Thread):
+    """Worker thread applying ``fn`` to every item of ``inbox`` and forwarding the result."""
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        inbox: FrameQueue,
+        forward: Callable[[Any], Any],
+    ) -> None:
+        super().__init__(name=name, daemon=True)
+        self.fn = fn
+        self.inbox = inbox
+        self.forward = forward
+        self.processed = 0
+
+    def run(self) -> None:
+        while True:
+            try:
+                item = self.inbox.get()
+            except QueueClosed:
+                return
+            try:
+                result = self.fn(item)
+            except Exception as e:
+                print(f"Error in stage {self.name}: {e}")
+                _release(item)
+                continue
+            if result is not None:
+                try:
+                    self.forward(result)
+                except Exception as e:
+                    # a failing sink must not kill the thread or leak the pooled buffer
+                    print(f"Error forwarding from stage {self.name}: {e}")
+                    _release(result)
+                    continue
+            self.processed += 1
+
+
+class StagePipeline:
+    """
+    Chain of Stage threads. ``submit`` feeds the first queue (using ``policy``);
+    the queues between stages always block so that no processed frame is lost
+    after inference. The output of the last stage is handed to ``sink``.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[tuple[str, Callable[[Any], Any]]],
+        sink: Callable[[Any], Any],
+        maxsize: int = 2,
+        policy: str = DROP_OLDEST,
+    ) -> None:
+        if not stages:
+            raise ValueError("StagePipeline needs at least one stage")
+        self.queues = [FrameQueue(maxsize, policy)]
+        self.queues += [FrameQueue(maxsize, BLOCK) for _ in stages[1:]]
+        self.stages = []
+        for i, (name, fn) in enumerate(stages):
+            forward = self.queues[i + 1].put if i + 1 < len(stages) else sink
+            self.stages.append(Stage(name, fn, self.queues[i], forward))
+
+    @property
+    def dropped(self) -> int:
+        return self.queues[0].dropped
+
+    def submit(self, item: Any) -> bool:
+        return self.queues[0].put(item)
+
+    def start(self) -> None:
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        for q, stage in zip(self.queues, self.stages):
+            q.close()
+            stage.join(timeout)
+
+
+class AdaptiveStride:
+    """
+    Decide on which frames to run inference so the detector keeps up with the
+    output: N = ceil(latency * target_fps), smoothed with an EMA and clamped.
+    """
+
+    def __init__(
+        self,
+        target_fps: float,
+        min_stride: int = 1,
+        max_stride: int = 30,
+        smoothing: float = 0.2,
+    ) -> None:
+        self.target_fps = target_fps
+        self.min_stride = min_stride
+        self.max_stride = max_stride
+        self.smoothing = smoothing
+        self.latency: Optional[float] = None
+        self.stride = min_stride
+        self._since_last: Optional[int] = None
+
+    def update(self, latency: float) -> int:
+        """Feed a measured inference latency (seconds); returns the new stride."""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+        stride = math.ceil(self.latency * self.target_fps)
+        self.stride = min(self.max_stride, max(self.min_stride, stride))
+        return self.stride
+
+    def due(self) -> bool:
+        """Count a frame; True if inference should run on it."""
+        if self._since_last is not None and self._since_last + 1 < self.stride:
+            self._since_last += 1
+            return False
+        self._since_last = 0
+        return True
+
+
+class AsyncDetector:
+    """
+    Runs ``detect_fn`` (Frame -> Frame with ``detections``) on a background thread
+    for every Nth offered frame and keeps the most recent result.
+    """
+
+    def __init__(
+        self,
+        detect_fn: Callable[[Frame], Frame],
+        target_fps: float,
+        max_stride: int = 30,
+    ) -> None:
+        self.detect_fn = detect_fn
+        self.stride = AdaptiveStride(target_fps, max_stride=max_stride)
+        self.offered = 0
+        self.inferred = 0
+        self._latest: Any = None
+        self._latest_pts: Optional[int] = None
+        self._lock = threading.Lock()
+        self._inbox = FrameQueue(1, LATEST_ONLY)
+        self._worker = Stage("async-inference", self._run, self._inbox, self._publish)
+
+    def _run(self, frame: Frame) -> Frame:
+        start = time.perf_counter()
+        result = self.detect_fn(frame)
+        self.stride.update(time.perf_counter() - start)
+        return result
+
+    def _publish(self, frame: Frame) -> None:
+        with self._lock:
+            self._latest = frame.detections
+            self._latest_pts = frame.pts
+            self.inferred += 1
+
+    def offer(self, frame: Frame, copy: Callable[[Any], Any] = lambda image: image.copy()) -> bool:
+        """
+        Hand ``frame`` to the detector if it is due. The image is copied so the
+        caller may keep drawing into the original while inference runs.
+        """
+        self.offered += 1
+        if not self.stride.due():
+            return False
+        snapshot = Frame(image=copy(frame.image), pts=frame.pts, dts=frame.dts, duration=frame.duration)
+        self._inbox.put(snapshot)
+        return True
+
+    def latest(self) -> tuple[Any, Optional[int]]:
+        """Most recent detections and the PTS of the frame they were computed on."""
+        with self._lock:
+            return self._latest, self._latest_pts
+
+    def start(self) -> None:
+        self._worker.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._inbox.close()
+        self._worker.join(timeout)
+
+
+class BatchCollector(threading.Thread):
+    """
+    Collects the newest frame of each stream into batches of at most
+    ``max_batch`` frames. A batch is dispatched when it is full or when
+    ``max_wait`` seconds have passed since its first frame arrived.
+
+    ``batch_fn`` receives the list of frames and must set ``detections`` on
+    each of them; ``sink(stream_id, frame)`` is called for every frame afterwards.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list[Frame]], Any],
+        sink: Callable[[Any, Frame], Any],
+        max_batch: int = 4,
+        max_wait: float = 0.015,
+    ) -> None:
+        super().__init__(name="batch-inference", daemon=True)
+        self.batch_fn = batch_fn
+        self.sink = sink
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.dropped = 0
+        self.batches = 0
+        self.batched_frames = 0
+        # one slot per stream: a slow batch replaces stale frames instead of queueing them
+        self._pending: collections.OrderedDict = collections.OrderedDict()
+        self._arrivals: dict = {}  # stream_id -> arrival time of its pending frame
+        self._first_arrival: Optional[float] = None
+        self._cond = threading.Condition()
+        self._closed = False
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.batched_frames / self.batches if self.batches else 0.0
+
+    def submit(self, stream_id: Any, frame: Frame) -> None:
+        with self._cond:
+            if stream_id in self._pending:
+                self.dropped += 1
+                self._pending.pop(stream_id).release()
+            self._pending[stream_id] = frame
+            self._arrivals[stream_id] = time.monotonic()
+            if self._first_arrival is None:
+                self._first_arrival = self._arrivals[stream_id]
+            self._cond.notify_all()
+
+    def _next_batch(self) -> Optional[list[tuple[Any, Frame]]]:
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            deadline = self._first_arrival + self.max_wait
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                stream_id, frame = self._pending.popitem(last=False)
+                del self._arrivals[stream_id]
+                batch.append((stream_id, frame))
+            # leftover frames keep waiting from when they arrived, not from now
+            self._first_arrival = min(self._arrivals.values()) if self._arrivals else None
+            return batch
+
+    def run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            frames = [frame for _, frame in batch]
+            try:
+                self.batch_fn(frames)
+            except Exception as e:
+                print(f"Error in batched inference: {e}")
+                for frame in frames:
+                    frame.release()
+                continue
+            self.batches += 1
+            self.batched_frames += len(frames)
+            for stream_id, frame in batch:
+                try:
+                    self.sink(stream_id, frame)
+                except Exception as e:
+                    print(f"Error in sink of stream {stream_id}: {e}")
+                    frame.release()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.join(timeout)
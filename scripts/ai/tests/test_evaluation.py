@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from evaluation import average_precision, mean_average_precision
+
+
+def dets(boxes, confs, cls_ids):
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4), np.asarray(confs, dtype=np.float32), np.asarray(cls_ids)
+
+
+REFERENCE = [
+    dets([[0, 0, 100, 100], [200, 200, 300, 300]], [0.9, 0.8], [0, 1]),
+    dets([[50, 50, 150, 150]], [0.7], [0]),
+]
+
+
+def test_identical_detections_score_one():
+    result = mean_average_precision(REFERENCE, REFERENCE)
+    assert result == {"map50": pytest.approx(1.0), "map50_95": pytest.approx(1.0), "classes": 2}
+
+
+def test_missing_detections_lower_recall():
+    predictions = [REFERENCE[0], dets([], [], [])]
+    result = mean_average_precision(predictions, REFERENCE)
+    # class 0 recalls one of two boxes, class 1 all of them
+    assert result["map50"] == pytest.approx((0.5 + 1.0) / 2, abs=0.01)
+
+
+def test_shifted_boxes_only_match_loose_thresholds():
+    # IoU of a 100x100 box shifted by 10 px: 90*100 / (2*10000 - 9000) ~ 0.82
+    predictions = [dets(b + (10, 0, 10, 0), c, k) for b, c, k in REFERENCE]
+    result = mean_average_precision(predictions, REFERENCE)
+    assert result["map50"] == pytest.approx(1.0)
+    assert 0.3 < result["map50_95"] < 1.0
+
+
+def test_class_only_in_predictions_counts_as_zero():
+    predictions = [dets([[0, 0, 100, 100], [400, 400, 450, 450]], [0.9, 0.5], [0, 7])]
+    references = [dets([[0, 0, 100, 100]], [1.0], [0])]
+    result = mean_average_precision(predictions, references)
+    assert result["classes"] == 2
+    assert result["map50"] == pytest.approx(0.5)
+
+
+def test_false_positive_ranked_first_lowers_precision():
+    predictions = [dets([[300, 300, 350, 350], [0, 0, 100, 100]], [0.9, 0.5], [0, 0])]
+    references = [dets([[0, 0, 100, 100]], [1.0], [0])]
+    assert mean_average_precision(predictions, references)["map50"] == pytest.approx(0.5, abs=0.01)
+
+
+def test_empty_frames_score_one():
+    empty = [dets([], [], [])] * 3
+    assert mean_average_precision(empty, empty)["map50_95"] == 1.0
+
+
+def test_frame_count_mismatch_raises():
+    with pytest.raises(ValueError):
+        mean_average_precision(REFERENCE, REFERENCE[:1])
+
+
+def test_average_precision_of_perfect_curve():
+    assert average_precision(np.array([0.5, 1.0]), np.array([1.0, 1.0])) == pytest.approx(1.0)
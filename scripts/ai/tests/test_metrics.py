@@ -0,0 +1,91 @@
+import urllib.request
+
+import pytest
+
+from metrics import Metrics
+from models import LazyModel
+
+
+class FakeDetector:
+    def __init__(self):
+        self.observers = []
+
+    def __call__(self):
+        for observer in self.observers:
+            observer("forward", 0.02)
+            observer("resize", 0.001)
+
+
+def test_stage_stats_quantiles_and_totals():
+    metrics = Metrics(window=100)
+    for ms in range(1, 201):
+        metrics.observe("inference", ms / 1000)
+    stats = metrics.stage_stats()["inference"]
+    # quantiles over the last 100 observations, totals over all of them
+    assert stats["p50"] == pytest.approx(0.1505)
+    assert stats["count"] == 200
+    assert stats["sum"] == pytest.approx(sum(range(1, 201)) / 1000)
+
+
+def test_timed_records_a_stage():
+    metrics = Metrics()
+    with metrics.timed("draw"):
+        pass
+    assert metrics.stage_stats()["draw"]["count"] == 1
+
+
+def test_counters_with_labels():
+    metrics = Metrics()
+    metrics.inc("frames_dropped_total", reason="queue")
+    metrics.inc("frames_dropped_total", 2, reason="queue")
+    metrics.inc("frames_dropped_total", reason="pool")
+    assert metrics.count("frames_dropped_total", reason="queue") == 3
+    assert metrics.count("frames_dropped_total", reason="pool") == 1
+    assert metrics.count("frames_dropped_total") == 0
+
+
+def test_exposition_format():
+    metrics = Metrics(prefix="test")
+    metrics.observe("push", 0.5)
+    metrics.inc("frames_pushed_total", help="Frames pushed into appsrc")
+    metrics.sampled("queue_level", lambda: 3, stream="a")
+    metrics.sampled("broken", lambda: 1 / 0)
+    text = metrics.exposition()
+    assert '# TYPE test_stage_seconds summary' in text
+    assert 'test_stage_seconds{stage="push",quantile="0.95"} 0.500000' in text
+    assert 'test_stage_seconds_count{stage="push"} 1' in text
+    assert "# HELP test_frames_pushed_total Frames pushed into appsrc" in text
+    assert "# TYPE test_frames_pushed_total counter" in text
+    assert "test_frames_pushed_total 1" in text
+    assert 'test_queue_level{stream="a"} 3' in text
+    assert "broken" not in text
+    assert text.endswith("\n")
+
+
+def test_watch_detector_maps_stage_names():
+    metrics = Metrics()
+    detector = FakeDetector()
+    metrics.watch_detector(detector)
+    detector()
+    assert set(metrics.stage_stats()) == {"inference", "resize"}
+
+
+def test_watch_lazy_detector_after_load():
+    metrics = Metrics()
+    lazy = LazyModel("fake", FakeDetector)
+    metrics.watch_detector(lazy)
+    lazy()
+    assert metrics.stage_stats()["inference"]["count"] == 1
+
+
+def test_serve_metrics_endpoint():
+    metrics = Metrics()
+    metrics.inc("frames_pushed_total")
+    metrics.serve(0)
+    try:
+        port = metrics._server.server_port
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert "kataglyphis_frames_pushed_total 1" in response.read().decode()
+    finally:
+        metrics.close()
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from models import LazyModel
+
+
+class Model:
+    def __init__(self):
+        self.warm = False
+
+
+def test_loads_once_and_forwards_attributes():
+    built = []
+    lazy = LazyModel("fake", lambda: built.append(1) or Model())
+    assert not lazy.loaded
+    assert lazy.warm is False
+    assert lazy.load() is lazy.load()
+    assert built == [1]
+
+
+def test_callbacks_may_use_the_proxy():
+    lazy = LazyModel("fake", Model)
+    seen = []
+    lazy.on_load(lambda model: seen.append(lazy.warm))  # reentrant load from the callback
+    lazy.load()
+    assert seen == [False]
+    lazy.on_load(lambda model: seen.append("late"))
+    assert seen == [False, "late"]
+
+
+def test_failing_callback_does_not_rebuild_the_model():
+    built = []
+    lazy = LazyModel("fake", lambda: built.append(1) or Model())
+
+    def fail(model):
+        raise RuntimeError("warm-up failed")
+
+    lazy.on_load(fail)
+    lazy.load()
+    assert lazy.loaded
+    lazy.warm
+    assert built == [1]
+
+
+def test_other_threads_wait_for_the_callbacks():
+    lazy = LazyModel("fake", Model)
+
+    def warm_up(model):
+        time.sleep(0.1)
+        model.warm = True
+
+    lazy.on_load(warm_up)
+    lazy.preload()
+    time.sleep(0.02)
+    assert lazy.load().warm
+
+
+def test_concurrent_loads_build_once():
+    built = []
+    lazy = LazyModel("fake", lambda: (time.sleep(0.05), built.append(1), Model())[2])
+    threads = [threading.Thread(target=lazy.load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert built == [1]
@@ -0,0 +1,84 @@
+import numpy as np
+
+from motion import MotionGate, MotionGatedDetector, tile_regions
+
+
+class FakeDetector:
+    """detect_batch returning one box over every image it receives."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images):
+        self.calls.append([image.shape for image in images])
+        return [
+            (np.array([[0, 0, image.shape[1], image.shape[0]]], dtype=np.float32), np.array([0.9]), np.array([0]))
+            for image in images
+        ]
+
+
+def frame(*squares, size=(480, 640)):
+    image = np.zeros(size + (3,), dtype=np.uint8)
+    for x, y in squares:
+        image[y:y + 40, x:x + 40] = 255
+    return image
+
+
+def test_tile_regions_dilates_and_splits():
+    tiles = np.zeros((6, 6), dtype=bool)
+    tiles[0, 0] = tiles[5, 5] = True
+    assert sorted(tile_regions(tiles, 600, 600)) == [(0, 0, 200, 200), (400, 400, 600, 600)]
+    # blocks that touch after dilation are merged
+    tiles[5, 5], tiles[3, 3] = False, True
+    assert tile_regions(tiles, 600, 600) == [(0, 0, 500, 500)]
+
+
+def test_gate_reports_changed_tiles():
+    gate = MotionGate()
+    first = gate.downscale(frame())
+    gate.commit(first)
+    fraction, tiles = gate.analyse(gate.downscale(frame((20, 20))))
+    assert fraction > gate.threshold
+    assert tiles[0, 0] and tiles.sum() == 1
+
+
+def test_static_scene_skips_inference():
+    detect = FakeDetector()
+    detector = MotionGatedDetector(detect)
+    for _ in range(5):
+        detections = detector(frame((100, 100)))
+    assert len(detect.calls) == 1 and detector.full_runs == 1
+    assert detector.skipped == 4
+    assert len(detections[0]) == 1
+
+
+def test_local_motion_infers_regions_only():
+    detect = FakeDetector()
+    detector = MotionGatedDetector(detect)
+    detector(frame())
+    detections = detector(frame((20, 20)))
+    assert detector.roi_runs == 1
+    assert detect.calls[-1] == [(240, 320, 3)]
+    # the previous full-frame box is replaced, the ROI box is in frame coordinates
+    boxes = detections[0]
+    np.testing.assert_allclose(boxes, [[0, 0, 640, 480], [0, 0, 320, 240]])
+
+
+def test_diffuse_motion_falls_back_to_full_frame():
+    detect = FakeDetector()
+    gate = MotionGate(threshold=0.001, tile_threshold=0.5)
+    detector = MotionGatedDetector(detect, gate)
+    detector(frame())
+    # changed pixels above the frame threshold, but no tile above its own
+    detector(frame((20, 20), (340, 260)))
+    assert detector.roi_runs == 0 and detector.full_runs == 2
+    assert detect.calls[-1] == [(480, 640, 3)]
+    assert detector.inferences == 2
+
+
+def test_refresh_forces_full_inference():
+    detect = FakeDetector()
+    detector = MotionGatedDetector(detect, refresh_interval=3)
+    for _ in range(7):
+        detector(frame())
+    assert detector.full_runs == 3 and detector.skipped == 4
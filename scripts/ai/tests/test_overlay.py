@@ -0,0 +1,79 @@
+import numpy as np
+
+from overlay import BOX_COLOR, OverlayRenderer, draw_detections, empty_detections, in_channel_order
+
+BOXES = np.array([[100, 100, 200, 180], [300, 50, 420, 300]], dtype=np.float32)
+CONFS = np.array([0.91, 0.42])
+CLS_IDS = np.array([0, 2])
+NAMES = {0: "person", 1: "bicycle", 2: "car"}
+
+
+def blank():
+    return np.zeros((360, 640, 3), dtype=np.uint8)
+
+
+def test_channel_order():
+    assert in_channel_order((1, 2, 3), "RGB") == (1, 2, 3)
+    assert in_channel_order((1, 2, 3), "BGR") == (3, 2, 1)
+
+
+def test_draw_detections_draws_boxes_and_tags():
+    frame = draw_detections(blank(), BOXES, CONFS, CLS_IDS, NAMES, channel_order="RGB")
+    assert tuple(frame[140, 100]) == BOX_COLOR  # left edge of the first box
+    assert tuple(frame[140, 150]) == (0, 0, 0)  # inside stays untouched
+    assert frame[90:100, 100:150].any()  # tag above the box
+
+
+def test_renderer_matches_box_outlines():
+    frame = OverlayRenderer("RGB").draw(blank(), BOXES, CONFS, CLS_IDS, NAMES)
+    for x1, y1, x2, y2 in BOXES.astype(int):
+        assert tuple(frame[(y1 + y2) // 2, x1]) == BOX_COLOR
+        assert tuple(frame[(y1 + y2) // 2, x2]) == BOX_COLOR
+        assert tuple(frame[(y1 + y2) // 2, x1 + 1]) == BOX_COLOR  # 2 px thick
+        assert tuple(frame[(y1 + y2) // 2, (x1 + x2) // 2]) == (0, 0, 0)
+        assert (frame[y1 - 10:y1, x1:x1 + 20] == BOX_COLOR).any()
+
+
+def test_renderer_caches_sprites_per_confidence_bucket():
+    renderer = OverlayRenderer(conf_step=0.05)
+    renderer.draw(blank(), BOXES, CONFS, CLS_IDS, NAMES)
+    assert renderer.sprites_rendered == 2
+    # same labels in the same buckets, new arrays: no new sprites
+    renderer.draw(blank(), BOXES + 5, CONFS + 0.002, CLS_IDS.copy(), NAMES)
+    assert renderer.sprites_rendered == 2
+    renderer.draw(blank(), BOXES, np.array([0.5, 0.42]), CLS_IDS, NAMES)
+    assert renderer.sprites_rendered == 3
+
+
+def test_renderer_reuses_the_plan_for_the_same_detections():
+    renderer = OverlayRenderer()
+    renderer.draw(blank(), BOXES, CONFS, CLS_IDS, NAMES)
+    plan = renderer._plan
+    first = renderer.draw(blank(), BOXES, CONFS, CLS_IDS, NAMES)
+    assert renderer._plan is plan
+    np.testing.assert_array_equal(first, renderer.draw(blank(), BOXES, CONFS, CLS_IDS, NAMES))
+
+
+def test_track_ids_are_part_of_the_tag():
+    renderer = OverlayRenderer()
+    renderer.draw(blank(), BOXES, CONFS, CLS_IDS, NAMES, track_ids=np.array([7, 8]))
+    assert any(text.startswith("#7 person") for text in renderer._sprites)
+
+
+def test_tags_are_clipped_at_the_frame_edge():
+    boxes = np.array([[-20, 0, 50, 40], [600, 340, 700, 400]], dtype=np.float32)
+    frame = OverlayRenderer().draw(blank(), boxes, CONFS, CLS_IDS, NAMES)
+    assert frame.shape == (360, 640, 3)
+
+
+def test_sprite_cache_is_bounded():
+    renderer = OverlayRenderer(max_sprites=3)
+    for i in range(10):
+        renderer.sprite(f"label {i}")
+    assert len(renderer._sprites) <= 3
+
+
+def test_empty_detections_draw_nothing():
+    frame = OverlayRenderer().draw(blank(), *empty_detections(), NAMES)
+    assert not frame.any()
+    assert not draw_detections(blank(), *empty_detections(), NAMES).any()
@@ -0,0 +1,84 @@
+import re
+
+import numpy as np
+import pytest
+
+from pipelines import Letterbox, inference_branch
+
+
+def to_letterbox(letterbox, boxes):
+    """Inverse of Letterbox.to_source: source frame -> letterboxed model input."""
+    return np.asarray(boxes, dtype=np.float32) * letterbox.scale + (
+        letterbox.left, letterbox.top, letterbox.left, letterbox.top)
+
+
+@pytest.mark.parametrize("src_width,src_height", [(1920, 1080), (2448, 2048), (1080, 1920), (480, 640), (640, 640)])
+def test_fit_keeps_aspect_ratio_and_centres(src_width, src_height):
+    letterbox = Letterbox.fit(src_width, src_height, 640)
+    assert max(letterbox.width, letterbox.height) == 640
+    assert letterbox.width / letterbox.height == pytest.approx(src_width / src_height, rel=0.01)
+    assert letterbox.left == (640 - letterbox.width) // 2
+    assert letterbox.top == (640 - letterbox.height) // 2
+    # padding on a single axis only
+    assert letterbox.left == 0 or letterbox.top == 0
+
+
+def test_fit_landscape_pads_top_and_bottom():
+    letterbox = Letterbox.fit(1920, 1080, 640)
+    assert (letterbox.width, letterbox.height, letterbox.left, letterbox.top) == (640, 360, 0, 140)
+    assert letterbox.scale == pytest.approx(1 / 3)
+
+
+def test_fit_portrait_pads_left_and_right():
+    letterbox = Letterbox.fit(1080, 1920, 640)
+    assert (letterbox.width, letterbox.height, letterbox.left, letterbox.top) == (360, 640, 140, 0)
+
+
+@pytest.mark.parametrize("src_width,src_height", [(1920, 1080), (1080, 1920), (2448, 2048), (300, 200)])
+def test_to_source_round_trips_boxes(src_width, src_height):
+    letterbox = Letterbox.fit(src_width, src_height, 640)
+    boxes = np.array([
+        [0, 0, src_width, src_height],
+        [10, 20, 110, 120],
+        [src_width / 2, src_height / 3, src_width * 0.75, src_height * 0.9],
+    ], dtype=np.float32)
+    mapped = letterbox.to_source(to_letterbox(letterbox, boxes))
+    # integer letterbox size -> scale is exact only to one source pixel
+    np.testing.assert_allclose(mapped, boxes, atol=src_width / letterbox.width + 1e-3)
+
+
+def test_to_source_removes_padding_and_scales():
+    letterbox = Letterbox.fit(1920, 1080, 640)
+    # box spanning the whole image area of the model input, and one in the padding
+    boxes = np.array([[0, 140, 640, 500], [100, 0, 200, 100]], dtype=np.float32)
+    mapped = letterbox.to_source(boxes)
+    np.testing.assert_allclose(mapped[0], [0, 0, 1920, 1080], atol=1e-3)
+    # clipped to the source frame
+    np.testing.assert_allclose(mapped[1], [300, 0, 600, 0], atol=1e-3)
+
+
+def test_to_source_empty():
+    letterbox = Letterbox.fit(1920, 1080, 640)
+    assert len(letterbox.to_source(np.empty((0, 4), dtype=np.float32))) == 0
+
+
+@pytest.mark.parametrize("src_width,src_height,size", [(1920, 1080, 640), (1080, 1920, 640), (2448, 2048, 320), (641, 479, 640)])
+def test_elements_pad_to_model_size(src_width, src_height, size):
+    letterbox = Letterbox.fit(src_width, src_height, size)
+    elements = letterbox.elements()
+    scaled = re.search(r"width=(\d+),height=(\d+)", elements)
+    assert (int(scaled[1]), int(scaled[2])) == (letterbox.width, letterbox.height)
+    pad = {k: -int(v) for k, v in re.findall(r"(left|right|top|bottom)=(-?\d+)", elements)}
+    assert pad["left"] == letterbox.left and pad["top"] == letterbox.top
+    assert letterbox.width + pad["left"] + pad["right"] == size
+    assert letterbox.height + pad["top"] + pad["bottom"] == size
+    assert all(v >= 0 for v in pad.values())
+
+
+def test_inference_branch_ends_in_model_sized_appsink():
+    letterbox = Letterbox.fit(1920, 1080, 640)
+    branch = inference_branch(letterbox, "RGBP", name="infer")
+    assert branch.startswith("t. ! queue leaky=downstream")
+    assert letterbox.elements() in branch
+    assert "format=RGBP" in branch and "width=640,height=640" in branch
+    assert branch.endswith("appsink name=infer emit-signals=true max-buffers=1 drop=true")
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from postprocess import MAX_CANDIDATES, MAX_DETECTIONS, box_ios, decode_batch, nms
+
+
+def reference_nms(boxes, scores, iou):
+    """Plain Python greedy NMS."""
+
+    def overlap(a, b):
+        w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+        h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+        inter = w * h
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        return inter / union
+
+    keep = []
+    for i in sorted(range(len(boxes)), key=lambda i: -scores[i]):
+        if all(overlap(boxes[i], boxes[k]) <= iou for k in keep):
+            keep.append(i)
+    return keep
+
+
+def reference_decode(output, conf, iou):
+    """Decode one (4 + nc, anchors) output with per-class reference NMS."""
+    cxcywh, scores = output[:4].T, output[4:].T
+    cls_ids, confs = scores.argmax(axis=1), scores.max(axis=1)
+    boxes = np.concatenate([cxcywh[:, :2] - cxcywh[:, 2:] / 2, cxcywh[:, :2] + cxcywh[:, 2:] / 2], axis=1)
+    detections = []
+    for cls in np.unique(cls_ids[confs > conf]):
+        members = np.flatnonzero((cls_ids == cls) & (confs > conf))
+        for k in reference_nms(boxes[members], confs[members], iou):
+            i = members[k]
+            detections.append((float(confs[i]), int(cls), tuple(boxes[i])))
+    return sorted(detections, key=lambda d: -d[0])[:MAX_DETECTIONS]
+
+
+def random_outputs(batch=3, classes=4, anchors=400, seed=0):
+    rng = np.random.default_rng(seed)
+    outputs = np.empty((batch, 4 + classes, anchors), dtype=np.float32)
+    outputs[:, 0:2] = rng.uniform(0, 640, (batch, 2, anchors))
+    outputs[:, 2:4] = rng.uniform(10, 120, (batch, 2, anchors))
+    outputs[:, 4:] = rng.uniform(0, 1, (batch, classes, anchors)) ** 3
+    return outputs
+
+
+def as_list(detections):
+    boxes, confs, cls_ids = detections
+    return [(float(c), int(k), tuple(b)) for b, c, k in zip(boxes, confs, cls_ids)]
+
+
+def test_decode_matches_reference_nms():
+    outputs = random_outputs()
+    for output, detections in zip(outputs, decode_batch(outputs, conf=0.25, iou=0.45)):
+        expected = reference_decode(output, 0.25, 0.45)
+        actual = as_list(detections)
+        assert len(actual) == len(expected)
+        for (conf, cls, box), (ref_conf, ref_cls, ref_box) in zip(actual, expected):
+            assert conf == pytest.approx(ref_conf)
+            assert cls == ref_cls
+            assert box == pytest.approx(ref_box, abs=1e-3)
+
+
+def test_batch_equals_single_images():
+    outputs = random_outputs(batch=4, anchors=MAX_CANDIDATES + 500)
+    batched = decode_batch(outputs, conf=0.05)
+    for output, detections in zip(outputs, batched):
+        (single,) = decode_batch(output[None], conf=0.05)
+        for a, b in zip(detections, single):
+            np.testing.assert_array_equal(a, b)
+
+
+def test_yolov5_layout_uses_objectness():
+    # (B, anchors, 5 + nc): one box with objectness 0.5 and class score 0.8
+    outputs = np.zeros((1, 10, 7), dtype=np.float32)
+    outputs[0, 0] = [100, 100, 20, 20, 0.5, 0.2, 0.8]
+    outputs[0, 1] = [300, 300, 20, 20, 0.1, 0.9, 0.1]
+    boxes, confs, cls_ids = decode_batch(outputs, conf=0.25)[0]
+    np.testing.assert_allclose(boxes, [[90, 90, 110, 110]])
+    np.testing.assert_allclose(confs, [0.4])
+    assert cls_ids.tolist() == [1]
+
+
+def test_no_candidates_gives_empty_detections():
+    outputs = np.zeros((2, 6, 10), dtype=np.float32)
+    for boxes, confs, cls_ids in decode_batch(outputs):
+        assert boxes.shape == (0, 4) and confs.shape == (0,) and cls_ids.shape == (0,)
+
+
+def test_fast_nms_is_at_least_as_aggressive():
+    rng = np.random.default_rng(1)
+    xy = rng.uniform(0, 200, (50, 2))
+    boxes = np.concatenate([xy, xy + rng.uniform(20, 60, (50, 2))], axis=1)
+    scores = rng.uniform(0, 1, 50)
+    greedy = set(nms(boxes, scores, 0.45).tolist())
+    fast = set(nms(boxes, scores, 0.45, method="fast").tolist())
+    assert greedy == set(reference_nms(boxes, scores, 0.45))
+    assert fast <= greedy
+
+
+def test_ios_suppresses_contained_boxes():
+    boxes = np.array([[0, 0, 100, 100], [10, 10, 40, 40]], dtype=np.float32)
+    assert box_ios(boxes, boxes)[0, 1] == pytest.approx(1.0)
+    assert nms(boxes, np.array([0.9, 0.8]), 0.5).tolist() == [0, 1]
+    assert nms(boxes, np.array([0.9, 0.8]), 0.5, metric="ios").tolist() == [0]
+
+
+def test_unknown_method_raises():
+    boxes = np.array([[0, 0, 1, 1]], dtype=np.float32)
+    with pytest.raises(ValueError):
+        nms(boxes, np.array([1.0]), method="soft")
+    with pytest.raises(ValueError):
+        nms(boxes, np.array([1.0]), metric="giou")
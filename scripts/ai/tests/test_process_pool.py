@@ -0,0 +1,121 @@
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from process_pool import ProcessPool
+from stages import Frame
+
+SHAPE = (8, 8, 3)
+
+
+class SleepyDetector:
+    """Sleeps image[0, 0, 0] hundredths of a second, then reports that value as its box."""
+
+    names = {0: "thing"}
+
+    def __call__(self, image):
+        value = int(image[0, 0, 0])
+        if value == 255:
+            raise RuntimeError("bad frame")
+        time.sleep(value / 100)
+        return np.array([[value, 0, value + 1, 1]], dtype=np.float32), np.array([0.9]), np.array([0])
+
+
+def make_detector():
+    return SleepyDetector()
+
+
+def frame(delay, pts):
+    return Frame(image=np.full(SHAPE, delay, dtype=np.uint8), pts=pts, dts=pts, duration=1)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kwargs):
+        out = []
+        pool = ProcessPool(make_detector, SHAPE, sink=out.append, warmup_frames=0, **kwargs)
+        pool.start(timeout=60)
+        pools.append(pool)
+        return pool, out
+
+    yield make
+    for pool in pools:
+        pool.stop()
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_results_come_out_in_pts_order(make_pool):
+    pool, out = make_pool(workers=2, slots=4)
+    # the first frame is slow, so the second worker finishes the later ones first
+    for pts, delay in enumerate([30, 1, 2, 1]):
+        assert pool.submit(frame(delay, pts), timeout=5.0)
+    assert pool.drain(10.0)
+    assert [f.pts for f in out] == [0, 1, 2, 3]
+    assert [int(f.detections[0][0, 0]) for f in out] == [30, 1, 2, 1]
+    assert pool.reordered >= 1
+    assert pool.in_flight == 0
+
+
+def test_frames_are_ordered_by_pts_not_submission(make_pool):
+    pool, out = make_pool(workers=1, slots=4)
+    pool.submit(frame(20, 10), timeout=5.0)
+    pool.submit(frame(1, 5), timeout=5.0)
+    assert pool.drain(10.0)
+    assert [f.pts for f in out] == [5, 10]
+
+
+def test_full_pool_drops_frames(make_pool):
+    pool, out = make_pool(workers=1, slots=2)
+    accepted = [pool.submit(frame(20, pts)) for pts in range(5)]
+    assert accepted == [True, True, False, False, False]
+    assert pool.dropped == 3 and pool.in_flight == 2
+    assert pool.drain(10.0)
+    assert [f.pts for f in out] == [0, 1]
+    assert pool.in_flight == 0
+    assert pool.submit(frame(1, 5))
+
+
+def test_detector_errors_are_counted(make_pool):
+    pool, out = make_pool(workers=1, slots=2)
+    pool.submit(frame(255, 0), timeout=5.0)
+    pool.submit(frame(1, 1), timeout=5.0)
+    assert pool.drain(10.0)
+    assert pool.errors == 1 and "bad frame" in pool.last_error
+    assert len(out[0].detections[0]) == 0 and len(out[1].detections[0]) == 1
+    assert "1 detector errors" in pool.summary()
+
+
+def test_dead_worker_is_restarted_without_losing_slots(make_pool):
+    pool, out = make_pool(workers=1, slots=2, max_restarts=1)
+    assert pool.submit(frame(100, 0))
+    assert pool.submit(frame(100, 1))
+    os.kill(pool._workers[0].process.pid, signal.SIGKILL)
+    assert wait_for(lambda: pool.restarts == 1 and pool.in_flight == 0)
+    assert pool.lost == 2 and not out
+    # the restarted worker serves every slot again once it is ready
+    assert wait_for(lambda: pool.submit(frame(1, 2), timeout=1.0), timeout=60.0)
+    assert pool.submit(frame(1, 3), timeout=5.0)
+    assert pool.drain(10.0)
+    assert [f.pts for f in out] == [2, 3]
+    assert pool.in_flight == 0
+
+
+def test_submit_raises_once_every_worker_died(make_pool):
+    pool, _ = make_pool(workers=1, slots=2, max_restarts=0)
+    os.kill(pool._workers[0].process.pid, signal.SIGKILL)
+    assert wait_for(lambda: pool.alive == 0)
+    with pytest.raises(RuntimeError):
+        pool.submit(frame(1, 0))
@@ -0,0 +1,73 @@
+import glob
+import os
+
+import pytest
+
+from profiles import apply_override, load_profile, profile_from_dict
+
+PROFILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "profiles")
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(PROFILES, "*.toml"))))
+def test_shipped_profiles_load(path):
+    profile = load_profile(path)
+    assert profile.name == os.path.splitext(os.path.basename(path))[0]
+
+
+def test_yaml_profile_loads():
+    pytest.importorskip("yaml")
+    profile = load_profile(os.path.join(PROFILES, "ci_file_onnx.yaml"))
+    assert profile.detector.backend == "onnx"
+    assert profile.source.kind == "filesrc"
+
+
+def test_load_with_overrides():
+    profile = load_profile(
+        os.path.join(PROFILES, "ci_testsrc.toml"),
+        ["detector.conf=0.4", "detector.backend=onnx", "source.width=320", "metrics.stamp=true"],
+    )
+    assert profile.source.kind == "videotestsrc"
+    assert profile.source.width == 320
+    assert profile.detector.conf == 0.4
+    assert profile.detector.backend == "onnx"
+    assert profile.metrics.stamp is True
+
+
+def test_missing_keys_use_defaults():
+    profile = profile_from_dict({"source": {"kind": "videotestsrc"}})
+    assert profile.detector.backend == "none"
+    assert profile.detector.min_confidence == 0.2
+    assert profile.sink.kind == "webrtcsink"
+
+
+def test_values_are_coerced_to_the_default_type():
+    profile = profile_from_dict({"detector": {"imgsz": "320", "conf": 1}, "sink": {"audio": "yes"}})
+    assert profile.detector.imgsz == 320
+    assert isinstance(profile.detector.conf, float)
+    assert profile.sink.audio is True
+
+
+def test_override_syntax():
+    data = {}
+    apply_override(data, "detector.model = yolo11s")
+    apply_override(data, "source.fps_num=15")
+    assert data == {"detector": {"model": "yolo11s"}, "source": {"fps_num": 15}}
+    with pytest.raises(ValueError):
+        apply_override(data, "detector.conf")
+    with pytest.raises(ValueError):
+        apply_override(data, "conf=0.3")
+
+
+def test_unknown_section_raises():
+    with pytest.raises(ValueError, match="Unknown profile section"):
+        profile_from_dict({"camera": {"kind": "v4l2src"}})
+
+
+def test_unknown_key_raises():
+    with pytest.raises(ValueError, match="Unknown key detector.confidence"):
+        profile_from_dict({"detector": {"confidence": 0.5}})
+
+
+def test_invalid_choice_raises():
+    with pytest.raises(ValueError, match="detector.backend"):
+        profile_from_dict({"detector": {"backend": "tensorrt"}})
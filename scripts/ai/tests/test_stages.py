@@ -0,0 +1,232 @@
+import threading
+import time
+
+import pytest
+
+from stages import (
+    BLOCK,
+    DROP_OLDEST,
+    LATEST_ONLY,
+    AdaptiveStride,
+    BatchCollector,
+    Frame,
+    FrameQueue,
+    QueueClosed,
+    StagePipeline,
+)
+
+
+class Mapped:
+    """Stand-in for a pooled buffer mapping: records that the frame gave it back."""
+
+    def __init__(self):
+        self.unmapped = False
+
+    def unmap(self):
+        self.unmapped = True
+
+
+def pooled_frame(pts):
+    frame = Frame(image=object(), pts=pts, dts=pts, duration=1)
+    frame.extra["mapped"] = Mapped()
+    return frame
+
+
+def test_drop_oldest_keeps_newest_in_order():
+    q = FrameQueue(2, DROP_OLDEST)
+    assert q.put(1) and q.put(2)
+    assert not q.put(3)
+    assert q.dropped == 1
+    assert [q.get(), q.get()] == [2, 3]
+
+
+def test_latest_only_keeps_one_frame():
+    q = FrameQueue(5, LATEST_ONLY)
+    for i in range(4):
+        q.put(i)
+    assert len(q) == 1 and q.get() == 3
+    assert q.dropped == 3
+
+
+def test_dropped_frames_release_their_buffer():
+    q = FrameQueue(1, DROP_OLDEST)
+    first, second = pooled_frame(0), pooled_frame(1)
+    mapped = first.extra["mapped"]
+    q.put(first)
+    q.put(second)
+    assert mapped.unmapped and first.image is None
+    assert not second.extra["mapped"].unmapped
+
+
+def test_block_waits_for_room():
+    q = FrameQueue(1, BLOCK)
+    q.put(1)
+    done = threading.Event()
+    thread = threading.Thread(target=lambda: (q.put(2), done.set()))
+    thread.start()
+    assert not done.wait(0.05)
+    assert q.get() == 1
+    assert done.wait(1.0)
+    assert q.get() == 2 and q.dropped == 0
+
+
+def test_closed_queue():
+    q = FrameQueue(2, BLOCK)
+    q.put(1)
+    q.close()
+    frame = pooled_frame(0)
+    assert not q.put(frame)
+    assert frame.image is None
+    assert q.get() == 1
+    with pytest.raises(QueueClosed):
+        q.get()
+
+
+def test_get_timeout():
+    with pytest.raises(TimeoutError):
+        FrameQueue().get(timeout=0.01)
+
+
+def test_unknown_policy_raises():
+    with pytest.raises(ValueError):
+        FrameQueue(2, "drop-newest")
+
+
+def test_stage_pipeline_runs_stages_in_order():
+    out = []
+    pipeline = StagePipeline([("double", lambda x: x * 2), ("inc", lambda x: x + 1)], out.append, policy=BLOCK)
+    pipeline.start()
+    for i in range(20):
+        pipeline.submit(i)
+    deadline = time.monotonic() + 2.0
+    while len(out) < 20 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    pipeline.stop()
+    assert out == [i * 2 + 1 for i in range(20)]
+    assert pipeline.dropped == 0
+
+
+def test_stage_errors_release_the_frame_and_continue():
+    out = []
+
+    def fail_odd(frame):
+        if frame.pts % 2:
+            raise RuntimeError("boom")
+        return frame
+
+    pipeline = StagePipeline([("detect", fail_odd)], out.append, policy=BLOCK)
+    frames = [pooled_frame(i) for i in range(4)]
+    pipeline.start()
+    for frame in frames:
+        pipeline.submit(frame)
+    deadline = time.monotonic() + 2.0
+    while len(out) < 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    pipeline.stop()
+    assert [frame.pts for frame in out] == [0, 2]
+    assert frames[1].image is None and frames[3].image is None
+
+
+def test_sink_errors_release_the_frame_and_keep_the_stage_running():
+    out = []
+
+    def sink(frame):
+        if frame.pts == 1:
+            raise RuntimeError("push failed")
+        out.append(frame)
+
+    pipeline = StagePipeline([("detect", lambda frame: frame)], sink, policy=BLOCK)
+    frames = [pooled_frame(i) for i in range(3)]
+    pipeline.start()
+    for frame in frames:
+        pipeline.submit(frame)
+    deadline = time.monotonic() + 2.0
+    while len(out) < 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    pipeline.stop()
+    assert [frame.pts for frame in out] == [0, 2]
+    assert frames[1].image is None and frames[0].image is not None
+    assert pipeline.stages[0].processed == 2
+
+
+def test_adaptive_stride_follows_latency():
+    stride = AdaptiveStride(target_fps=30, smoothing=1.0)
+    assert stride.update(0.1) == 3
+    assert [stride.due() for _ in range(6)] == [True, False, False, True, False, False]
+    assert stride.update(10.0) == stride.max_stride
+
+
+def detect_all(frames):
+    for frame in frames:
+        frame.detections = frame.pts
+
+
+def test_batch_collector_dispatches_full_batches():
+    out, sizes = [], []
+    collector = BatchCollector(lambda frames: (sizes.append(len(frames)), detect_all(frames)),
+                               lambda stream, frame: out.append((stream, frame.detections)), max_batch=2, max_wait=5.0)
+    collector.start()
+    collector.submit("a", Frame(None, 1, 1, 1))
+    collector.submit("b", Frame(None, 2, 2, 2))
+    deadline = time.monotonic() + 2.0
+    while len(out) < 2 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    collector.stop()
+    assert sizes == [2]
+    assert out == [("a", 1), ("b", 2)]
+    assert collector.mean_batch_size == 2.0
+
+
+def test_batch_collector_dispatches_partial_batch_after_max_wait():
+    collector = BatchCollector(detect_all, lambda stream, frame: None, max_batch=4, max_wait=0.05)
+    collector.submit("a", Frame(None, 1, 1, 1))
+    start = time.monotonic()
+    batch = collector._next_batch()
+    assert [stream for stream, _ in batch] == ["a"]
+    assert 0.03 <= time.monotonic() - start < 1.0
+
+
+def test_batch_collector_replaces_stale_frames_per_stream():
+    collector = BatchCollector(detect_all, lambda stream, frame: None, max_batch=4, max_wait=0.0)
+    stale = pooled_frame(0)
+    mapped = stale.extra["mapped"]
+    collector.submit("a", stale)
+    collector.submit("a", pooled_frame(1))
+    assert collector.dropped == 1 and mapped.unmapped
+    assert [frame.pts for _, frame in collector._next_batch()] == [1]
+
+
+def test_leftover_frames_keep_their_arrival_time():
+    collector = BatchCollector(detect_all, lambda stream, frame: None, max_batch=2, max_wait=0.2)
+    for stream in "abc":
+        collector.submit(stream, Frame(None, 0, 0, 0))
+    time.sleep(0.15)
+    assert len(collector._next_batch()) == 2
+    # "c" has already waited 0.15 s of its 0.2 s
+    start = time.monotonic()
+    assert [stream for stream, _ in collector._next_batch()] == ["c"]
+    assert time.monotonic() - start < 0.12
+
+
+def test_batch_collector_sink_errors_release_the_frame():
+    out = []
+
+    def sink(stream, frame):
+        if stream == "a":
+            raise RuntimeError("push failed")
+        out.append(stream)
+
+    collector = BatchCollector(detect_all, sink, max_batch=2, max_wait=5.0)
+    failed = pooled_frame(1)
+    collector.start()
+    collector.submit("a", failed)
+    collector.submit("b", pooled_frame(2))
+    collector.submit("c", pooled_frame(3))
+    collector.submit("d", pooled_frame(4))
+    deadline = time.monotonic() + 2.0
+    while len(out) < 3 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    collector.stop()
+    # the failing sink neither stops the thread nor skips the rest of the batch
+    assert out == ["b", "c", "d"]
+    assert failed.image is None
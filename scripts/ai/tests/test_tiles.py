@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from tiles import TiledDetector, merge_detections, tile_grid
+
+
+@pytest.mark.parametrize("width,height", [(2448, 2048), (1920, 1080), (641, 700), (640, 640), (300, 200)])
+def test_tile_grid_covers_the_frame(width, height):
+    tiles = tile_grid(width, height, tile=640, overlap=0.2)
+    covered = np.zeros((height, width), dtype=bool)
+    for x1, y1, x2, y2 in tiles:
+        assert 0 <= x1 < x2 <= width and 0 <= y1 < y2 <= height
+        assert x2 - x1 <= 640 and y2 - y1 <= 640
+        covered[y1:y2, x1:x2] = True
+    assert covered.all()
+
+
+def test_tile_grid_overlap():
+    tiles = tile_grid(2448, 640, tile=640, overlap=0.2)
+    starts = [x1 for x1, _, _, _ in tiles]
+    assert all(b - a <= 640 * 0.8 for a, b in zip(starts, starts[1:]))
+    assert tiles[-1][2] == 2448
+
+
+def test_small_frame_is_one_tile():
+    assert tile_grid(600, 400) == [(0, 0, 600, 400)]
+
+
+def test_merge_shifts_parts_to_frame_coordinates():
+    parts = [
+        (np.array([[10, 10, 20, 20]]), np.array([0.9]), np.array([0])),
+        (np.array([[10, 10, 20, 20]]), np.array([0.8]), np.array([1])),
+    ]
+    boxes, confs, cls_ids = merge_detections(parts, [(0, 0), (500, 100)])
+    np.testing.assert_allclose(boxes, [[10, 10, 20, 20], [510, 110, 520, 120]])
+    assert cls_ids.tolist() == [0, 1]
+
+
+def test_merge_suppresses_partial_box_at_tile_border():
+    # full object from the full frame, its left part from a tile starting at x=600
+    full = (np.array([[580, 100, 680, 200]]), np.array([0.9]), np.array([2]))
+    partial = (np.array([[0, 0, 80, 100]]), np.array([0.7]), np.array([2]))
+    boxes, confs, _ = merge_detections([full, partial], [(0, 0), (600, 100)])
+    np.testing.assert_allclose(boxes, [[580, 100, 680, 200]])
+    np.testing.assert_allclose(confs, [0.9])
+
+
+def test_merge_keeps_full_box_when_partial_box_scores_higher():
+    full = (np.array([[580, 100, 680, 200]]), np.array([0.7]), np.array([2]))
+    partial = (np.array([[0, 0, 80, 100]]), np.array([0.9]), np.array([2]))
+    boxes, confs, cls_ids = merge_detections([full, partial], [(0, 0), (600, 100)])
+    np.testing.assert_allclose(boxes, [[580, 100, 680, 200]])
+    np.testing.assert_allclose(confs, [0.9])
+    assert cls_ids.tolist() == [2]
+
+
+def test_merge_joins_halves_of_an_object_cut_by_the_overlap():
+    left = (np.array([[580, 100, 640, 200]]), np.array([0.8]), np.array([0]))
+    right = (np.array([[0, 0, 70, 100]]), np.array([0.6]), np.array([0]))
+    boxes, _, _ = merge_detections([left, right], [(0, 0), (600, 100)], threshold=0.3)
+    np.testing.assert_allclose(boxes, [[580, 100, 670, 200]])
+
+
+def test_merge_keeps_overlapping_boxes_of_other_classes():
+    a = (np.array([[0, 0, 100, 100]]), np.array([0.9]), np.array([0]))
+    b = (np.array([[0, 0, 100, 100]]), np.array([0.8]), np.array([1]))
+    _, _, cls_ids = merge_detections([a, b], [(0, 0), (0, 0)])
+    assert sorted(cls_ids.tolist()) == [0, 1]
+
+
+def test_merge_of_nothing_is_empty():
+    boxes, confs, cls_ids = merge_detections([(np.empty((0, 4)), np.empty(0), np.empty(0))], [(0, 0)])
+    assert boxes.shape == (0, 4) and len(confs) == 0 and len(cls_ids) == 0
+
+
+def test_tiled_detector_batches_every_tile_with_the_frame():
+    batches = []
+
+    def detect_batch(images):
+        batches.append(len(images))
+        return [(np.empty((0, 4)), np.empty(0), np.empty(0, dtype=int)) for _ in images]
+
+    detector = TiledDetector(detect_batch, tile=640)
+    detector(np.zeros((1080, 1920, 3), dtype=np.uint8))
+    assert batches == [len(tile_grid(1920, 1080)) + 1]
+    assert detector.tiles_inferred == detector.tiles_total
+
+
+def test_coarse_mode_infers_only_flagged_tiles():
+    def detect_batch(images):
+        if images[0].shape[:2] == (2048, 2448):
+            return [(np.array([[100, 100, 150, 150]]), np.array([0.3]), np.array([0]))]
+        return [(np.array([[10, 10, 60, 60]]), np.array([0.9]), np.array([0])) for _ in images]
+
+    detector = TiledDetector(detect_batch, mode="coarse", conf=0.25)
+    boxes, confs, _ = detector(np.zeros((2048, 2448, 3), dtype=np.uint8))
+    assert detector.tiles_inferred == 1 < detector.tiles_total
+    assert len(boxes) == 2 and confs.max() == pytest.approx(0.9)
@@ -0,0 +1,98 @@
+import numpy as np
+
+from tracker import KeyframeTracker, SortTracker, greedy_match, xyxy_to_z, z_to_xyxy
+
+
+def detections(*boxes, conf=0.9, cls=0):
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    return boxes, np.full(len(boxes), conf), np.full(len(boxes), cls, dtype=int)
+
+
+def test_box_conversion_round_trip():
+    boxes = np.array([[10, 20, 50, 100], [0, 0, 5, 5]], dtype=float)
+    np.testing.assert_allclose(z_to_xyxy(xyxy_to_z(boxes)), boxes, atol=1e-6)
+
+
+def test_greedy_match_prefers_highest_iou():
+    iou = np.array([[0.9, 0.8], [0.85, 0.1]])
+    rows, cols = greedy_match(iou, 0.3)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 0)]
+    rows, cols = greedy_match(iou, 0.05)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 0), (1, 1)]
+
+
+def test_moving_object_keeps_its_id():
+    tracker = SortTracker()
+    ids = set()
+    for t in range(10):
+        boxes, confs, cls_ids, track_ids = tracker.step(detections([10 + 5 * t, 10, 60 + 5 * t, 60]))
+        assert len(boxes) == 1
+        ids.update(track_ids.tolist())
+    assert ids == {1}
+    # the velocity is learned: a prediction without detection moves on
+    boxes, _, _, _ = tracker.step()
+    assert boxes[0, 0] > 10 + 5 * 9
+
+
+def test_classes_are_not_matched_across():
+    tracker = SortTracker()
+    tracker.step(detections([0, 0, 50, 50], cls=0))
+    _, _, cls_ids, track_ids = tracker.step(detections([0, 0, 50, 50], cls=1))
+    assert cls_ids.tolist() == [1]
+    assert track_ids.tolist() == [2]
+
+
+def test_unmatched_tracks_are_hidden_then_removed():
+    tracker = SortTracker(max_lost=2)
+    tracker.step(detections([0, 0, 50, 50]))
+    boxes, _, _, _ = tracker.step(detections())
+    assert len(boxes) == 0 and len(tracker) == 1
+    tracker.step(detections())
+    assert len(tracker) == 0
+
+
+def test_confidence_decays_without_detections():
+    tracker = SortTracker(decay=0.5)
+    tracker.step(detections([0, 0, 50, 50], conf=0.8))
+    _, confs, _, _ = tracker.step()
+    np.testing.assert_allclose(confs, [0.4])
+
+
+def test_keyframe_tracker_runs_detector_on_keyframes():
+    calls = []
+
+    def detect(image):
+        calls.append(image)
+        return detections([0, 0, 50, 50])
+
+    tracker = KeyframeTracker(detect, keyframe_interval=5, min_confidence=0.0)
+    for i in range(20):
+        (boxes, _, _), track_ids = tracker(i)
+        assert track_ids.tolist() == [1]
+    assert calls == [0, 5, 10, 15]
+    assert tracker.inferences == 4
+
+
+def test_keyframe_tracker_detects_early_on_low_confidence():
+    tracker = KeyframeTracker(lambda image: detections([0, 0, 50, 50], conf=0.5), keyframe_interval=100,
+                              min_confidence=0.3, tracker=SortTracker(decay=0.9))
+    for _ in range(20):
+        tracker(None)
+    # 0.5 * 0.9**n drops below 0.3 after 5 frames without a detection
+    assert 3 <= tracker.inferences <= 5
+
+
+def test_lost_tracks_do_not_force_keyframes():
+    results = [detections([0, 0, 50, 50], [200, 200, 250, 250], conf=0.9)]
+
+    def detect(image):
+        return results.pop(0) if results else detections([0, 0, 50, 50], conf=0.9)
+
+    # 0.9 * 0.9**5 stays above 0.5 between keyframes, so only the interval triggers
+    tracker = KeyframeTracker(detect, keyframe_interval=5, min_confidence=0.5,
+                              tracker=SortTracker(max_lost=5, decay=0.9))
+    for _ in range(30):
+        tracker(None)
+    # the second object is gone after the first keyframe; its hidden, decaying
+    # track must not make the detector run on every frame until it is removed
+    assert tracker.inferences == 6
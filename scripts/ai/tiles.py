@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tiled (sliced) inference for high-resolution cameras, e.g. a 5 MP pylonsrc.
+
+Letterboxing a 2448x2048 frame to 640x640 shrinks it almost 4x, so small parts
+or defects fall below what the model can see. ``TiledDetector`` splits the
+frame into overlapping model-sized tiles and runs them as one batch:
+
+    all     full frame (large objects) + every tile, one detect_batch call
+    coarse  full frame first; only the tiles around its detections (with a
+            lower confidence threshold, so weak hits also flag a region)
+            are inferred in a second batch
+
+Tile detections are shifted back to frame coordinates and merged with
+class-aware NMS on intersection over the smaller box, so an object cut by a
+tile border (a partial box inside the full one) is merged too, not only
+duplicates from the overlap; the kept box covers the union of its duplicates. ``TiledDetector.summary()`` reports how many
+tiles were inferred.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Callable, Sequence
+
+import numpy as np
+
+from overlay import empty_detections
+from postprocess import box_ios, box_iou, nms
+
+
+def tile_grid(width: int, height: int, tile: int = 640, overlap: float = 0.2) -> list[tuple[int, int, int, int]]:
+    """
+    xyxy tiles of at most ``tile`` pixels covering the frame, overlapping by at
+    least ``overlap`` of a tile; spread evenly so the last tile ends at the edge.
+    """
+    stride = tile * (1.0 - overlap)
+
+    def starts(length):
+        if length <= tile:
+            return [0]
+        count = math.ceil((length - tile) / stride) + 1
+        return [round(i * (length - tile) / (count - 1)) for i in range(count)]
+
+    return [(x, y, min(x + tile, width), min(y + tile, height)) for y in starts(height) for x in starts(width)]
+
+
+def merge_detections(
+    parts: Sequence[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    origins: Sequence[tuple[int, int]],
+    threshold: float = 0.6,
+    metric: str = "ios",
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Shift every part by its (x, y) origin and merge duplicates across parts, per
+    class. Each kept box grows to the union of the boxes it suppressed, so a
+    high-scoring partial box cut by a tile border does not replace the full one.
+    """
+    boxes = [np.asarray(b, dtype=np.float32).reshape(-1, 4) + (x, y, x, y) for (b, _, _), (x, y) in zip(parts, origins)]
+    boxes = np.concatenate(boxes) if boxes else np.empty((0, 4), dtype=np.float32)
+    if not len(boxes):
+        return empty_detections()
+    confs = np.concatenate([np.asarray(c, dtype=np.float32).reshape(-1) for _, c, _ in parts])
+    cls_ids = np.concatenate([np.asarray(k, dtype=int).reshape(-1) for _, _, k in parts])
+    # offset every class into its own coordinate range: one NMS call, no cross-class suppression
+    span = float(boxes.max()) + 1.0
+    shifted = boxes + cls_ids[:, None] * span
+    keep = nms(shifted, confs, threshold, metric=metric)
+    # greedy NMS: a box is suppressed by the first kept box (highest score) overlapping it
+    overlap = box_ios if metric == "ios" else box_iou
+    owner = (overlap(shifted[keep], shifted) > threshold).argmax(axis=0)
+    owner[keep] = np.arange(len(keep))
+    merged = boxes[keep].copy()
+    np.minimum.at(merged[:, :2], owner, boxes[:, :2])
+    np.maximum.at(merged[:, 2:], owner, boxes[:, 2:])
+    return merged, confs[keep], cls_ids[keep]
+
+
+class TiledDetector:
+    """
+    Wraps ``detect_batch(images) -> [(boxes, confs, cls_ids), ...]`` with tiled
+    inference. Calling it with a frame returns detections for that frame.
+    """
+
+    def __init__(
+        self,
+        detect_batch: Callable[[Sequence[np.ndarray]], list],
+        tile: int = 640,
+        overlap: float = 0.2,
+        mode: str = "all",
+        full_frame: bool = True,
+        conf: float = 0.0,
+        merge_threshold: float = 0.6,
+        margin: float = 0.5,
+    ) -> None:
+        if mode not in ("all", "coarse"):
+            raise ValueError(f"Unknown tiling mode {mode!r}")
+        self.detect_batch = detect_batch
+        self.tile = tile
+        self.overlap = overlap
+        self.mode = mode
+        self.full_frame = full_frame or mode == "coarse"  # "all": also infer the downscaled frame
+        self.conf = conf  # final threshold; the detector's own may be lower for the coarse pass
+        self.merge_threshold = merge_threshold  # intersection over the smaller box of duplicates
+        self.margin = margin  # coarse: grow detections by this fraction of their size before flagging tiles
+        self.frames = 0
+        self.tiles_total = 0
+        self.tiles_inferred = 0
+        self._grid: tuple[tuple[int, int], list] | None = None
+
+    def grid(self, width: int, height: int) -> list[tuple[int, int, int, int]]:
+        if self._grid is None or self._grid[0] != (width, height):
+            self._grid = ((width, height), tile_grid(width, height, self.tile, self.overlap))
+        return self._grid[1]
+
+    def flagged(self, tiles: list, boxes: np.ndarray) -> list:
+        """Tiles that intersect a coarse detection grown by ``margin``."""
+        if not len(boxes):
+            return []
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        grow = np.concatenate([boxes[:, 2:] - boxes[:, :2]] * 2, axis=1) * self.margin * (-1, -1, 1, 1)
+        boxes = boxes + grow
+        rects = np.asarray(tiles, dtype=np.float32)
+        hit = (
+            (rects[:, None, 0] < boxes[None, :, 2]) & (rects[:, None, 2] > boxes[None, :, 0])
+            & (rects[:, None, 1] < boxes[None, :, 3]) & (rects[:, None, 3] > boxes[None, :, 1])
+        ).any(axis=1)
+        return [t for t, h in zip(tiles, hit) if h]
+
+    def __call__(self, image: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self.frames += 1
+        height, width = image.shape[:2]
+        tiles = self.grid(width, height)
+        self.tiles_total += len(tiles)
+        if len(tiles) == 1:
+            parts, origins = self.detect_batch([image]), [(0, 0)]
+        elif self.mode == "coarse":
+            parts = self.detect_batch([image])
+            tiles = self.flagged(tiles, parts[0][0])
+            if tiles:
+                parts += self.detect_batch([image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles])
+            origins = [(0, 0)] + [(x1, y1) for x1, y1, _, _ in tiles]
+        else:
+            crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+            origins = [(x1, y1) for x1, y1, _, _ in tiles]
+            if self.full_frame:
+                crops, origins = [image] + crops, [(0, 0)] + origins
+            parts = self.detect_batch(crops)
+        self.tiles_inferred += len(tiles)
+
+        boxes, confs, cls_ids = merge_detections(parts, origins, self.merge_threshold)
+        keep = confs >= self.conf
+        return boxes[keep], confs[keep], cls_ids[keep]
+
+    def summary(self) -> str:
+        return (
+            f"{self.frames} frames, {self.tile}px tiles ({self.mode}): "
+            f"inferred {self.tiles_inferred}/{self.tiles_total} tiles"
+        )
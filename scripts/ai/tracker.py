@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+SORT-style multi-object tracker in pure NumPy, used to run the detector only on
+keyframes and propagate its boxes across the frames in between.
+
+Each track is a constant-velocity Kalman filter on (cx, cy, area, aspect)
+as in SORT (Bewley et al. 2016). All tracks are predicted and updated at once
+with batched matrix products. Detections are matched to the predicted boxes
+greedily by IoU within the same class. Matched tracks keep their ID, so the
+overlay can show stable IDs.
+
+``KeyframeTracker`` wraps a detect function: the detector runs every
+``keyframe_interval`` frames, or sooner when the confidence of a tracked box
+still being reported (its detection confidence, decayed per frame without a
+detection) drops below ``min_confidence``. All other frames only cost a Kalman
+predict.
+"""
+
+from __future__ import annotations
+
+from typing import Callable
+
+import numpy as np
+
+from postprocess import box_iou
+
+# Kalman model of SORT: state (cx, cy, s, r, vcx, vcy, vs), measurement (cx, cy, s, r)
+_F = np.eye(7)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+_H = np.eye(4, 7)
+_R = np.diag([1.0, 1.0, 10.0, 10.0])
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 1e-4])
+_P0 = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+
+
+def xyxy_to_z(boxes: np.ndarray) -> np.ndarray:
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w * h, w / np.maximum(h, 1e-6)], axis=1)
+
+
+def z_to_xyxy(z: np.ndarray) -> np.ndarray:
+    w = np.sqrt(np.clip(z[:, 2] * z[:, 3], 0, None))
+    h = z[:, 2] / np.maximum(w, 1e-6)
+    return np.stack([z[:, 0] - w / 2, z[:, 1] - h / 2, z[:, 0] + w / 2, z[:, 1] + h / 2], axis=1)
+
+
+def greedy_match(iou: np.ndarray, threshold: float) -> tuple[np.ndarray, np.ndarray]:
+    """(rows, cols) of pairs matched greedily by descending IoU, each row/col used once."""
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_rows, used_cols, matched = set(), set(), []
+    for r, c in zip(rows[order], cols[order]):
+        if r not in used_rows and c not in used_cols:
+            used_rows.add(r)
+            used_cols.add(c)
+            matched.append((r, c))
+    matched = np.asarray(matched, dtype=int).reshape(-1, 2)
+    return matched[:, 0], matched[:, 1]
+
+
+class SortTracker:
+    """
+    Tracks detections across frames. Call ``step()`` once per frame, passing
+    ``(boxes, confs, cls_ids)`` on frames where the detector ran.
+
+    A track that finds no detection on ``max_lost`` consecutive keyframes is
+    removed. Only tracks matched on the last keyframe are reported.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_lost: int = 2, decay: float = 0.9) -> None:
+        self.iou_threshold = iou_threshold
+        self.max_lost = max_lost
+        self.decay = decay
+        self.next_id = 1
+        self.x = np.empty((0, 7))
+        self.P = np.empty((0, 7, 7))
+        self.ids = np.empty((0,), dtype=int)
+        self.cls_ids = np.empty((0,), dtype=int)
+        self.det_confs = np.empty((0,))
+        self.misses = np.empty((0,), dtype=int)  # frames since the last matched detection
+        self.lost = np.empty((0,), dtype=int)  # keyframes without a matched detection
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def confidences(self) -> np.ndarray:
+        """Detection confidence of every track, decayed per frame since it was last matched."""
+        return self.det_confs * self.decay ** self.misses
+
+    def predict(self) -> None:
+        if not len(self):
+            return
+        # keep the predicted area positive
+        shrinking = self.x[:, 2] + self.x[:, 6] <= 0
+        self.x[shrinking, 6] = 0.0
+        self.x = self.x @ _F.T
+        self.P = _F @ self.P @ _F.T + _Q
+        self.misses += 1
+
+    def update(self, boxes: np.ndarray, confs: np.ndarray, cls_ids: np.ndarray) -> None:
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        confs = np.asarray(confs, dtype=float)
+        cls_ids = np.asarray(cls_ids, dtype=int)
+
+        iou = box_iou(z_to_xyxy(self.x[:, :4]), boxes) if len(self) and len(boxes) else np.zeros((len(self), len(boxes)))
+        iou[self.cls_ids[:, None] != cls_ids[None, :]] = 0.0
+        tracks, dets = greedy_match(iou, self.iou_threshold)
+
+        if len(tracks):
+            # batched Kalman update of the matched tracks
+            P = self.P[tracks]
+            S = _H @ P @ _H.T + _R
+            K = P @ _H.T @ np.linalg.inv(S)
+            residual = xyxy_to_z(boxes[dets]) - self.x[tracks] @ _H.T
+            self.x[tracks] += np.einsum("nij,nj->ni", K, residual)
+            self.P[tracks] = (np.eye(7) - K @ _H) @ P
+            self.det_confs[tracks] = confs[dets]
+            self.misses[tracks] = 0
+
+        unmatched = np.ones(len(self), dtype=bool)
+        unmatched[tracks] = False
+        self.lost[unmatched] += 1
+        self.lost[tracks] = 0
+        keep = self.lost < self.max_lost
+        for name in ("x", "P", "ids", "cls_ids", "det_confs", "misses", "lost"):
+            setattr(self, name, getattr(self, name)[keep])
+
+        new = np.ones(len(boxes), dtype=bool)
+        new[dets] = False
+        count = int(new.sum())
+        if count:
+            x = np.zeros((count, 7))
+            x[:, :4] = xyxy_to_z(boxes[new])
+            self.x = np.concatenate([self.x, x])
+            self.P = np.concatenate([self.P, np.broadcast_to(_P0, (count, 7, 7))])
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + count)])
+            self.next_id += count
+            self.cls_ids = np.concatenate([self.cls_ids, cls_ids[new]])
+            self.det_confs = np.concatenate([self.det_confs, confs[new]])
+            self.misses = np.concatenate([self.misses, np.zeros(count, dtype=int)])
+            self.lost = np.concatenate([self.lost, np.zeros(count, dtype=int)])
+
+    def step(self, detections: tuple | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Advance one frame; returns (boxes, confs, cls_ids, track_ids) of the active tracks."""
+        self.predict()
+        if detections is not None:
+            self.update(*detections)
+        return self.tracks()
+
+    def tracks(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        active = self.lost == 0
+        return z_to_xyxy(self.x[active, :4]), self.confidences[active], self.cls_ids[active], self.ids[active]
+
+
+class KeyframeTracker:
+    """
+    Runs ``detect_fn(image) -> (boxes, confs, cls_ids)`` only on keyframes and
+    tracks in between. ``__call__`` returns ((boxes, confs, cls_ids), track_ids)
+    for every frame.
+    """
+
+    def __init__(
+        self,
+        detect_fn: Callable,
+        keyframe_interval: int = 10,
+        min_confidence: float = 0.2,
+        tracker: SortTracker | None = None,
+    ) -> None:
+        self.detect_fn = detect_fn
+        self.keyframe_interval = keyframe_interval
+        self.min_confidence = min_confidence
+        self.tracker = tracker or SortTracker()
+        self.frames = 0
+        self.inferences = 0
+        self._since_keyframe = keyframe_interval
+
+    def due(self) -> bool:
+        if self._since_keyframe >= self.keyframe_interval:
+            return True
+        # look at the confidences the reported tracks will have after this frame's
+        # predict; tracks that missed the last keyframe are not shown, so they
+        # must not force another keyframe every frame until they are removed
+        confidences = self.tracker.confidences[self.tracker.lost == 0] * self.tracker.decay
+        return bool(len(confidences) and confidences.min() < self.min_confidence)
+
+    def __call__(self, image: np.ndarray) -> tuple[tuple, np.ndarray]:
+        self.frames += 1
+        detections = None
+        if self.due():
+            detections = self.detect_fn(image)
+            self.inferences += 1
+            self._since_keyframe = 0
+        self._since_keyframe += 1
+        boxes, confs, cls_ids, track_ids = self.tracker.step(detections)
+        return (boxes, confs, cls_ids), track_ids
+
+    def summary(self) -> str:
+        saved = self.frames - self.inferences
+        return f"detector ran on {self.inferences}/{self.frames} frames ({saved} skipped), {len(self.tracker)} tracks"